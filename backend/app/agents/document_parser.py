@@ -1,106 +1,368 @@
 from __future__ import annotations
 
-import csv
-import re
-from typing import Any, Dict, List
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
+import numpy as np
+import pandas as pd
+
+from app import metrics
+from app.aggregates import empty_aggregates, frame_aggregates, merge_aggregates
+from app.category_cache import category_cache, normalize_merchant
+from app.config import settings
 from app.llm_client import call_llm
+from app.merchant_rules import get_rules
+from app.payslips import extract_fields, slip_income
+
+
+# Bump whenever parse_bank_csv output changes shape or meaning; it is part
+# of the parsed-statement cache key (see app.parse_cache).
+PARSER_VERSION = "4"
+
+CATEGORIES: List[str] = [
+    "Food",
+    "Groceries",
+    "Transport",
+    "Rent",
+    "EMI",
+    "Shopping",
+    "Salary",
+    "Utilities",
+    "Others",
+]
 
 
-KEYWORD_MAP: Dict[str, str] = {
-    "zomato": "Food",
-    "swiggy": "Food",
-    "uber": "Transport",
-    "ola": "Transport",
-    "rent": "Rent",
-    "emi": "EMI",
+# Canonical column -> accepted header spellings (compared lowercased, with
+# surrounding whitespace and trailing dots removed), in priority order.
+HEADER_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "date": ("date", "txn date", "transaction date", "value date", "posting date"),
+    "desc": (
+        "description",
+        "desc",
+        "narration",
+        "particulars",
+        "remarks",
+        "transaction details",
+        "details",
+    ),
+    "amount": ("amount", "transaction amount", "amount (inr)", "amt"),
+    "debit": (
+        "debit",
+        "debit amount",
+        "withdrawal",
+        "withdrawal amt",
+        "withdrawal amount",
+        "withdrawal amount (inr)",
+        "dr",
+    ),
+    "credit": (
+        "credit",
+        "credit amount",
+        "deposit",
+        "deposit amt",
+        "deposit amount",
+        "deposit amount (inr)",
+        "cr",
+    ),
 }
 
+_DR_CR_SUFFIX = r"(?i)\s*\b(dr|cr)\.?$"
+_AMOUNT_NOISE = r"(?i)[,\s₹]|inr|rs\.?"
+
 
 def parse_bank_csv(path: str) -> Dict[str, Any]:
-    """Parse bank CSV into structured income + transactions."""
+    """Parse bank CSV into structured income + transactions.
+
+    ``aggregates`` (see ``app.aggregates``) are computed here, once, so the
+    agents never have to rescan the transactions. The CSV is read in chunks,
+    but the result holds every transaction, so memory grows with the
+    statement.
+    """
+
+    with metrics.stage("read_csv"):
+        frames, unknown = read_statement(path)
+    categories: Dict[str, str] = {}
+    if unknown:
+        with metrics.stage("categorize"):
+            categories = categorize_batch(unknown)
+    return finish_statement(frames, categories)
+
+
+def read_statement(
+    path: str,
+) -> Tuple[List[pd.DataFrame], List[Tuple[str, float]]]:
+    """CPU half of ``parse_bank_csv``: the statement's frames and the
+    distinct (description, amount) pairs no merchant rule matched, which
+    need ``categorize_batch``."""
+
+    frames = list(read_bank_frames(path))
+    unknown = [f.loc[f["category"].isna(), ["desc", "amount"]] for f in frames]
+    unknown = [u for u in unknown if not u.empty]
+    if not unknown:
+        return frames, []
+    items = pd.concat(unknown).drop_duplicates("desc")
+    return frames, list(zip(items["desc"].tolist(), items["amount"].tolist()))
+
+
+def finish_statement(
+    frames: List[pd.DataFrame], categories: Dict[str, str]
+) -> Dict[str, Any]:
+    """Fill in the LLM ``categories`` (description -> category) and build the
+    parsed statement from ``read_statement``'s frames.
+
+    Rows whose description has no category (the LLM call failed) fall back
+    to "Others"; ``uncategorized`` counts them, and such a parse is not
+    cached (see ``app.parse_cache``) so the next upload tries again.
+    """
+
+    uncategorized = 0
+    for frame in frames:
+        missing = frame["category"].isna()
+        if missing.any():
+            filled = frame.loc[missing, "desc"].map(categories)
+            uncategorized += int(filled.isna().sum())
+            frame.loc[missing, "category"] = filled.fillna("Others")
+
+    aggregates = empty_aggregates()
+    with metrics.stage("aggregates"):
+        for frame in frames:
+            merge_aggregates(aggregates, frame_aggregates(frame))
 
     transactions: List[Dict[str, Any]] = []
-    income = 0.0
-
-    with open(path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            desc = row.get("Description") or row.get("desc") or ""
-            amount_str = row.get("Amount") or row.get("amount") or "0"
-            try:
-                amount = float(amount_str)
-            except ValueError:
-                continue
-            date = row.get("Date") or row.get("date") or ""
-            category = infer_category(desc, amount)
-            transactions.append(
-                {
-                    "date": date,
-                    "desc": desc,
-                    "amount": amount,
-                    "category": category,
-                }
+    for frame in frames:
+        transactions.extend(
+            {"date": date, "desc": desc, "amount": amount, "category": category}
+            for date, desc, amount, category in zip(
+                frame["date"].tolist(),
+                frame["desc"].tolist(),
+                frame["amount"].tolist(),
+                frame["category"].tolist(),
             )
-            if amount > 0:
-                income += amount
+        )
 
+    income = aggregates["income"]
     emergency_fund = max(0.0, income) * 0.25
     return {
         "income": income,
         "transactions": transactions,
         "emergencyFund": emergency_fund,
+        "aggregates": aggregates,
+        "uncategorized": uncategorized,
     }
 
 
-def infer_category(desc: str, amount: float) -> str:
-    d = desc.lower()
-    for keyword, cat in KEYWORD_MAP.items():
-        if keyword in d:
-            return cat
+def read_bank_frames(path: str) -> Iterator[pd.DataFrame]:
+    """Read a bank CSV as DataFrame chunks of ``date, desc, amount, category``.
 
-    prompt = f"""
-You are categorizing a single bank transaction.
+    Header aliases are resolved once from the first line, the file is read
+    as strings in chunks of ``settings.csv_chunk_rows`` rows, and amounts are
+    coerced column-wise (thousand separators, ``Dr``/``Cr`` suffixes, or
+    separate Debit/Credit columns). Rows whose amount cannot be parsed are
+    dropped. ``category`` holds the rule-engine match or None.
+    """
 
-Description: {desc}
-Amount: {amount}
+    try:
+        header = pd.read_csv(path, nrows=0, encoding="utf-8").columns
+    except pd.errors.EmptyDataError:
+        return
+    columns = _resolve_columns(header)
+    reader = pd.read_csv(
+        path,
+        encoding="utf-8",
+        dtype=str,
+        keep_default_na=False,
+        usecols=list(columns.values()),
+        chunksize=max(1, settings.csv_chunk_rows),
+    )
+    rules = get_rules()
+    for chunk in reader:
+        frame = pd.DataFrame(index=chunk.index)
+        frame["date"] = chunk[columns["date"]] if "date" in columns else ""
+        frame["desc"] = chunk[columns["desc"]] if "desc" in columns else ""
 
-Return only a concise category such as:
-Food, Groceries, Transport, Rent, EMI, Shopping, Salary, Utilities, Others.
-"""
-    category = call_llm(
-        prompt, "You are a classification engine for bank transactions."
+        if "amount" in columns:
+            frame["amount"] = _coerce_amounts(chunk[columns["amount"]])
+        elif "debit" in columns or "credit" in columns:
+            credit = _coerce_amounts(chunk.get(columns.get("credit"), _blank(chunk)))
+            debit = _coerce_amounts(chunk.get(columns.get("debit"), _blank(chunk)))
+            # NaN (unparseable) on either side propagates and drops the row
+            frame["amount"] = credit.abs() - debit.abs()
+        else:
+            frame["amount"] = 0.0
+
+        frame = frame[frame["amount"].notna()]
+        frame = frame.reset_index(drop=True)
+        # Statements repeat merchants heavily; match each distinct text once
+        codes, uniques = pd.factorize(frame["desc"])
+        matched = np.array(rules.match_many(list(uniques)) + [None], dtype=object)
+        frame["category"] = pd.Series(matched[codes], dtype=object)
+        yield frame
+
+
+def _resolve_columns(header: Iterable[str]) -> Dict[str, str]:
+    normalized: Dict[str, str] = {}
+    for name in header:
+        normalized.setdefault(str(name).strip().rstrip(".").strip().lower(), name)
+    columns: Dict[str, str] = {}
+    for canonical, aliases in HEADER_ALIASES.items():
+        for alias in aliases:
+            if alias in normalized:
+                columns[canonical] = normalized[alias]
+                break
+    return columns
+
+
+def _blank(chunk: pd.DataFrame) -> pd.Series:
+    return pd.Series("", index=chunk.index, dtype=object)
+
+
+def _coerce_amounts(raw: pd.Series) -> pd.Series:
+    """Vectorized string -> float; blank cells are 0, garbage is NaN."""
+
+    text = raw.astype(str).str.strip()
+    values = pd.to_numeric(text, errors="coerce").astype(float)
+    # Only cells that are not plain numbers pay for the regex clean-up
+    dirty = values.isna() & (text != "")
+    if dirty.any():
+        messy = text[dirty]
+        suffix = messy.str.extract(_DR_CR_SUFFIX, expand=False).str.lower()
+        cleaned = messy.str.replace(_DR_CR_SUFFIX, "", regex=True)
+        cleaned = cleaned.str.replace(_AMOUNT_NOISE, "", regex=True)
+        fixed = pd.to_numeric(cleaned, errors="coerce").astype(float)
+        fixed = fixed.where(suffix != "dr", -fixed.abs())
+        fixed = fixed.where(suffix != "cr", fixed.abs())
+        values[dirty] = fixed
+    return values.mask(text == "", 0.0)
+
+
+def categorize_batch(
+    items: List[Tuple[str, float]],
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, str]:
+    """Categorize many (description, amount) pairs with batched LLM calls.
+
+    Descriptions are deduplicated by normalized merchant and looked up in
+    the category cache first. The remaining merchants are split into chunks
+    of ``settings.categorize_batch_size`` and sent concurrently (at most
+    ``settings.categorize_concurrency`` in flight); their answers are written
+    back to the cache. ``progress(done, total)`` is called as chunks finish.
+    Returns a mapping of description -> category; descriptions the LLM gave
+    no usable answer for are left out.
+    """
+
+    keys: Dict[str, str] = {}
+    known: Dict[str, str] = {}
+    pending: Dict[str, Tuple[str, float]] = {}
+    for desc, amount in items:
+        if desc in keys:
+            continue
+        key = keys[desc] = normalize_merchant(desc)
+        if key in known or key in pending:
+            continue
+        cached = category_cache.get(key)
+        if cached:
+            known[key] = cached
+        else:
+            pending[key] = (desc, amount)
+    metrics.record_cache("category", True, len(known))
+    metrics.record_cache("category", False, len(pending))
+
+    if pending:
+        pairs = list(pending.items())
+        size = max(1, settings.categorize_batch_size)
+        batches = [pairs[i : i + size] for i in range(0, len(pairs), size)]
+        workers = max(1, min(settings.categorize_concurrency, len(batches)))
+        learned: List[Tuple[str, str]] = []
+        # Workers run in a copy of this context so metrics keep their labels
+        ctx = contextvars.copy_context()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            chunks = pool.map(
+                lambda batch: ctx.copy().run(_categorize_chunk, batch),
+                [[p for _, p in b] for b in batches],
+            )
+            for done, (batch, cats) in enumerate(zip(batches, chunks), 1):
+                for (key, _), cat in zip(batch, cats):
+                    known[key] = cat
+                    if cat is not None:
+                        learned.append((key, cat))
+                if progress is not None:
+                    progress(done, len(batches))
+        category_cache.put_many(learned)
+
+    return {desc: known[key] for desc, key in keys.items() if known.get(key)}
+
+
+def _categorize_chunk(batch: List[Tuple[str, float]]) -> List[Optional[str]]:
+    lines = "\n".join(
+        f"{i}. {desc} | {amount}" for i, (desc, amount) in enumerate(batch)
     )
-    return (category or "Others").splitlines()[0]
+    prompt = f"""
+You are categorizing bank transactions. Each line is "index. description | amount".
 
+{lines}
 
-def parse_payslip_text(text: str) -> Dict[str, Any]:
-    """Very simple regex-based extraction from payslip text."""
+Allowed categories: {", ".join(CATEGORIES)}.
 
-    def find_number(label_pattern: str) -> float:
-        match = re.search(
-            label_pattern + r".*?(\d[\d,]*)",
-            text,
-            re.IGNORECASE | re.DOTALL,
+Return ONLY a JSON array of {len(batch)} strings, where element i is the category
+for transaction i. No explanations, no markdown.
+"""
+    try:
+        raw = call_llm(
+            prompt,
+            "You are a classification engine for bank transactions.",
+            cache=False,
         )
-        if not match:
-            return 0.0
-        return float(match.group(1).replace(",", ""))
+    except Exception:
+        # Leave these uncached so the next upload retries them
+        return [None] * len(batch)
+    return _parse_categories(raw, len(batch))
 
-    basic = find_number("Basic")
-    hra = find_number("HRA")
-    pf = find_number("PF")
-    tds = find_number("TDS|Tax Deducted|Income Tax")
 
-    income = basic + hra
+_CANONICAL = {c.lower(): c for c in CATEGORIES}
+
+
+def _canonical_category(value: Any) -> Optional[str]:
+    """The ``CATEGORIES`` spelling of an LLM answer, or None if it is not one."""
+
+    text = str(value).strip().strip("\"'`*").rstrip(".").strip().lower()
+    return _CANONICAL.get(text)
+
+
+def _parse_categories(raw: str, expected: int) -> List[Optional[str]]:
+    """Categories from a JSON array reply; None wherever the reply is
+    malformed, truncated or not an allowed category, so those merchants
+    are not cached and get asked again."""
+
+    text = (raw or "").strip()
+    # Tolerate ```json fences around the array
+    start, end = text.find("["), text.rfind("]")
+    try:
+        values = json.loads(text[start : end + 1]) if start != -1 else []
+    except ValueError:
+        values = []
+    if not isinstance(values, list):
+        values = []
+    return [
+        _canonical_category(values[i]) if i < len(values) else None
+        for i in range(expected)
+    ]
+
+
+def parse_payslip_text(text: str) -> Dict[str, Any]:
+    """Regex-based extraction from payslip text (see ``app.payslips``)."""
+
+    fields = extract_fields(text)
     return {
-        "income": income,
+        "income": slip_income(fields),
         "payslip_info": {
-            "basic": basic,
-            "hra": hra,
-            "pf": pf,
-            "tax_deducted": tds,
+            "basic": fields.get("basic", 0.0),
+            "hra": fields.get("hra", 0.0),
+            "pf": fields.get("pf", 0.0),
+            "tax_deducted": fields.get("tds", 0.0),
+            "gross": fields.get("gross", 0.0),
+            "net": fields.get("net", 0.0),
+            "period": fields.get("period"),
         },
     }
-
-
@@ -1,24 +1,52 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
+from app import metrics
+from app.aggregates import statement_aggregates
+from app.llm_cache import bucket
 from app.llm_client import call_llm
+from app.projections import project_sip
 
 
-def build_investment_plan(parsed: Dict[str, Any]) -> Dict[str, Any]:
-    """Allocate surplus into simple buckets and explain."""
+DEFAULT_HORIZON_YEARS = 10
+
+
+def build_investment_plan(
+    parsed: Dict[str, Any],
+    horizon_years: int = DEFAULT_HORIZON_YEARS,
+    goal_amount: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Allocate surplus into simple buckets, project it and explain."""
+
+    facts = investment_facts(parsed, horizon_years, goal_amount)
+    with metrics.stage("narrative"):
+        facts["narrative"] = call_llm(investment_prompt(facts))
+    return facts
+
+
+@metrics.timed("agent_facts")
+def investment_facts(
+    parsed: Dict[str, Any],
+    horizon_years: int = DEFAULT_HORIZON_YEARS,
+    goal_amount: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Deterministic part of the plan: surplus, bucket allocation and the
+    Monte Carlo projection of that allocation as a monthly SIP."""
 
     income = float(parsed.get("income", 0.0))
-    txs = parsed.get("transactions", [])
+    total_expense = statement_aggregates(parsed)["total_expense"]
+    emergency_fund = float(parsed.get("emergencyFund", 0.0))
+    facts = _allocate(income, total_expense, emergency_fund)
+    goals = [goal_amount] if goal_amount else []
+    facts["projection"] = project_sip(facts["allocation"], horizon_years, goals)
+    return facts
 
-    total_expense = 0.0
-    for t in txs:
-        amt = float(t.get("amount", 0.0))
-        if amt < 0:
-            total_expense += -amt
 
+def _allocate(
+    income: float, total_expense: float, emergency_fund: float
+) -> Dict[str, Any]:
     surplus = max(0.0, income - total_expense)
-    emergency_fund = float(parsed.get("emergencyFund", 0.0))
     min_emergency = income * 3
 
     can_invest = max(0.0, surplus - max(0.0, min_emergency - emergency_fund) / 12.0)
@@ -28,35 +56,79 @@ def build_investment_plan(parsed: Dict[str, Any]) -> Dict[str, Any]:
     gold = can_invest * 0.1
     liquid = can_invest * 0.1
 
-    mock_market = {
-        "nifty_50": {"1y_return": 0.14},
-        "short_term_debt": {"1y_return": 0.07},
-        "gold": {"1y_return": 0.10},
-        "liquid_fund": {"1y_return": 0.05},
+    return {
+        "income": income,
+        "total_expense": total_expense,
+        "surplus": surplus,
+        "investible": can_invest,
+        "emergency_fund": emergency_fund,
+        "min_emergency": min_emergency,
+        "allocation": {
+            "equity_sip": equity,
+            "debt_fd": debt,
+            "gold": gold,
+            "liquid": liquid,
+        },
     }
 
-    prompt = f"""
+
+def _projection_lines(
+    allocation: Dict[str, float], projection: Dict[str, Any]
+) -> str:
+    if not projection:
+        return "- No projection: nothing is investible yet."
+    goals = [g["amount"] for g in projection["goals"][1:]]
+    shown = project_sip(allocation, projection["years"], goals)
+    if not shown:
+        return "- No projection: nothing is investible yet."
+    final = shown["final"]
+    lines = [
+        f"- Horizon: {shown['years']} years, total invested {shown['invested']}",
+        f"- Value at the end: pessimistic (10th percentile) {final['p10']}, "
+        f"median {final['p50']}, optimistic (90th percentile) {final['p90']}",
+        f"- Chance of ending above the amount invested: "
+        f"{shown['goals'][0]['probability']:.0%}",
+    ]
+    for goal in shown["goals"][1:]:
+        lines.append(
+            f"- Chance of reaching the user's goal of {goal['amount']}: "
+            f"{goal['probability']:.0%}"
+        )
+    return "\n".join(lines)
+
+
+def investment_prompt(facts: Dict[str, Any]) -> str:
+    # Rebuilt from bucketed inputs so nearby inputs share a cached answer
+    shown = _allocate(
+        bucket(facts["income"]),
+        bucket(facts["total_expense"]),
+        bucket(facts["emergency_fund"]),
+    )
+    allocation = shown["allocation"]
+    return f"""
 You are a calm, long-term focused investment advisor for Indian salaried users.
 
 CONTEXT
-- Monthly income: {income}
-- Total expenses: {total_expense}
-- Monthly surplus: {surplus}
-- Existing emergency fund: {emergency_fund}
-- Minimum recommended emergency fund (~3 months): {min_emergency}
+- Monthly income: {shown["income"]}
+- Total expenses: {shown["total_expense"]}
+- Monthly surplus: {shown["surplus"]}
+- Existing emergency fund: {shown["emergency_fund"]}
+- Minimum recommended emergency fund (~3 months): {shown["min_emergency"]}
 
 Proposed monthly allocation from investible surplus:
-- Equity index SIP: {equity}
-- Debt / FD: {debt}
-- Gold: {gold}
-- Liquid fund: {liquid}
+- Equity index SIP: {allocation["equity_sip"]}
+- Debt / FD: {allocation["debt_fd"]}
+- Gold: {allocation["gold"]}
+- Liquid fund: {allocation["liquid"]}
 
-Mock market data (approx 1y return): {mock_market}
+Monte Carlo projection of this SIP (simulated, assumes long-run returns of
+equity 12%, debt 7%, gold 9%, liquid 5.5% a year with realistic volatility):
+{_projection_lines(allocation, facts["projection"])}
 
 GUARDRAILS
 - Do NOT recommend specific stock symbols, PMS, or individual mutual fund names.
 - Only use broad types: index fund, flexi-cap, debt fund, FD, gold ETF, liquid fund.
-- Make it clear that returns are not guaranteed and are just historical examples.
+- Make it clear that returns are not guaranteed and the projection is a simulation, not a forecast.
 - Do not encourage taking loans or using credit cards to invest.
 
 OUTPUT FORMAT (PLAIN TEXT, NO MARKDOWN)
@@ -69,21 +141,4 @@ OUTPUT FORMAT (PLAIN TEXT, NO MARKDOWN)
 - Do NOT use markdown like **bold**, numbered lists, or tables.
 """
 
-    narrative = call_llm(prompt)
-
-    return {
-        "income": income,
-        "total_expense": total_expense,
-        "surplus": surplus,
-        "investible": can_invest,
-        "allocation": {
-            "equity_sip": equity,
-            "debt_fd": debt,
-            "gold": gold,
-            "liquid": liquid,
-        },
-        "mock_market": mock_market,
-        "narrative": narrative,
-    }
-
 
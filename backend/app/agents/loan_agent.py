@@ -2,9 +2,17 @@ from __future__ import annotations
 
 from typing import Any, Dict
 
+from app import metrics
+from app.amortization import cibil_band, cibil_rate, default_grid, principal_for_emi
+from app.llm_cache import bucket
 from app.llm_client import call_llm
 
 
+# Share of income all EMIs together may take (fixed obligations to income)
+FOIR = 0.4
+DEFAULT_TENURE_MONTHS = 60
+
+
 def loan_eligibility(
     monthly_income: float,
     existing_emi: float,
@@ -12,22 +20,72 @@ def loan_eligibility(
 ) -> Dict[str, Any]:
     """Compute simple EMI and loan eligibility and explain it."""
 
-    max_emi = monthly_income * 0.4 - existing_emi
+    facts = loan_facts(monthly_income, existing_emi, cibil)
+    with metrics.stage("narrative"):
+        facts["narrative"] = call_llm(loan_prompt(facts))
+    return facts
+
+
+@metrics.timed("agent_facts")
+def loan_facts(
+    monthly_income: float,
+    existing_emi: float,
+    cibil: int,
+    tenure_months: int = DEFAULT_TENURE_MONTHS,
+) -> Dict[str, Any]:
+    """Deterministic part of the eligibility check: the EMI the 40% FOIR
+    rule leaves, the loan it repays at the CIBIL band rate over
+    ``tenure_months``, and the affordability matrix across tenures and
+    rates (see ``app.amortization``)."""
+
+    max_emi = monthly_income * FOIR - existing_emi
     if max_emi < 0:
         max_emi = 0.0
 
-    loan_amount = max_emi * 60  # 5-year loan
-    interest = 0.12
+    interest = cibil_rate(cibil)
+    loan_amount = principal_for_emi(max_emi, interest, tenure_months)
 
-    prompt = f"""
+    return {
+        "monthly_income": monthly_income,
+        "existing_emi": existing_emi,
+        "max_emi": max_emi,
+        "loan_amount": round(loan_amount, 2),
+        "interest_rate_assumed": interest,
+        "tenure_months": tenure_months,
+        "total_interest": round(max_emi * tenure_months - loan_amount, 2),
+        "cibil_score": cibil,
+        "cibil_band": cibil_band(cibil),
+        "affordability": default_grid(max_emi, interest),
+    }
+
+
+def _tenure_label(months: int) -> str:
+    """Tenure as "5 yrs" for whole years, else "30 months"."""
+
+    if months % 12:
+        return f"{months} months"
+    years = months // 12
+    return f"{years} yr" if years == 1 else f"{years} yrs"
+
+
+def loan_prompt(facts: Dict[str, Any]) -> str:
+    # Amounts shown are bucketed so nearby inputs share a cached answer
+    shown = {
+        **facts,
+        **{
+            key: bucket(facts[key])
+            for key in ("monthly_income", "existing_emi", "max_emi", "loan_amount")
+        },
+    }
+    return f"""
 You are a cautious Indian bank loan officer explaining in simple language.
 
 CONTEXT
-- Monthly income: {monthly_income}
-- Existing EMIs: {existing_emi}
-- CIBIL score: {cibil}
-- Max EMI allowed by 40% rule: {max_emi}
-- Approx loan amount possible (5 yrs @12%): {loan_amount}
+- Monthly income: {shown["monthly_income"]}
+- Existing EMIs: {shown["existing_emi"]}
+- CIBIL score: {shown["cibil_score"]}
+- Max EMI allowed by 40% rule: {shown["max_emi"]}
+- Approx loan amount possible ({_tenure_label(shown["tenure_months"])} @{shown["interest_rate_assumed"] * 100:g}%, {shown["cibil_band"]} CIBIL band): {shown["loan_amount"]}
 
 GUARDRAILS
 - Treat all amounts as rough eligibility, not a promise or sanction.
@@ -45,14 +103,4 @@ OUTPUT FORMAT (PLAIN TEXT, NO MARKDOWN)
 - Do NOT use **bold** or markdown formatting.
 """
 
-    narrative = call_llm(prompt)
-
-    return {
-        "max_emi": max_emi,
-        "loan_amount": loan_amount,
-        "interest_rate_assumed": interest,
-        "narrative": narrative,
-        "cibil_score": cibil,
-    }
-
 
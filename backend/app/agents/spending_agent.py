@@ -1,30 +1,29 @@
 from __future__ import annotations
 
-from collections import defaultdict
 from typing import Any, Dict
 
+from app import aggregates, metrics
 from app.llm_client import call_llm
 
 
 def build_spending_plan(parsed: Dict[str, Any]) -> Dict[str, Any]:
     """Compute spending summary, red flags, and suggested plan."""
 
-    income = float(parsed.get("income", 0.0))
-    txs = parsed.get("transactions", [])
+    facts = spending_facts(parsed)
+    with metrics.stage("narrative"):
+        facts["narrative"] = call_llm(spending_prompt(facts))
+    return facts
 
-    category_totals: Dict[str, float] = defaultdict(float)
-    total_expense = 0.0
 
-    for t in txs:
-        amt = float(t.get("amount", 0.0))
-        if amt < 0:
-            total_expense += -amt
-            category_totals[str(t.get("category", "Others"))] += -amt
+@metrics.timed("agent_facts")
+def spending_facts(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    """Deterministic part of the spending plan: totals, shares, red flags."""
 
-    category_percent = {
-        cat: (val / total_expense * 100 if total_expense else 0.0)
-        for cat, val in category_totals.items()
-    }
+    income = float(parsed.get("income", 0.0))
+    agg = aggregates.statement_aggregates(parsed)
+    category_totals = agg["category_expense"]
+    total_expense = agg["total_expense"]
+    category_percent = aggregates.category_percent(agg)
 
     flags = []
     if category_percent.get("Food", 0.0) > 20.0:
@@ -34,14 +33,23 @@ def build_spending_plan(parsed: Dict[str, Any]) -> Dict[str, Any]:
     if float(parsed.get("emergencyFund", 0.0)) < income * 2:
         flags.append("LOW EMERGENCY FUND – less than 2 months of income saved.")
 
-    prompt = f"""
+    return {
+        "income": income,
+        "total_expense": total_expense,
+        "category_percent": category_percent,
+        "red_flags": flags,
+    }
+
+
+def spending_prompt(facts: Dict[str, Any]) -> str:
+    return f"""
 You are a disciplined but friendly Indian personal finance coach.
 
 CONTEXT
-- Monthly income (approx): {income}
-- Total monthly expenses: {total_expense}
-- Category % spend: {category_percent}
-- Detected red flags: {flags}
+- Monthly income (approx): {facts["income"]}
+- Total monthly expenses: {facts["total_expense"]}
+- Category % spend: {facts["category_percent"]}
+- Detected red flags: {facts["red_flags"]}
 
 INSTRUCTIONS
 - Audience is an Indian salaried person in their 20s or 30s.
@@ -58,14 +66,5 @@ OUTPUT FORMAT (PLAIN TEXT, NO MARKDOWN)
 - Keep each bullet to max 2 short sentences.
 - Do NOT use markdown syntax like **bold** or numbered lists; only plain text bullets.
 """
-    narrative = call_llm(prompt)
-
-    return {
-        "income": income,
-        "total_expense": total_expense,
-        "category_percent": category_percent,
-        "red_flags": flags,
-        "narrative": narrative,
-    }
 
 
@@ -1,8 +1,19 @@
 from __future__ import annotations
 
+import json
 from typing import Any, Dict, List, Tuple
 
-from app.llm_client import call_llm
+from app import metrics
+from app.llm_cache import bucket
+from app.llm_client import call_llm, call_llm_async
+from app.models import TaxAnswer
+from app.tax_engine import DEDUCTION_LABELS, plan_taxes
+from app.tax_answers import (
+    TOPIC_FIELDS,
+    extract_tax_answer,
+    merge_answers,
+    parse_llm_answer,
+)
 
 
 QUESTIONS: List[Tuple[str, str]] = [
@@ -16,17 +27,65 @@ QUESTIONS: List[Tuple[str, str]] = [
 
 
 def get_next_question(state: Dict[str, Any]) -> str | None:
+    key = next_question_key(state)
+    return dict(QUESTIONS)[key] if key else None
+
+
+def next_question_key(state: Dict[str, Any]) -> str | None:
     answers = state.setdefault("tax_questions", {})
-    for key, q in QUESTIONS:
+    for key, _ in QUESTIONS:
         if key not in answers or answers[key] is None:
-            return q
+            return key
     return None
 
 
+@metrics.timed("tax_extract")
 def record_tax_answer(state: Dict[str, Any], user_message: str) -> None:
-    """Parse free-form user answer into structured info using LLM."""
+    """Parse free-form user answer into structured info: rules first, the
+    LLM only when they are not confident."""
+
+    key = next_question_key(state)
+    answer, confident = extract_tax_answer(user_message, key)
+    if not confident:
+        llm = parse_llm_answer(call_llm(tax_answer_prompt(user_message)))
+        answer = merge_answers(answer, llm)
+    _store_tax_answer(state, key, answer, "rules" if confident else "llm")
+
+
+async def record_tax_answer_async(state: Dict[str, Any], user_message: str) -> None:
+    with metrics.stage("tax_extract"):
+        key = next_question_key(state)
+        answer, confident = extract_tax_answer(user_message, key)
+        if not confident:
+            raw = await call_llm_async(tax_answer_prompt(user_message))
+            answer = merge_answers(answer, parse_llm_answer(raw))
+        _store_tax_answer(state, key, answer, "rules" if confident else "llm")
+
+
+def _store_tax_answer(
+    state: Dict[str, Any], key: str | None, answer: TaxAnswer, method: str
+) -> None:
+    """Merge ``answer`` into ``state["tax_parsed"]`` and mark as answered the
+    asked question plus any other the reply covered ("rent 25k, no loan")."""
+
+    metrics.TAX_ANSWERS.inc(method=method)
+    parsed = {k: v for k, v in answer.model_dump().items() if v is not None}
+    previous = state.get("tax_parsed")
+    state["tax_parsed"] = {
+        # Sessions from before answers were structured hold the raw LLM text
+        **(previous if isinstance(previous, dict) else {}),
+        **parsed,
+    }
+    answers = state.setdefault("tax_questions", {})
+    for topic, fields in TOPIC_FIELDS.items():
+        covered = {f: parsed[f] for f in fields if f in parsed}
+        if covered or topic == key:
+            # Asked and still unclear: recorded anyway so the flow moves on
+            answers[topic] = covered or {"unclear": True}
 
-    prompt = f"""
+
+def tax_answer_prompt(user_message: str) -> str:
+    return f"""
 You are an information extraction engine.
 
 User answer (free text): {user_message}
@@ -38,46 +97,137 @@ REQUIRED KEYS
 - rent_amount: monthly rent as number (no commas) or null.
 - rent_city: string city name or null.
 - health_premium: yearly health insurance premium (number) or null.
-- has_home_loan: true/false.
+- pays_rent: true/false, or null if not mentioned.
+- has_health_insurance: true/false, or null if not mentioned.
+- has_home_loan: true/false, or null if not mentioned.
 - home_loan_emi: monthly home loan EMI (number) or null.
 - home_loan_interest_year: yearly interest component (number) or null.
+- has_education_loan: true/false, or null if not mentioned.
+- education_loan_emi: monthly education loan EMI (number) or null.
+- education_loan_interest_year: yearly education loan interest (number) or null.
+- loan_amount: outstanding loan principal (number) or null.
 
 RULES
 - If information is not clearly present, set that field to null (do NOT guess).
 - Do not add any extra keys.
 - Output ONLY valid JSON, no comments, no trailing commas, no explanations.
 """
-    parsed = call_llm(prompt)
-    state["tax_parsed"] = parsed
 
 
 def compute_tax_plan(state: Dict[str, Any], annual_income: float) -> Dict[str, Any]:
-    """Very rough comparison of old vs new regime for demo."""
-
-    # POC: super-simplified slabs; not real tax logic.
-    old_tax = annual_income * 0.15
-    new_tax = annual_income * 0.12
-
-    explanation_prompt = f"""
+    """Old vs new regime from the slab engine, narrated by the LLM."""
+
+    facts = tax_facts(state, annual_income)
+    with metrics.stage("narrative"):
+        facts["recommendation"] = call_llm(tax_prompt(state, facts))
+    return facts
+
+
+@metrics.timed("agent_facts")
+def tax_facts(state: Dict[str, Any], annual_income: float) -> Dict[str, Any]:
+    """Both regimes' tax for the user's answers and payslips, the cheaper
+    one and what each deduction top-up would save (``app.tax_engine``)."""
+
+    answers = state.get("tax_parsed")
+    payslip = state.get("payslip")
+    facts = {
+        "annual_income": annual_income,
+        # Sessions from before answers were structured hold the raw LLM text
+        **plan_taxes(
+            annual_income, answers if isinstance(answers, dict) else {}, payslip
+        ),
+    }
+    if payslip:
+        best = min(facts["old_regime_tax"], facts["new_regime_tax"])
+        facts["tds_deducted"] = payslip["annual_tds"]
+        facts["pf_contribution"] = payslip["annual_pf"]
+        facts["balance_due"] = round(best - payslip["annual_tds"])
+    return facts
+
+
+def _regime_lines(facts: Dict[str, Any]) -> str:
+    lines = []
+    for regime, detail in facts["regimes"].items():
+        lines.append(
+            f"- {regime.title()} regime: deductions {detail['deductions']}, "
+            f"taxable income {detail['taxable_income']}, rebate {detail['rebate']}, "
+            f"tax incl. cess {detail['total']}"
+        )
+    return "\n".join(lines)
+
+
+def _headroom_lines(facts: Dict[str, Any]) -> str:
+    lines = []
+    for name, room in facts["headroom"].items():
+        if name == "all_top_ups":
+            lines.append(
+                f"- Every top-up above at its cap: best tax {room['tax_at_cap']} "
+                f"({room['regime_at_cap']} regime), saving {room['saving_at_cap']}"
+            )
+            continue
+        wins = room["old_regime_wins_from"]
+        lines.append(
+            f"- {DEDUCTION_LABELS[name]}: claimed {room['claimed']} of "
+            f"{room['cap']:.0f}; topping up to the cap saves "
+            f"{room['old_regime_saving_at_cap']} under the old regime and "
+            f"{room['saving_at_cap']} overall"
+            + (f"; old regime wins from a top-up of {wins}" if wins is not None else "")
+        )
+    return "\n".join(lines)
+
+
+def _bucketed(value: Any) -> Any:
+    """``value`` with every amount in it bucketed (rates are left alone)."""
+
+    if isinstance(value, dict):
+        return {
+            k: v if k == "marginal_saving_rate" else _bucketed(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [_bucketed(v) for v in value]
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    return int(bucket(value)) if isinstance(value, int) else bucket(value)
+
+
+def tax_prompt(state: Dict[str, Any], facts: Dict[str, Any]) -> str:
+    # Amounts shown are bucketed so nearby inputs share a cached answer
+    shown = _bucketed(facts)
+    payslip = ""
+    if "tds_deducted" in shown:
+        payslip = (
+            f"- From payslips, per year: TDS already deducted "
+            f"{shown['tds_deducted']}, PF contribution "
+            f"{shown['pf_contribution']}; balance due in the better regime "
+            f"{shown['balance_due']} (negative means a refund)\n"
+        )
+    claimed = {
+        DEDUCTION_LABELS[k]: v for k, v in shown["deductions_claimed"].items()
+    }
+    assumptions = "; ".join(shown["assumptions"]) or "none"
+    return f"""
 You are an Indian tax consultant explaining in simple Hindi+English mix (Hinglish).
 
-CONTEXT
-- Approx annual income: {annual_income}
-- Old regime tax (rough): {old_tax}
-- New regime tax (rough): {new_tax}
-- Parsed user deductions (raw JSON string, may be partial): {state.get("tax_parsed")}
+CONTEXT (computed with FY 2025-26 slabs, rebate, surcharge and 4% cess)
+- Approx annual salary: {shown["annual_income"]}
+- Deductions claimed from the user's answers and payslips: {json.dumps(claimed)}
+{_regime_lines(shown)}
+- Better regime: {shown["recommended_regime"]}, saves {shown["regime_saving"]} a year
+{payslip}- Assumptions made: {assumptions}
+
+DEDUCTION HEADROOM (already computed)
+{_headroom_lines(shown)}
 
 LIMITATIONS
-- This is a hackathon demo; you must treat all tax numbers as rough estimates only.
-- Do NOT quote exact slab-by-slab sections or pretend to be official advice.
+- Use ONLY the numbers above; do not recompute tax or quote other figures.
+- Treat them as estimates for a salaried individual under 60.
 - Clearly state that this is not tax filing advice.
 
 TASK
-- Choose which regime (old/new) seems better given deductions and say why.
-- Explicitly mention which of these 6 the user is likely under-using or missing:
-  80C (investments), 80D (health insurance), HRA (if renting), home loan interest,
-  standard deduction, PF contribution.
-- Give 3–5 action bullets for next financial year.
+- Say which regime is better and by how much, and why (deductions vs lower slabs).
+- Mention which deductions the user is under-using and what topping them up is worth.
+- Give 3–5 action bullets for the rest of this financial year.
 
 OUTPUT FORMAT (PLAIN TEXT, NO MARKDOWN)
 - First line: 1 short sentence: "Old regime looks better because ..." or "New regime looks better because ...".
@@ -88,12 +238,3 @@ OUTPUT FORMAT (PLAIN TEXT, NO MARKDOWN)
 - Keep bullets concise (max 2 short sentences).
 - Do NOT use **bold** or markdown headings.
 """
-    explanation = call_llm(explanation_prompt)
-
-    return {
-        "old_regime_tax": old_tax,
-        "new_regime_tax": new_tax,
-        "recommendation": explanation,
-    }
-
-
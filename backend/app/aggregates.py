@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from app.category_cache import normalize_merchant
+
+
+_ISO_DATE = re.compile(r"^(\d{4})[-/.](\d{1,2})")
+_DMY_DATE = re.compile(r"^(\d{1,2})[-/.](\d{1,2})[-/.](\d{2,4})")
+
+# Merchants kept in compact views (session state, prompts)
+TOP_MERCHANTS = 10
+
+
+def month_of(date: str) -> str:
+    """``YYYY-MM`` for ISO or day-first (Indian bank) dates, else ``""``."""
+
+    date = (date or "").strip()
+    m = _ISO_DATE.match(date)
+    if m:
+        return f"{m.group(1)}-{int(m.group(2)):02d}"
+    m = _DMY_DATE.match(date)
+    if m:
+        year = m.group(3)
+        if len(year) == 2:
+            year = "20" + year
+        return f"{year}-{int(m.group(2)):02d}"
+    return ""
+
+
+def empty_aggregates() -> Dict[str, Any]:
+    """Running totals for a set of transactions.
+
+    Expenses are the negated negative amounts, income the positive ones.
+    Everything is a sum or a count, so aggregates of two disjoint sets of
+    transactions can be merged exactly (see ``merge_aggregates``).
+    """
+
+    return {
+        "income": 0.0,
+        "total_expense": 0.0,
+        "transaction_count": 0,
+        "category_expense": {},
+        "merchant_expense": {},
+        "months": {},
+    }
+
+
+def _empty_month() -> Dict[str, Any]:
+    return {"income": 0.0, "expense": 0.0, "count": 0, "category_expense": {}}
+
+
+def _add(into: Dict[str, float], key: str, value: float) -> None:
+    into[key] = into.get(key, 0.0) + value
+
+
+def add_transactions(
+    agg: Dict[str, Any], transactions: Iterable[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Fold new transactions into ``agg`` in place (incremental update)."""
+
+    merchants: Dict[str, str] = {}
+    months = agg["months"]
+    for t in transactions:
+        amt = float(t.get("amount", 0.0))
+        month = months.setdefault(month_of(str(t.get("date", ""))), _empty_month())
+        agg["transaction_count"] += 1
+        month["count"] += 1
+        if amt > 0:
+            agg["income"] += amt
+            month["income"] += amt
+        elif amt < 0:
+            expense = -amt
+            cat = str(t.get("category") or "Others")
+            desc = str(t.get("desc", ""))
+            merchant = merchants.get(desc)
+            if merchant is None:
+                merchant = merchants[desc] = normalize_merchant(desc)
+            agg["total_expense"] += expense
+            month["expense"] += expense
+            _add(agg["category_expense"], cat, expense)
+            _add(month["category_expense"], cat, expense)
+            _add(agg["merchant_expense"], merchant, expense)
+    return agg
+
+
+def compute_aggregates(transactions: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    return add_transactions(empty_aggregates(), transactions)
+
+
+def merge_aggregates(into: Dict[str, Any], other: Dict[str, Any]) -> Dict[str, Any]:
+    """Add ``other``'s totals into ``into`` in place."""
+
+    into["income"] += other["income"]
+    into["total_expense"] += other["total_expense"]
+    into["transaction_count"] += other["transaction_count"]
+    for cat, value in other["category_expense"].items():
+        _add(into["category_expense"], cat, value)
+    for merchant, value in other["merchant_expense"].items():
+        _add(into["merchant_expense"], merchant, value)
+    for key, month in other["months"].items():
+        target = into["months"].setdefault(key, _empty_month())
+        target["income"] += month["income"]
+        target["expense"] += month["expense"]
+        target["count"] += month["count"]
+        for cat, value in month["category_expense"].items():
+            _add(target["category_expense"], cat, value)
+    return into
+
+
+def frame_aggregates(frame: pd.DataFrame) -> Dict[str, Any]:
+    """Vectorized ``compute_aggregates`` for a ``date, desc, amount,
+    category`` DataFrame (as produced by ``read_bank_frames``)."""
+
+    agg = empty_aggregates()
+    if frame.empty:
+        return agg
+
+    amount = frame["amount"].astype(float)
+    expense = (-amount).clip(lower=0.0)
+    income = amount.clip(lower=0.0)
+    spent = expense > 0
+
+    # Dates and descriptions repeat a lot: work on distinct values only
+    codes, uniques = pd.factorize(frame["date"].astype(str))
+    month = pd.Series([month_of(u) for u in uniques], dtype=object).take(codes)
+    month.index = frame.index
+    category = frame["category"].fillna("Others").astype(str)
+
+    agg["income"] = float(income.sum())
+    agg["total_expense"] = float(expense.sum())
+    agg["transaction_count"] = int(len(frame))
+    agg["category_expense"] = _as_dict(expense[spent].groupby(category[spent]).sum())
+
+    codes, uniques = pd.factorize(frame.loc[spent, "desc"].astype(str))
+    merchant = pd.Series([normalize_merchant(u) for u in uniques], dtype=object)
+    merchant = merchant.take(codes)
+    merchant.index = frame.index[spent]
+    agg["merchant_expense"] = _as_dict(expense[spent].groupby(merchant).sum())
+
+    per_month = pd.DataFrame({"income": income, "expense": expense}).groupby(month)
+    sums = per_month.sum()
+    counts = per_month.size()
+    by_month_cat = expense[spent].groupby([month[spent], category[spent]]).sum()
+    for key in sums.index:
+        agg["months"][key] = {
+            "income": float(sums.at[key, "income"]),
+            "expense": float(sums.at[key, "expense"]),
+            "count": int(counts[key]),
+            "category_expense": {},
+        }
+    for (key, cat), value in by_month_cat.items():
+        agg["months"][key]["category_expense"][cat] = float(value)
+    return agg
+
+
+def _as_dict(series: pd.Series) -> Dict[str, float]:
+    return {str(k): float(v) for k, v in series.items()}
+
+
+def statement_aggregates(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    """Aggregates stored with a parsed statement (or its session reference),
+    computed on the spot for documents parsed before they existed."""
+
+    agg = parsed.get("aggregates")
+    if agg is None:
+        agg = compute_aggregates(parsed.get("transactions", []))
+    return agg
+
+
+def category_percent(agg: Dict[str, Any]) -> Dict[str, float]:
+    total = agg["total_expense"]
+    return {
+        cat: (val / total * 100 if total else 0.0)
+        for cat, val in agg["category_expense"].items()
+    }
+
+
+def top_merchants(agg: Dict[str, Any], n: int = TOP_MERCHANTS) -> List[List[Any]]:
+    """``[[merchant, expense], ...]`` for the ``n`` biggest merchants."""
+
+    if "top_merchants" in agg:
+        return agg["top_merchants"][:n]
+    ranked = sorted(agg["merchant_expense"].items(), key=lambda kv: -kv[1])
+    return [[m, v] for m, v in ranked[:n]]
+
+
+def compact_aggregates(
+    agg: Dict[str, Any], top_n: Optional[int] = TOP_MERCHANTS
+) -> Dict[str, Any]:
+    """Aggregates without the per-merchant map (which grows with the
+    statement), keeping only the top merchants. Small enough for sessions."""
+
+    view = {k: v for k, v in agg.items() if k != "merchant_expense"}
+    view["top_merchants"] = top_merchants(agg, top_n or TOP_MERCHANTS)
+    return view
+
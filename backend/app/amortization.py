@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+
+# Indicative annual rates by CIBIL band: scores from the threshold up to the
+# next one get the rate. Below the first threshold (0 = no score given) the
+# flat assumption is used.
+CIBIL_THRESHOLDS = np.array([300, 650, 700, 750, 800])
+CIBIL_RATES = np.array([0.15, 0.125, 0.105, 0.09, 0.085])
+CIBIL_BANDS = ("poor", "fair", "good", "very good", "excellent")
+UNSCORED_RATE = 0.12
+
+# Affordability matrix axes: 1-30 year tenures, and lender rates around the
+# band rate (-1% to +3% in 0.5% steps)
+GRID_TENURES_MONTHS = np.arange(12, 361, 12)
+GRID_RATE_OFFSETS = np.arange(-0.01, 0.0301, 0.005)
+
+
+def cibil_rate(score: Any) -> Any:
+    """Annual rate for a CIBIL score (scalar or array)."""
+
+    scores = np.asarray(score)
+    band = np.searchsorted(CIBIL_THRESHOLDS, scores, side="right") - 1
+    rates = np.where(band >= 0, CIBIL_RATES[np.clip(band, 0, None)], UNSCORED_RATE)
+    return float(rates) if rates.ndim == 0 else rates
+
+
+def cibil_band(score: int) -> str:
+    band = int(np.searchsorted(CIBIL_THRESHOLDS, score, side="right")) - 1
+    return CIBIL_BANDS[band] if band >= 0 else "unscored"
+
+
+def _annuity_factor(annual_rate: Any, months: Any) -> np.ndarray:
+    """Present value of 1 per month for ``months`` at ``annual_rate``;
+    broadcasts, and is ``months`` itself at a zero rate."""
+
+    r = np.asarray(annual_rate, dtype=float) / 12
+    n = np.asarray(months, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factor = (1 - (1 + r) ** -n) / r
+    return np.where(r == 0, n, factor)
+
+
+def emi(principal: Any, annual_rate: Any, months: Any) -> Any:
+    """Equated monthly instalment; any argument may be an array."""
+
+    result = np.asarray(principal, dtype=float) / _annuity_factor(annual_rate, months)
+    return float(result) if result.ndim == 0 else result
+
+
+def principal_for_emi(monthly_emi: Any, annual_rate: Any, months: Any) -> Any:
+    """Largest loan an EMI of ``monthly_emi`` repays; any argument may be an
+    array."""
+
+    result = np.asarray(monthly_emi, dtype=float) * _annuity_factor(annual_rate, months)
+    return float(result) if result.ndim == 0 else result
+
+
+def eligibility_grid(
+    max_emi: float,
+    annual_rates: Sequence[float],
+    tenures_months: Sequence[int],
+) -> Dict[str, Any]:
+    """Affordable principal for every (rate, tenure) pair in one broadcast:
+    ``loan_amount[i][j]`` is for ``annual_rates[i]`` over
+    ``tenures_months[j]``. Rates are fractions (0.09 for 9%)."""
+
+    rates = np.asarray(annual_rates, dtype=float)
+    tenures = np.asarray(tenures_months, dtype=float)
+    principal = principal_for_emi(max(max_emi, 0.0), rates[:, None], tenures[None, :])
+    return {
+        "interest_rates": np.round(rates, 4).tolist(),
+        "tenures_months": tenures.astype(int).tolist(),
+        "loan_amount": np.round(principal).tolist(),
+    }
+
+
+def default_grid(max_emi: float, annual_rate: float) -> Dict[str, Any]:
+    """``eligibility_grid`` on the standard axes around ``annual_rate``."""
+
+    rates = np.clip(annual_rate + GRID_RATE_OFFSETS, 0.0, None)
+    return eligibility_grid(max_emi, rates, GRID_TENURES_MONTHS)
+
+
+def amortization_schedule(
+    principal: float,
+    annual_rate: float,
+    months: int,
+    yearly: bool = False,
+) -> Dict[str, Any]:
+    """Month-by-month split of each EMI into interest and principal, with the
+    balance after it, from the closed form (no running loop). ``yearly``
+    sums the rows per year of the loan instead."""
+
+    months = int(months)
+    if months <= 0 or principal <= 0:
+        return {"emi": 0.0, "total_interest": 0.0, "rows": []}
+
+    r = annual_rate / 12
+    instalment = emi(principal, annual_rate, months)
+    k = np.arange(months + 1, dtype=float)
+    if r:
+        growth = (1 + r) ** k
+        balance = principal * growth - instalment * (growth - 1) / r
+    else:
+        balance = principal - instalment * k
+    balance = np.clip(balance, 0.0, None)
+    interest = balance[:-1] * r
+    repaid = balance[:-1] - balance[1:]
+    payment = interest + repaid
+
+    period = np.arange(1, months + 1)
+    closing = balance[1:]
+    if yearly:
+        years = (period - 1) // 12
+        period = np.unique(years) + 1
+        interest = np.bincount(years, interest)
+        repaid = np.bincount(years, repaid)
+        payment = np.bincount(years, payment)
+        closing = closing[np.minimum(period * 12, months) - 1]
+
+    key = "year" if yearly else "month"
+    rows = [
+        {
+            key: int(p),
+            "payment": round(float(pay), 2),
+            "interest": round(float(i), 2),
+            "principal": round(float(c), 2),
+            "balance": round(float(b), 2),
+        }
+        for p, pay, i, c, b in zip(period, payment, interest, repaid, closing)
+    ]
+    return {
+        "emi": round(instalment, 2),
+        "total_interest": round(float(instalment * months - principal), 2),
+        "rows": rows,
+    }
+
+
+def schedule_for(
+    principal: float,
+    months: int,
+    annual_rate: Optional[float] = None,
+    cibil_score: int = 0,
+    yearly: bool = False,
+) -> Dict[str, Any]:
+    """``amortization_schedule`` at ``annual_rate``, else the CIBIL band
+    rate."""
+
+    rate = cibil_rate(cibil_score) if annual_rate is None else annual_rate
+    return {
+        "principal": principal,
+        "interest_rate": rate,
+        "tenure_months": int(months),
+        **amortization_schedule(principal, rate, months, yearly),
+    }
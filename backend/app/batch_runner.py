@@ -0,0 +1,284 @@
+"""Offline spending + investment analysis for many bank statements.
+
+    python -m app.batch_runner STATEMENTS... --out results.jsonl
+        [--manifest FILE] [--workers N] [--narratives] [--llm-concurrency N]
+        [--format jsonl|parquet] [--horizon-years N] [--restart]
+
+STATEMENTS are CSV files or directories (searched recursively for *.csv;
+the customer id is the path below the directory, without ``.csv``, or the
+file name for a file given directly). A ``--manifest`` CSV lists ``path``
+and optionally ``customer_id`` per row, paths relative to the manifest.
+Two different files with the same customer id are an error.
+
+Each statement is parsed (through the parse cache) and analysed in a
+process pool; only the numbers travel back. With ``--narratives`` the
+agents' LLM narratives are generated in this process, at most
+``--llm-concurrency`` at a time. Every finished customer is appended to a
+JSONL checkpoint (the output itself for JSONL), so an interrupted run
+picks up where it stopped; customers that failed are retried. Parquet
+output (needs ``pyarrow``) is written from the checkpoint at the end.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.agents.investment_agent import (
+    DEFAULT_HORIZON_YEARS,
+    investment_facts,
+    investment_prompt,
+)
+from app.agents.spending_agent import spending_facts, spending_prompt
+from app.llm_client import call_llm_async
+from app.parse_cache import bank_document_ref
+
+
+def _add(found: Dict[str, str], customer_id: str, path: str) -> None:
+    previous = found.get(customer_id)
+    if previous is not None and os.path.abspath(previous) != os.path.abspath(path):
+        raise ValueError(
+            f"customer id {customer_id!r} names both {previous} and {path}"
+        )
+    found[customer_id] = path
+
+
+def find_statements(
+    inputs: Iterable[str], manifest: Optional[str] = None
+) -> List[Tuple[str, str]]:
+    """(customer_id, path) for every statement named by ``inputs`` and the
+    ``manifest``, in a stable order.
+
+    Files found in a directory are keyed by their path relative to it
+    (``custA/statement``), files named directly by their stem. Two different
+    files with the same customer id raise ``ValueError``.
+    """
+
+    found: Dict[str, str] = {}
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                for name in files:
+                    if name.lower().endswith(".csv"):
+                        path = os.path.join(root, name)
+                        relative = os.path.splitext(os.path.relpath(path, item))[0]
+                        _add(found, relative.replace(os.sep, "/"), path)
+        else:
+            _add(found, os.path.splitext(os.path.basename(item))[0], item)
+    if manifest:
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                path = os.path.join(base, row["path"])
+                customer_id = row.get("customer_id") or os.path.splitext(
+                    os.path.basename(path)
+                )[0]
+                _add(found, customer_id, path)
+    return sorted(found.items())
+
+
+def analyse_statement(
+    customer_id: str, path: str, horizon_years: int
+) -> Dict[str, Any]:
+    """Parse one statement and run the deterministic spending and investment
+    analysis (runs in a worker process)."""
+
+    start = time.perf_counter()
+    try:
+        ref = bank_document_ref(path)
+        parsed_s = time.perf_counter() - start
+        return {
+            "customer_id": customer_id,
+            "path": path,
+            "status": "ok",
+            "doc_id": ref["doc_id"],
+            "transactions": ref["transaction_count"],
+            "uncategorized": ref["uncategorized"],
+            "spending": spending_facts(ref),
+            "investment": investment_facts(ref, horizon_years),
+            "parse_s": round(parsed_s, 4),
+            "analyse_s": round(time.perf_counter() - start - parsed_s, 4),
+        }
+    except Exception as exc:
+        return {
+            "customer_id": customer_id,
+            "path": path,
+            "status": "error",
+            "error": f"{type(exc).__name__}: {exc}",
+        }
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """Customer ids already done in the checkpoint at ``path``.
+
+    A run killed mid-write can leave a torn last line; the file is rewritten
+    without unreadable lines (and without failed customers, or ones whose
+    categorization partly failed, which are retried) so appending can
+    resume cleanly.
+    """
+
+    if not os.path.exists(path):
+        return set()
+    done: Set[str] = set()
+    kept: List[str] = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok" and not record.get("uncategorized"):
+                done.add(record["customer_id"])
+                kept.append(line if line.endswith("\n") else line + "\n")
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), suffix=".part"
+    )
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.writelines(kept)
+    os.replace(tmp_path, path)
+    return done
+
+
+async def _narrate(record: Dict[str, Any], slots: asyncio.Semaphore) -> None:
+    prompts = (
+        ("spending", spending_prompt(record["spending"])),
+        ("investment", investment_prompt(record["investment"])),
+    )
+    for section, prompt in prompts:
+        async with slots:
+            record[section]["narrative"] = await call_llm_async(prompt)
+
+
+async def run_batch(
+    statements: List[Tuple[str, str]],
+    checkpoint: str,
+    workers: int,
+    horizon_years: int = DEFAULT_HORIZON_YEARS,
+    narratives: bool = False,
+    llm_concurrency: int = 8,
+) -> Dict[str, Any]:
+    """Analyse ``statements`` not yet in ``checkpoint``, appending a JSONL
+    record per customer as it finishes. Returns run counts and timing."""
+
+    done = load_checkpoint(checkpoint)
+    todo = [(c, p) for c, p in statements if c not in done]
+    report: Dict[str, Any] = {
+        "statements": len(statements),
+        "resumed": len(statements) - len(todo),
+        "ok": 0,
+        "failed": 0,
+        "workers": workers,
+    }
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(max(1, llm_concurrency))
+
+    async def finish(future: "asyncio.Future[Dict[str, Any]]") -> Dict[str, Any]:
+        record = await future
+        if narratives and record["status"] == "ok":
+            try:
+                await _narrate(record, slots)
+            except Exception as exc:
+                record = {**record, "status": "error", "error": repr(exc)}
+        return record
+
+    # Spawned, not forked: the LLM client may already hold threads
+    with ProcessPoolExecutor(
+        max_workers=max(1, workers), mp_context=multiprocessing.get_context("spawn")
+    ) as pool, open(checkpoint, "a", encoding="utf-8") as out:
+        tasks = [
+            finish(loop.run_in_executor(pool, analyse_statement, c, p, horizon_years))
+            for c, p in todo
+        ]
+        step = max(1, len(tasks) // 20)
+        for count, task in enumerate(asyncio.as_completed(tasks), 1):
+            record = await task
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            # Flushed per record: the checkpoint is what a resume trusts
+            out.flush()
+            report["ok" if record["status"] == "ok" else "failed"] += 1
+            if count % step == 0 or count == len(tasks):
+                elapsed = time.perf_counter() - start
+                print(
+                    f"[{count}/{len(tasks)}] {count / elapsed:.1f} statements/s",
+                    file=sys.stderr,
+                )
+
+    wall_s = time.perf_counter() - start
+    report["wall_s"] = round(wall_s, 3)
+    report["statements_per_s"] = round(len(todo) / wall_s, 2) if todo else 0.0
+    return report
+
+
+def write_parquet(checkpoint: str, out: str) -> None:
+    """Flatten the checkpoint's records (``spending.total_expense``,
+    ``investment.allocation.equity_sip``, ...) into a Parquet file."""
+
+    import pandas as pd
+
+    with open(checkpoint, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    pd.json_normalize(records).to_parquet(out, index=False)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("statements", nargs="*", help="CSV files or directories")
+    parser.add_argument("--manifest", help="CSV with path[,customer_id] columns")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default="jsonl")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--horizon-years", type=int, default=DEFAULT_HORIZON_YEARS)
+    parser.add_argument("--narratives", action="store_true")
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument(
+        "--restart", action="store_true", help="ignore an existing checkpoint"
+    )
+    args = parser.parse_args()
+
+    if args.format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("--format parquet needs pyarrow (pip install pyarrow)")
+    try:
+        statements = find_statements(args.statements, args.manifest)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if not statements:
+        parser.error("no statements found")
+
+    checkpoint = args.out if args.format == "jsonl" else args.out + ".jsonl"
+    if args.restart and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    report = asyncio.run(
+        run_batch(
+            statements,
+            checkpoint,
+            args.workers,
+            args.horizon_years,
+            args.narratives,
+            args.llm_concurrency,
+        )
+    )
+    if args.format == "parquet":
+        write_parquet(checkpoint, args.out)
+        if report["failed"] == 0:
+            os.remove(checkpoint)
+    report["out"] = args.out
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
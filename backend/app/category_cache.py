@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from app.config import settings
+
+
+_UPI_HANDLE = re.compile(r"@\S*")
+_DIGITS = re.compile(r"\S*\d\S*")
+_NON_ALPHA = re.compile(r"[^a-z ]+")
+_SPACES = re.compile(r"\s+")
+
+# Channel / boilerplate tokens that banks prepend to merchant names
+_NOISE_TOKENS = {
+    "upi",
+    "pos",
+    "neft",
+    "imps",
+    "rtgs",
+    "ach",
+    "nach",
+    "txn",
+    "ref",
+    "refno",
+    "payment",
+    "to",
+    "from",
+    "by",
+    "dr",
+    "cr",
+}
+
+
+def normalize_merchant(desc: str) -> str:
+    """Reduce a transaction description to a stable merchant key.
+
+    Lowercases, drops UPI PSP suffixes (``@okaxis``), any token containing
+    digits (reference numbers, card tails, dates) and channel noise such as
+    ``UPI/POS/NEFT``. ``"UPI/9876543210/Swiggy@ybl/REF 123"`` -> ``"swiggy"``.
+    """
+
+    d = desc.lower().replace("/", " ").replace("-", " ")
+    d = _UPI_HANDLE.sub(" ", d)
+    d = _DIGITS.sub(" ", d)
+    d = _NON_ALPHA.sub(" ", d)
+    tokens = [t for t in d.split() if t not in _NOISE_TOKENS]
+    key = " ".join(dict.fromkeys(tokens))
+    if not key:
+        # Nothing but noise: fall back to the collapsed raw text
+        key = _SPACES.sub(" ", desc.lower()).strip()
+    return key
+
+
+class CategoryCache:
+    """Merchant -> category cache: in-memory LRU in front of SQLite.
+
+    The SQLite file is shared by every worker process, so one worker's LLM
+    answer is reused by the others after their in-memory lookup misses.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10_000) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS merchant_category ("
+                " merchant TEXT PRIMARY KEY,"
+                " category TEXT NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key: str, category: str) -> None:
+        self._memory[key] = category
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            category = self._memory.get(key)
+            if category is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return category
+
+            row = (
+                self._db()
+                .execute(
+                    "SELECT category FROM merchant_category WHERE merchant = ?",
+                    (key,),
+                )
+                .fetchone()
+            )
+            if row is None:
+                self.misses += 1
+                return None
+            self._remember(key, row[0])
+            self.hits += 1
+            return row[0]
+
+    def put_many(self, items: Iterable[Tuple[str, str]]) -> None:
+        rows = [(key, cat, time.time()) for key, cat in items]
+        if not rows:
+            return
+        with self._lock:
+            for key, cat, _ in rows:
+                self._remember(key, cat)
+            db = self._db()
+            db.executemany(
+                "INSERT OR REPLACE INTO merchant_category"
+                " (merchant, category, updated_at) VALUES (?, ?, ?)",
+                rows,
+            )
+            db.commit()
+
+    def put(self, key: str, category: str) -> None:
+        self.put_many([(key, category)])
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+
+category_cache = CategoryCache(
+    settings.category_cache_path, settings.category_cache_size
+)
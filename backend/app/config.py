@@ -8,10 +8,91 @@ class Settings(BaseSettings):
 
     google_api_key: str = os.getenv("GOOGLE_API_KEY", "<YOUR_GEMINI_API_KEY_HERE>")
     model_name: str = os.getenv("GEMINI_MODEL_NAME", "gemini-2.5-flash")
+    # Max Gemini calls in flight from async code (size of the LLM executor)
+    llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+    # Prompt-level response cache: TTL, max entries, and the step numeric
+    # prompt inputs are rounded to (0 disables bucketing)
+    llm_cache_ttl_s: float = float(os.getenv("LLM_CACHE_TTL_S", "3600"))
+    llm_cache_size: int = int(os.getenv("LLM_CACHE_SIZE", "2048"))
+    llm_cache_bucket: float = float(os.getenv("LLM_CACHE_BUCKET", "0"))
+    # Intents whose summary is generated from the agent numbers concurrently
+    # with the narrative instead of after it (comma-separated env var)
+    parallel_summary_intents: str = os.getenv(
+        "PARALLEL_SUMMARY_INTENTS", "spending_plan,investment,loan,tax_saver"
+    )
+    # Summary prompt: characters of the agent narrative it may quote (0 to
+    # omit), default token budget and per-intent overrides ("loan=300,...")
+    summary_narrative_chars: int = int(os.getenv("SUMMARY_NARRATIVE_CHARS", "240"))
+    summary_token_budget: int = int(os.getenv("SUMMARY_TOKEN_BUDGET", "450"))
+    summary_token_budgets: str = os.getenv("SUMMARY_TOKEN_BUDGETS", "")
+
+    # Transaction categorization: descriptions per LLM call, parallel calls
+    categorize_batch_size: int = int(os.getenv("CATEGORIZE_BATCH_SIZE", "50"))
+    categorize_concurrency: int = int(os.getenv("CATEGORIZE_CONCURRENCY", "4"))
+    # Bank CSVs are read and coerced in chunks of this many rows. This bounds
+    # the reader's string buffers, not the parse: every transaction is kept
+    csv_chunk_rows: int = int(os.getenv("CSV_CHUNK_ROWS", "200000"))
+
+    # Payslip PDFs: worker processes for page text extraction and pages per
+    # pool task (a batch that fits in one task is read inline)
+    payslip_workers: int = int(
+        os.getenv("PAYSLIP_WORKERS", str(min(4, os.cpu_count() or 1)))
+    )
+    payslip_pages_per_task: int = int(os.getenv("PAYSLIP_PAGES_PER_TASK", "8"))
+
+    # Background ingestion of uploads (see app.jobs): worker processes for
+    # the CPU-bound parsing (0 runs it on threads), jobs categorizing with
+    # the LLM at once, and finished jobs kept for GET /jobs/{id}
+    ingest_workers: int = int(
+        os.getenv("INGEST_WORKERS", str(min(2, os.cpu_count() or 1)))
+    )
+    ingest_llm_concurrency: int = int(os.getenv("INGEST_LLM_CONCURRENCY", "2"))
+    ingest_jobs_retained: int = int(os.getenv("INGEST_JOBS_RETAINED", "1000"))
+
+    # Investment projections: Monte Carlo paths per simulation and the seed
+    # (fixed, so the same plan always gets the same bands)
+    projection_paths: int = int(os.getenv("PROJECTION_PATHS", "20000"))
+    projection_seed: int = int(os.getenv("PROJECTION_SEED", "7"))
+
+    # Uploads are streamed in chunks and rejected once they exceed the cap
+    upload_chunk_size: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+    max_upload_bytes: int = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
 
     backend_base_dir: str = os.path.dirname(os.path.abspath(__file__))
     uploads_dir: str = os.path.join(backend_base_dir, "..", "uploads")
     sessions_dir: str = os.path.join(backend_base_dir, "..", "data", "sessions")
+    # "json" (one file per session, rewritten on every turn, so a turn costs
+    # O(history)) or "sqlite" (WAL database, appends only the new messages
+    # and is safe to share between workers; import old files with
+    # `python -m app.migrate_sessions`)
+    session_backend: str = os.getenv("SESSION_BACKEND", "json")
+    session_db_path: str = os.path.join(
+        backend_base_dir, "..", "data", "sessions.sqlite3"
+    )
+    # Lease held on a session while a turn runs; must exceed a slow turn
+    session_lock_ttl_s: float = float(os.getenv("SESSION_LOCK_TTL_S", "120"))
+    parsed_cache_dir: str = os.path.join(backend_base_dir, "..", "data", "parsed")
+    # Per-user transaction history across all uploaded statements, and how
+    # many users' histories are kept in memory between turns
+    history_dir: str = os.path.join(backend_base_dir, "..", "data", "history")
+    history_cache_users: int = int(os.getenv("HISTORY_CACHE_USERS", "256"))
+    category_cache_path: str = os.path.join(
+        backend_base_dir, "..", "data", "category_cache.sqlite3"
+    )
+    category_cache_size: int = int(os.getenv("CATEGORY_CACHE_SIZE", "10000"))
+    # LLM backend: "gemini", "record" (Gemini, appending every answer to the
+    # cassette), "replay" (answers from the cassette, offline, after
+    # LLM_REPLAY_LATENCY_S; unknown prompts get a deterministic stub) or "stub"
+    llm_backend: str = os.getenv("LLM_BACKEND", "gemini")
+    llm_cassette_path: str = os.getenv(
+        "LLM_CASSETTE_PATH",
+        os.path.join(backend_base_dir, "..", "data", "llm_cassette.jsonl"),
+    )
+    llm_replay_latency_s: float = float(os.getenv("LLM_REPLAY_LATENCY_S", "0"))
+    merchant_rules_path: str = os.getenv(
+        "MERCHANT_RULES_PATH",
+        os.path.join(backend_base_dir, "data", "merchant_rules.csv"),
+    )
 
 
 settings = Settings()
@@ -0,0 +1,391 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+import threading
+import zlib
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.aggregates import (
+    add_transactions,
+    compute_aggregates,
+    empty_aggregates,
+    merge_aggregates,
+    top_merchants,
+)
+from app.config import settings
+
+
+_DATE_FORMATS = (
+    "%Y-%m-%d",
+    "%d/%m/%Y",
+    "%d-%m-%Y",
+    "%d.%m.%Y",
+    "%d/%m/%y",
+    "%d-%m-%y",
+    "%d-%b-%Y",
+    "%d %b %Y",
+    "%d-%b-%y",
+    "%d %b %y",
+    "%d %B %Y",
+    "%Y/%m/%d",
+)
+_LAST_N_MONTHS = re.compile(r"^last_(\d+)_months?$")
+
+
+def parse_date(raw: str) -> Optional[date]:
+    """Parse a statement date (ISO or day-first, as Indian banks print
+    them); a trailing time is ignored. None when unrecognised."""
+
+    text = (raw or "").strip()
+    for candidate in (text, text.split(" ")[0], text[:10]):
+        for fmt in _DATE_FORMATS:
+            try:
+                return datetime.strptime(candidate, fmt).date()
+            except ValueError:
+                continue
+    return None
+
+
+def _month_key(day: date) -> str:
+    return f"{day.year}-{day.month:02d}"
+
+
+def _month_bounds(key: str) -> Tuple[date, date]:
+    year, month = (int(p) for p in key.split("-"))
+    first = date(year, month, 1)
+    following = date(year + month // 12, month % 12 + 1, 1)
+    return first, following - timedelta(days=1)
+
+
+def _fingerprint(day: Optional[date], tx: Dict[str, Any]) -> Tuple[Any, ...]:
+    desc = " ".join(str(tx.get("desc", "")).lower().split())
+    when = day.toordinal() if day else str(tx.get("date", ""))
+    return (when, desc, round(float(tx.get("amount", 0.0)), 2))
+
+
+class TransactionHistory:
+    """All statements one user has uploaded, as a single dated ledger.
+
+    Transactions are kept sorted by date (dates normalised to ISO) next to a
+    parallel list of day ordinals, so a date range is two bisects and a
+    slice. Per-month aggregates are maintained on ingestion; window totals
+    merge whole months and only scan the partial months at the edges.
+    """
+
+    def __init__(self, user_id: str) -> None:
+        self.user_id = user_id
+        self.documents: List[str] = []
+        self.ordinals: List[int] = []
+        self.transactions: List[Dict[str, Any]] = []
+        # Rows whose date could not be parsed: only in unbounded windows
+        self.undated: List[Dict[str, Any]] = []
+        self.months: Dict[str, Dict[str, Any]] = {}
+        self._fingerprints: Counter = Counter()
+
+    def add_statement(
+        self, doc_id: str, transactions: Iterable[Dict[str, Any]]
+    ) -> int:
+        """Add a statement's transactions; returns how many were new.
+
+        Statements often overlap (a "last 90 days" export after a monthly
+        one). A row identical in date, description and amount to one
+        already held is skipped, up to the number of times it was held, so
+        genuine repeats within a statement survive.
+        """
+
+        if doc_id in self.documents:
+            return 0
+
+        parsed_dates: Dict[str, Optional[date]] = {}
+        seen: Counter = Counter()
+        dated: List[Tuple[int, Dict[str, Any]]] = []
+        undated: List[Dict[str, Any]] = []
+        for tx in transactions:
+            raw = str(tx.get("date", ""))
+            if raw not in parsed_dates:
+                parsed_dates[raw] = parse_date(raw)
+            day = parsed_dates[raw]
+            key = _fingerprint(day, tx)
+            seen[key] += 1
+            if seen[key] <= self._fingerprints[key]:
+                continue
+            if day is None:
+                undated.append(dict(tx))
+            else:
+                dated.append((day.toordinal(), {**tx, "date": day.isoformat()}))
+
+        for key, count in seen.items():
+            if count > self._fingerprints[key]:
+                self._fingerprints[key] = count
+
+        dated.sort(key=lambda pair: pair[0])
+        self._insert(dated)
+        self.undated.extend(undated)
+
+        by_month: Dict[str, List[Dict[str, Any]]] = {}
+        for ordinal, tx in dated:
+            by_month.setdefault(tx["date"][:7], []).append(tx)
+        for key, rows in by_month.items():
+            add_transactions(self.months.setdefault(key, empty_aggregates()), rows)
+
+        self.documents.append(doc_id)
+        return len(dated) + len(undated)
+
+    def _insert(self, dated: List[Tuple[int, Dict[str, Any]]]) -> None:
+        if not dated:
+            return
+        if not self.ordinals or dated[0][0] >= self.ordinals[-1]:
+            # Usual case: statements uploaded in chronological order
+            self.ordinals.extend(o for o, _ in dated)
+            self.transactions.extend(tx for _, tx in dated)
+            return
+        # Both sides are sorted runs, which the stable sort merges linearly
+        merged = sorted(
+            list(zip(self.ordinals, self.transactions)) + dated,
+            key=lambda pair: pair[0],
+        )
+        self.ordinals = [o for o, _ in merged]
+        self.transactions = [tx for _, tx in merged]
+
+    @property
+    def first_date(self) -> Optional[date]:
+        return date.fromordinal(self.ordinals[0]) if self.ordinals else None
+
+    @property
+    def last_date(self) -> Optional[date]:
+        return date.fromordinal(self.ordinals[-1]) if self.ordinals else None
+
+    def range(
+        self, start: Optional[date] = None, end: Optional[date] = None
+    ) -> List[Dict[str, Any]]:
+        """Transactions dated within ``[start, end]`` (inclusive), in order."""
+
+        lo = 0 if start is None else bisect_left(self.ordinals, start.toordinal())
+        hi = (
+            len(self.ordinals)
+            if end is None
+            else bisect_right(self.ordinals, end.toordinal())
+        )
+        return self.transactions[lo:hi]
+
+    def _month_aggregates(
+        self, key: str, start: Optional[date], end: Optional[date]
+    ) -> Optional[Dict[str, Any]]:
+        first, last = _month_bounds(key)
+        lo = first if start is None else max(first, start)
+        hi = last if end is None else min(last, end)
+        if lo > hi:
+            return None
+        if lo == first and hi == last:
+            return self.months[key]
+        return compute_aggregates(self.range(lo, hi))
+
+    def aggregates(
+        self, start: Optional[date] = None, end: Optional[date] = None
+    ) -> Dict[str, Any]:
+        """``app.aggregates`` totals for a date window."""
+
+        agg = empty_aggregates()
+        for key in sorted(self.months):
+            month = self._month_aggregates(key, start, end)
+            if month is not None:
+                merge_aggregates(agg, month)
+        if start is None and end is None and self.undated:
+            add_transactions(agg, self.undated)
+        return agg
+
+    def month_over_month(
+        self, start: Optional[date] = None, end: Optional[date] = None
+    ) -> List[Dict[str, Any]]:
+        """One row per month in the window with income, expense, net and the
+        change in expense against the previous month."""
+
+        rows: List[Dict[str, Any]] = []
+        previous: Optional[float] = None
+        for key in sorted(self.months):
+            month = self._month_aggregates(key, start, end)
+            if month is None or not month["transaction_count"]:
+                continue
+            expense = month["total_expense"]
+            change = None
+            if previous:
+                change = (expense - previous) / previous * 100
+            rows.append(
+                {
+                    "month": key,
+                    "income": month["income"],
+                    "expense": expense,
+                    "net": month["income"] - expense,
+                    "expense_change_pct": change,
+                    "category_expense": dict(month["category_expense"]),
+                }
+            )
+            previous = expense
+        return rows
+
+
+def resolve_window(
+    metadata: Dict[str, Any], anchor: Optional[date]
+) -> Optional[Tuple[Optional[date], Optional[date]]]:
+    """Date window requested by a chat turn, or None for "latest statement".
+
+    ``metadata["window"]`` is one of ``all``, ``this_month``, ``last_month``,
+    ``last_<n>_months``, ``this_fy`` or ``last_fy`` (Indian April-March
+    financial year), relative to ``anchor`` (the newest transaction, so old
+    statements still give meaningful windows). Explicit ``start_date`` /
+    ``end_date`` (ISO) override it.
+    """
+
+    start = parse_date(str(metadata.get("start_date") or ""))
+    end = parse_date(str(metadata.get("end_date") or ""))
+    if start or end:
+        return start, end
+
+    name = str(metadata.get("window") or "").strip().lower().replace(" ", "_")
+    if not name:
+        return None
+    if name == "all" or anchor is None:
+        return None, None
+
+    this_month = anchor.replace(day=1)
+    if name == "this_month":
+        return this_month, anchor
+    if name == "last_month":
+        last = this_month - timedelta(days=1)
+        return last.replace(day=1), last
+    match = _LAST_N_MONTHS.match(name)
+    if match:
+        months = max(1, int(match.group(1)))
+        index = anchor.year * 12 + anchor.month - 1 - (months - 1)
+        return date(index // 12, index % 12 + 1, 1), anchor
+    if name in ("this_fy", "last_fy"):
+        year = anchor.year if anchor.month >= 4 else anchor.year - 1
+        if name == "last_fy":
+            year -= 1
+        return date(year, 4, 1), date(year + 1, 3, 31)
+    raise ValueError(f"Unknown date window: {name}")
+
+
+def window_view(
+    history: TransactionHistory, start: Optional[date], end: Optional[date]
+) -> Dict[str, Any]:
+    """A parsed-statement-shaped view of a window for the agents.
+
+    The agents reason in monthly figures, so totals are averaged over the
+    months in the window that have transactions. ``history`` is shared with
+    other threads (see ``load_history``), so it is read under the user's
+    lock that ``add_statement`` writes it under.
+    """
+
+    with _user_lock(history.user_id):
+        agg = history.aggregates(start, end)
+        rollup = history.month_over_month(start, end)
+    months = max(1, len(rollup))
+    income = agg["income"] / months
+    monthly = {
+        "income": income,
+        "total_expense": agg["total_expense"] / months,
+        "transaction_count": agg["transaction_count"],
+        "category_expense": {
+            cat: value / months for cat, value in agg["category_expense"].items()
+        },
+        "months": agg["months"],
+        "top_merchants": top_merchants(agg),
+    }
+    return {
+        "income": income,
+        "emergencyFund": max(0.0, income) * 0.25,
+        "aggregates": monthly,
+        "window": {
+            "start": start.isoformat() if start else None,
+            "end": end.isoformat() if end else None,
+            "months": months,
+        },
+        "month_over_month": rollup,
+    }
+
+
+# --- persistence -------------------------------------------------------------
+
+_lock = threading.Lock()
+_user_locks: Dict[str, threading.Lock] = {}
+# user_id -> (file mtime, history), least recently used first; reloaded when
+# another worker rewrote it
+_loaded: "OrderedDict[str, Tuple[float, TransactionHistory]]" = OrderedDict()
+
+
+def _path(user_id: str) -> str:
+    name = hashlib.sha256(user_id.encode("utf-8")).hexdigest()
+    return os.path.join(settings.history_dir, f"{name}.pkl.z")
+
+
+def _user_lock(user_id: str) -> threading.Lock:
+    with _lock:
+        return _user_locks.setdefault(user_id, threading.Lock())
+
+
+def _remember(user_id: str, mtime: float, history: TransactionHistory) -> None:
+    """Keep ``history`` in memory, forgetting the least recently used ones
+    beyond ``settings.history_cache_users``."""
+
+    with _lock:
+        _loaded[user_id] = (mtime, history)
+        _loaded.move_to_end(user_id)
+        while len(_loaded) > max(1, settings.history_cache_users):
+            _loaded.popitem(last=False)
+
+
+def load_history(user_id: str) -> TransactionHistory:
+    """The user's stored history. The instance is cached and shared between
+    threads: read it under the user's lock (as ``window_view`` does)."""
+
+    path = _path(user_id)
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        return TransactionHistory(user_id)
+    with _lock:
+        cached = _loaded.get(user_id)
+        if cached is not None and cached[0] == mtime:
+            _loaded.move_to_end(user_id)
+            return cached[1]
+    with open(path, "rb") as f:
+        history = pickle.loads(zlib.decompress(f.read()))
+    _remember(user_id, mtime, history)
+    return history
+
+
+def save_history(history: TransactionHistory) -> None:
+    os.makedirs(settings.history_dir, exist_ok=True)
+    path = _path(history.user_id)
+    blob = zlib.compress(pickle.dumps(history, protocol=pickle.HIGHEST_PROTOCOL), 3)
+    fd, tmp_path = tempfile.mkstemp(dir=settings.history_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    _remember(history.user_id, os.stat(path).st_mtime, history)
+
+
+def add_statement(
+    user_id: str, doc_id: str, transactions: Iterable[Dict[str, Any]]
+) -> int:
+    """Append a parsed statement to the user's stored history."""
+
+    with _user_lock(user_id):
+        history = load_history(user_id)
+        if doc_id in history.documents:
+            return 0
+        added = history.add_statement(doc_id, transactions)
+        save_history(history)
+        return added
@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app import metrics
+from app.agents.document_parser import categorize_batch
+from app.config import settings
+from app.parse_cache import (
+    cache_key,
+    document_ref,
+    finish_and_store,
+    get_parsed_payslips,
+    load_cached,
+    payslip_cache_key,
+    read_and_spill,
+)
+
+
+# Job kinds: a bank statement CSV (parsed, categorized and cached) or a
+# payslip PDF (fields extracted and cached)
+STATEMENT = "statement"
+PAYSLIP = "payslip"
+
+
+class IngestJob:
+    """One uploaded document being parsed in the background.
+
+    ``future`` resolves to the artifact the chat turn needs: the statement's
+    ``document_ref``, or the parsed payslip. ``stage`` and ``progress``
+    (0-1) are for ``GET /jobs/{id}``.
+    """
+
+    def __init__(self, job_id: str, kind: str, path: str) -> None:
+        self.id = job_id
+        self.kind = kind
+        self.path = path
+        self.status = "queued"
+        self.stage = "queued"
+        self.progress = 0.0
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.summary: Dict[str, Any] = {}
+        # Set by ``submit_ingestion`` before the job is visible to others
+        self.future: Future = Future()
+
+    def update(self, stage: str, progress: float) -> None:
+        self.stage = stage
+        self.progress = max(self.progress, progress)
+
+    def snapshot(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.progress, 3),
+            "error": self.error,
+            "created_at": self.created_at,
+            "queued_s": round((self.started_at or end) - self.created_at, 3),
+            "run_s": round(end - self.started_at, 3) if self.started_at else None,
+            "result": self.summary,
+        }
+
+
+_jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+_jobs_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_pool: Optional[ProcessPoolExecutor] = None
+_start_lock = threading.Lock()
+
+
+def ingestion_kind(path: str) -> Optional[str]:
+    """The job kind for an uploaded file, by extension (None: not ingested)."""
+
+    ext = os.path.splitext(path)[1].lower()
+    return {".csv": STATEMENT, ".pdf": PAYSLIP}.get(ext)
+
+
+def _job_loop() -> asyncio.AbstractEventLoop:
+    """Event loop of the ingestion thread; jobs run there, independent of
+    the request (or ``asyncio.run``) that submitted them."""
+
+    global _loop
+    if _loop is None:
+        with _start_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="ingest-jobs", daemon=True
+                ).start()
+                _loop = loop
+    return _loop
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if settings.ingest_workers < 1:
+        return None
+    if _pool is None:
+        with _start_lock:
+            if _pool is None:
+                # Spawned, not forked: the server process runs threads
+                _pool = ProcessPoolExecutor(
+                    max_workers=settings.ingest_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+async def _cpu(fn: Callable[..., Any], *args: Any) -> Any:
+    """``fn`` in the worker pool, or a thread when it is disabled."""
+
+    pool = _get_pool()
+    if pool is None:
+        return await asyncio.to_thread(fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+
+_llm_slots: Optional[asyncio.Semaphore] = None
+
+
+async def _ingest_statement(job: IngestJob) -> Dict[str, Any]:
+    global _llm_slots
+    cached = await asyncio.to_thread(load_cached, job.id)
+    metrics.record_cache("parsed", cached is not None)
+    if cached is not None:
+        return document_ref(job.id, job.path, cached)
+
+    job.update("reading", 0.05)
+    # The frames stay on disk between the two worker steps; this process
+    # only sees the descriptions the LLM has to categorize
+    with metrics.stage("read_csv"):
+        spill, unknown = await _cpu(read_and_spill, job.id, job.path)
+    try:
+        categories: Dict[str, str] = {}
+        if unknown:
+            job.update("categorizing", 0.3)
+            if _llm_slots is None:
+                _llm_slots = asyncio.Semaphore(
+                    max(1, settings.ingest_llm_concurrency)
+                )
+            # Each job already fans out its own LLM batches; this bounds how
+            # many jobs do so at once
+            async with _llm_slots:
+                with metrics.stage("categorize"):
+                    categories = await asyncio.to_thread(
+                        categorize_batch,
+                        unknown,
+                        lambda done, total: job.update(
+                            "categorizing", 0.3 + 0.5 * done / total
+                        ),
+                    )
+
+        job.update("aggregating", 0.8)
+        with metrics.stage("aggregates"):
+            return await _cpu(finish_and_store, job.id, job.path, spill, categories)
+    finally:
+        # Left behind only if the job failed before finishing
+        if os.path.exists(spill):
+            os.remove(spill)
+
+
+async def _ingest_payslip(job: IngestJob) -> Dict[str, Any]:
+    job.update("reading", 0.1)
+    # Page extraction already fans out over the payslip process pool
+    return (await asyncio.to_thread(get_parsed_payslips, [job.path]))[0]
+
+
+async def _run(job: IngestJob) -> Dict[str, Any]:
+    job.status = "running"
+    job.started_at = time.time()
+    try:
+        with metrics.stage(f"ingest_{job.kind}"):
+            if job.kind == STATEMENT:
+                result = await _ingest_statement(job)
+                job.summary = {
+                    "doc_id": result["doc_id"],
+                    "transaction_count": result["transaction_count"],
+                    "income": result["income"],
+                    "uncategorized": result.get("uncategorized", 0),
+                }
+            else:
+                result = await _ingest_payslip(job)
+                job.summary = {"slips": len(result.get("slips", []))}
+    except Exception as exc:
+        job.status = "failed"
+        job.error = f"{type(exc).__name__}: {exc}"
+        raise
+    else:
+        job.status = "done"
+        job.update("done", 1.0)
+        return result
+    finally:
+        job.finished_at = time.time()
+
+
+def _prune() -> None:
+    """Forget the oldest finished jobs beyond ``settings.ingest_jobs_retained``
+    (their artifacts stay in the parse cache)."""
+
+    excess = len(_jobs) - max(1, settings.ingest_jobs_retained)
+    if excess <= 0:
+        return
+    for job_id in [j.id for j in _jobs.values() if j.future.done()][:excess]:
+        del _jobs[job_id]
+
+
+def submit_ingestion(path: str, kind: str, retry_partial: bool = False) -> IngestJob:
+    """Start ingesting ``path`` unless a job for the same content (and
+    parser version) is queued, running or done; failed jobs are retried, and
+    with ``retry_partial`` (a new upload) so are statements some of whose
+    transactions could not be categorized.
+
+    Job ids are the parse cache keys, so a chat turn naming the file finds
+    the job without any extra bookkeeping.
+    """
+
+    job_id = cache_key(path) if kind == STATEMENT else payslip_cache_key(path)
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        partial = retry_partial and bool(job and job.summary.get("uncategorized"))
+        if job is not None and job.status != "failed" and not partial:
+            _jobs.move_to_end(job_id)
+            return job
+        job = IngestJob(job_id, kind, path)
+        job.future = asyncio.run_coroutine_threadsafe(_run(job), _job_loop())
+        _jobs[job_id] = job
+        _prune()
+    return job
+
+
+async def ingest(path: str, kind: str) -> Dict[str, Any]:
+    """The ingestion artifact for ``path``: waits on the job started at
+    upload, or runs one now. Cancelling the wait leaves the job running.
+
+    The job id is worked out in a thread: it may hash the file and compiles
+    the merchant rules on first use, neither of which belongs on the loop.
+    """
+
+    job = await asyncio.to_thread(submit_ingestion, path, kind)
+    return await asyncio.shield(asyncio.wrap_future(job.future))
+
+
+def get_job(job_id: str) -> Optional[IngestJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def job_stats() -> Dict[str, int]:
+    with _jobs_lock:
+        statuses = [job.status for job in _jobs.values()]
+    return {s: statuses.count(s) for s in ("queued", "running", "done", "failed")}
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, Optional
+
+from app.config import settings
+
+
+class LLMBackend(ABC):
+    """Turns a full prompt into text. ``app.llm_client`` adds caching,
+    metrics and async plumbing on top of whichever backend is configured."""
+
+    name = "base"
+
+    @abstractmethod
+    def generate(self, prompt: str) -> str: ...
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        text = self.generate(prompt)
+        if text:
+            yield text
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, model_name: str, api_key: str) -> None:
+        self.model_name = model_name
+        self.api_key = api_key
+        self._model: Any = None
+        self._lock = threading.Lock()
+
+    def _get_model(self) -> Any:
+        """Shared model handle; the SDK is only imported when first used."""
+
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import google.generativeai as genai
+
+                    genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def generate(self, prompt: str) -> str:
+        response = self._get_model().generate_content(prompt)
+        # Defensive: handle potential missing text
+        return (getattr(response, "text", "") or "").strip()
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        response = self._get_model().generate_content(prompt, stream=True)
+        for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. safety metadata only)
+                continue
+            if text:
+                yield text
+
+
+def cassette_key(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+_CATEGORY_ARRAY = re.compile(r"JSON array of (\d+) strings")
+_STUB_LINES = (
+    "- Keep fixed costs such as rent and EMIs under half of take-home pay.",
+    "- Automate a monthly SIP into a low-cost index fund right after salary day.",
+    "- Build an emergency fund of three to six months of expenses in a liquid fund.",
+    "- Review food delivery and shopping spends weekly and set a monthly cap.",
+    "- Prefer term insurance and a family floater health cover over bundled plans.",
+    "- Use tax-saving options only where they also fit your long-term goals.",
+)
+
+
+def stub_response(prompt: str, chars: int = 600) -> str:
+    """Deterministic offline answer shaped like what ``prompt`` asks for:
+    a JSON array for categorization, a JSON object for tax-answer
+    extraction, otherwise plain-text bullets chosen by the prompt's hash."""
+
+    match = _CATEGORY_ARRAY.search(prompt)
+    if match:
+        return json.dumps(["Others"] * int(match.group(1)))
+    if "STRICT JSON object" in prompt:
+        return json.dumps(
+            {
+                "rent_amount": None,
+                "rent_city": None,
+                "health_premium": None,
+                "has_home_loan": False,
+                "home_loan_emi": None,
+                "home_loan_interest_year": None,
+            }
+        )
+    offset = int(cassette_key(prompt)[:8], 16)
+    lines = ["Your finances look manageable with a few adjustments."]
+    size = len(lines[0])
+    while size < chars:
+        line = _STUB_LINES[(offset + len(lines)) % len(_STUB_LINES)]
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)[:chars]
+
+
+class StubBackend(LLMBackend):
+    name = "stub"
+
+    def generate(self, prompt: str) -> str:
+        return stub_response(prompt)
+
+
+class Cassette:
+    """Prompt hash -> response, stored as append-only JSON lines.
+
+    Only the hash of the prompt is written, never the prompt itself (it
+    carries the user's financial details). Later lines win on reload.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._responses: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self) -> None:
+        responses: Dict[str, str] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn last line from an interrupted recording
+                        continue
+                    responses[entry["key"]] = entry["response"]
+        with self._lock:
+            self._responses = responses
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    def get(self, prompt: str) -> Optional[str]:
+        return self._responses.get(cassette_key(prompt))
+
+    def record(self, prompt: str, response: str) -> None:
+        key = cassette_key(prompt)
+        entry = {"key": key, "prompt_chars": len(prompt), "response": response}
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._responses[key] = response
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+class RecordingBackend(LLMBackend):
+    """Calls ``inner`` (normally Gemini) and appends every answer to the
+    cassette."""
+
+    name = "record"
+
+    def __init__(self, inner: LLMBackend, cassette: Cassette) -> None:
+        self.inner = inner
+        self.cassette = cassette
+
+    def generate(self, prompt: str) -> str:
+        text = self.inner.generate(prompt)
+        self.cassette.record(prompt, text)
+        return text
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        parts = []
+        for text in self.inner.generate_stream(prompt):
+            parts.append(text)
+            yield text
+        self.cassette.record(prompt, "".join(parts).strip())
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "recorded": len(self.cassette)}
+
+
+class ReplayBackend(LLMBackend):
+    """Serves recorded answers offline after ``latency_s``; prompts missing
+    from the cassette get ``stub_response`` so runs stay deterministic."""
+
+    name = "replay"
+
+    def __init__(
+        self, cassette: Cassette, latency_s: float = 0.0, stream_chunks: int = 8
+    ) -> None:
+        self.cassette = cassette
+        self.latency_s = latency_s
+        self.stream_chunks = max(1, stream_chunks)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _lookup(self, prompt: str) -> str:
+        text = self.cassette.get(prompt)
+        with self._lock:
+            if text is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return stub_response(prompt) if text is None else text
+
+    def generate(self, prompt: str) -> str:
+        text = self._lookup(prompt)
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return text
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        text = self._lookup(prompt)
+        size = len(text) // self.stream_chunks + 1
+        for i in range(0, len(text), size):
+            if self.latency_s:
+                time.sleep(self.latency_s / self.stream_chunks)
+            yield text[i : i + size]
+
+    def stats(self) -> Dict[str, Any]:
+        replays = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "recorded": len(self.cassette),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / replays) if replays else 0.0,
+        }
+
+
+def make_backend(name: Optional[str] = None) -> LLMBackend:
+    name = (name or settings.llm_backend).strip().lower()
+    if name == "gemini":
+        return GeminiBackend(settings.model_name, settings.google_api_key)
+    if name == "stub":
+        return StubBackend()
+    if name == "record":
+        gemini = GeminiBackend(settings.model_name, settings.google_api_key)
+        return RecordingBackend(gemini, Cassette(settings.llm_cassette_path))
+    if name == "replay":
+        return ReplayBackend(
+            Cassette(settings.llm_cassette_path), settings.llm_replay_latency_s
+        )
+    raise ValueError(f"Unknown LLM backend: {name}")
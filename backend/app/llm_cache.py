@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import settings
+
+
+def prompt_key(
+    model_name: str, system_instructions: Optional[str], prompt: str
+) -> str:
+    digest = hashlib.sha256()
+    for part in (model_name, system_instructions or "", prompt):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def bucket(value: float, step: Optional[float] = None) -> float:
+    """Round a prompt input to the nearest ``step`` (default
+    ``settings.llm_cache_bucket``) so near-identical requests share a cached
+    answer. A step of 0 leaves the value untouched."""
+
+    step = settings.llm_cache_bucket if step is None else step
+    if not step:
+        return value
+    return round(float(value) / step) * step
+
+
+class PromptCache:
+    """Size-bounded LRU of LLM responses whose entries expire after a TTL."""
+
+    def __init__(self, max_entries: int, ttl_s: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: str) -> None:
+        if self.max_entries <= 0 or self.ttl_s <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_s, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+prompt_cache = PromptCache(settings.llm_cache_size, settings.llm_cache_ttl_s)
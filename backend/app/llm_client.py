@@ -1,33 +1,179 @@
 from __future__ import annotations
 
-from typing import Optional
-
-import google.generativeai as genai
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterator, Optional
 
+from app import metrics
 from app.config import settings
+from app.llm_backends import LLMBackend, make_backend
+from app.llm_cache import prompt_cache, prompt_key
+
+
+_backend: Optional[LLMBackend] = None
+_backend_lock = threading.Lock()
+
+# Dedicated pool for blocking LLM calls made from async code, so slow
+# responses never tie up the event loop or the default executor.
+_executor = ThreadPoolExecutor(
+    max_workers=settings.llm_max_concurrency, thread_name_prefix="llm"
+)
+
+
+def get_backend() -> LLMBackend:
+    """The configured backend (``settings.llm_backend``), built on first use."""
+
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = make_backend()
+    return _backend
+
+
+def set_backend(backend: LLMBackend) -> None:
+    """Swap the backend, e.g. for a replay run or a benchmark."""
+
+    global _backend
+    _backend = backend
+
+
+def _generate(prompt: str) -> str:
+    return get_backend().generate(prompt)
+
 
+def _generate_stream(prompt: str) -> Iterator[str]:
+    return get_backend().generate_stream(prompt)
 
-_configured = False
 
+def call_llm(
+    prompt: str,
+    system_instructions: Optional[str] = None,
+    cache: bool = True,
+) -> str:
+    """Call the LLM with a simple text prompt and optional system guidance.
 
-def _ensure_configured() -> None:
-    global _configured
-    if _configured:
-        return
-    genai.configure(api_key=settings.google_api_key)
-    _configured = True
+    Responses are cached by (model, system instructions, prompt) for
+    ``settings.llm_cache_ttl_s``; pass ``cache=False`` at call sites whose
+    answer should not be reused.
+    """
 
+    key = None
+    if cache:
+        key = prompt_key(settings.model_name, system_instructions, prompt)
+        cached = _cache_lookup(key)
+        if cached is not None:
+            return cached
+    return _call_and_store(prompt, system_instructions, key)
 
-def call_llm(prompt: str, system_instructions: Optional[str] = None) -> str:
-    """Call Gemini model with simple text prompt and optional system guidance."""
 
-    _ensure_configured()
+async def call_llm_async(
+    prompt: str,
+    system_instructions: Optional[str] = None,
+    cache: bool = True,
+) -> str:
+    """``call_llm`` for async callers; runs on the bounded LLM executor."""
 
-    model = genai.GenerativeModel(settings.model_name)
+    key = None
+    if cache:
+        # Serve hits on the loop without a thread hop
+        key = prompt_key(settings.model_name, system_instructions, prompt)
+        cached = _cache_lookup(key)
+        if cached is not None:
+            return cached
+
+    loop = asyncio.get_running_loop()
+    # Carry the caller's context (metrics labels) into the worker thread
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _executor, ctx.run, _call_and_store, prompt, system_instructions, key
+    )
+
+
+def _cache_lookup(key: str) -> Optional[str]:
+    cached = prompt_cache.get(key)
+    metrics.record_cache("llm", cached is not None)
+    if cached is not None:
+        metrics.record_llm_cached()
+    return cached
+
+
+def _call_and_store(
+    prompt: str, system_instructions: Optional[str], key: Optional[str]
+) -> str:
     if system_instructions:
         prompt = f"{system_instructions}\n\n{prompt}"
-    response = model.generate_content(prompt)
-    # Defensive: handle potential missing text
-    return (getattr(response, "text", "") or "").strip()
+    start = time.perf_counter()
+    try:
+        text = _generate(prompt)
+    except Exception as exc:
+        metrics.record_llm(prompt, "", time.perf_counter() - start, exc)
+        raise
+    metrics.record_llm(prompt, text, time.perf_counter() - start)
+    if key is not None and text:
+        prompt_cache.put(key, text)
+    return text
+
+
+async def call_llm_stream_async(
+    prompt: str, system_instructions: Optional[str] = None
+) -> AsyncIterator[str]:
+    """Yield response text chunks as Gemini produces them.
+
+    The blocking SDK stream is drained on the LLM executor and handed to the
+    event loop through a queue. If the consumer stops early (the client
+    disconnected), the drain stops at the next chunk.
+    """
+
+    if system_instructions:
+        prompt = f"{system_instructions}\n\n{prompt}"
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    end = object()
+    stop = threading.Event()
+
+    def hand_over(item: object) -> None:
+        if not stop.is_set():
+            loop.call_soon_threadsafe(queue.put_nowait, item)
 
+    def pump() -> None:
+        start = time.perf_counter()
+        parts = []
+        error: Optional[BaseException] = None
+        stream = _generate_stream(prompt)
+        try:
+            for text in stream:
+                if stop.is_set():
+                    break
+                parts.append(text)
+                hand_over(text)
+        except BaseException as exc:  # re-raised in the consumer
+            error = exc
+            hand_over(exc)
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+            metrics.record_llm(
+                prompt, "".join(parts), time.perf_counter() - start, error
+            )
+            hand_over(end)
 
+    ctx = contextvars.copy_context()
+    pumping = loop.run_in_executor(_executor, ctx.run, pump)
+    try:
+        while True:
+            item = await queue.get()
+            if item is end:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+        await pumping
+    finally:
+        # Closed or cancelled before the end: free the LLM worker
+        stop.set()
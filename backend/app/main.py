@@ -1,13 +1,18 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
 import os
 import sys
-import uuid
-from typing import Optional
+import tempfile
+from datetime import date
+from typing import Any, Optional
 
-from fastapi import FastAPI, File, Form, UploadFile
+from fastapi import FastAPI, File, Form, Header, HTTPException, Query, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 if __package__ in (None, ""):
     CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -15,12 +20,66 @@ if __package__ in (None, ""):
     if PARENT_DIR not in sys.path:
         sys.path.insert(0, PARENT_DIR)
 
+from app import metrics
+from app.amortization import schedule_for
+from app.category_cache import category_cache
 from app.config import settings
-from app.orchestrator import run_turn
+from app.history import resolve_window
+from app.jobs import get_job, ingestion_kind, job_stats, submit_ingestion
+from app.llm_cache import prompt_cache
+from app.llm_client import get_backend
+from app.orchestrator import run_turn_async, stream_turn
 
 
 app = FastAPI(title="Spendly POC Backend")
 
+# Room for the multipart boundaries and part headers around the file
+_MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadSizeLimit:
+    """Cap ``/upload`` request bodies before Starlette spools them.
+
+    The multipart parser writes the whole body to a temp file before the
+    handler runs, so the cap is enforced here: up front from
+    ``Content-Length``, and by counting received bytes for bodies sent
+    without one (chunked).
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] != "/upload":
+            await self.app(scope, receive, send)
+            return
+
+        limit = settings.max_upload_bytes + _MULTIPART_OVERHEAD
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            response = JSONResponse({"detail": _too_large_detail()}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            received += len(message.get("body", b""))
+            if received > limit:
+                # Raised while the form is parsed; FastAPI turns it into a 413
+                raise HTTPException(status_code=413, detail=_too_large_detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def _too_large_detail() -> str:
+    return f"File exceeds {settings.max_upload_bytes} bytes"
+
+
+app.add_middleware(UploadSizeLimit)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:4200", "http://localhost:5173", "*"],
@@ -34,18 +93,102 @@ os.makedirs(settings.uploads_dir, exist_ok=True)
 
 @app.get("/health")
 def health() -> dict:
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "category_cache": category_cache.stats(),
+        "llm_cache": prompt_cache.stats(),
+        "llm_backend": get_backend().stats(),
+        "ingest_jobs": job_stats(),
+    }
+
+
+@app.get("/metrics")
+def metrics_endpoint() -> PlainTextResponse:
+    """Prometheus text exposition of stage latencies, LLM usage and caches."""
+
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/loan/schedule")
+def loan_schedule(
+    principal: float = Query(..., gt=0),
+    tenure_months: int = Query(..., gt=0, le=600),
+    interest_rate: Optional[float] = Query(None, ge=0, lt=1),
+    cibil_score: int = 0,
+    yearly: bool = False,
+) -> dict:
+    """Amortization schedule for one scenario of the loan affordability
+    matrix. ``interest_rate`` is a fraction (0.09); without it the CIBIL
+    band rate is used."""
+
+    return schedule_for(principal, tenure_months, interest_rate, cibil_score, yearly)
 
 
 @app.post("/upload")
 async def upload_file(file: UploadFile = File(...)) -> dict:
-    file_id = str(uuid.uuid4())
-    _, ext = os.path.splitext(file.filename)
-    path = os.path.join(settings.uploads_dir, file_id + ext)
-    contents = await file.read()
-    with open(path, "wb") as f:
-        f.write(contents)
-    return {"file_id": file_id, "filename": file.filename, "path": path}
+    """Store an upload under its SHA-256 so identical files are kept once.
+
+    ``UploadSizeLimit`` has already capped the request body. The spooled
+    file is read once, in fixed-size chunks that are hashed while being
+    written to a temp file; that is then renamed to its hash, or dropped
+    if the same content is already stored. Statements (CSV) and payslips
+    (PDF) are then queued for ingestion; the returned ``job`` is polled at
+    ``/jobs/{job_id}``.
+    """
+
+    chunk_size = settings.upload_chunk_size
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=settings.uploads_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while chunk := await file.read(chunk_size):
+                size += len(chunk)
+                if size > settings.max_upload_bytes:
+                    # The body limit allows for multipart overhead
+                    raise HTTPException(status_code=413, detail=_too_large_detail())
+                digest.update(chunk)
+                f.write(chunk)
+
+        file_id = digest.hexdigest()
+        _, ext = os.path.splitext(file.filename or "")
+        path = os.path.join(settings.uploads_dir, file_id + ext.lower())
+        deduplicated = os.path.exists(path)
+        if deduplicated:
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    # Parse while the user types their question; /chat waits on the job.
+    # The job id (cache key) compiles the merchant rules on first use.
+    kind = ingestion_kind(path)
+    job = None
+    if kind:
+        job = await asyncio.to_thread(submit_ingestion, path, kind, True)
+    return {
+        "file_id": file_id,
+        "filename": file.filename,
+        "path": path,
+        "size": size,
+        "deduplicated": deduplicated,
+        "job": job.snapshot() if job else None,
+    }
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str) -> dict:
+    """Status and progress (0-1) of an upload's ingestion job."""
+
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.snapshot()
 
 
 @app.post("/chat")
@@ -57,19 +200,99 @@ async def chat(
     cibil_score: Optional[int] = Form(None),
     monthly_income: Optional[float] = Form(None),
     existing_emi: Optional[float] = Form(None),
+    tenure_months: Optional[int] = Form(None, gt=0, le=600),
+    horizon_years: Optional[int] = Form(None, gt=0, le=30),
+    goal_amount: Optional[float] = Form(None, ge=0),
+    user_id: Optional[str] = Form(None),
+    window: Optional[str] = Form(None),
+    start_date: Optional[str] = Form(None),
+    end_date: Optional[str] = Form(None),
+    debug: Optional[str] = Header(None, alias="X-Spendly-Debug"),
 ) -> JSONResponse:
-    metadata: dict = {}
-    if cibil_score is not None:
-        metadata["cibil_score"] = cibil_score
-    if monthly_income is not None:
-        metadata["monthly_income"] = monthly_income
-    if existing_emi is not None:
-        metadata["existing_emi"] = existing_emi
-
-    result = run_turn(session_id, intent, message, file_path, metadata)
+    metadata = _chat_metadata(
+        cibil_score=cibil_score,
+        monthly_income=monthly_income,
+        existing_emi=existing_emi,
+        tenure_months=tenure_months,
+        horizon_years=horizon_years,
+        goal_amount=goal_amount,
+        user_id=user_id,
+        window=window,
+        start_date=start_date,
+        end_date=end_date,
+    )
+    result = await run_turn_async(
+        session_id, intent, message, file_path, metadata, debug=_debug(debug)
+    )
     return JSONResponse(result)
 
 
+@app.post("/chat/stream")
+async def chat_stream(
+    session_id: str = Form(...),
+    message: str = Form(...),
+    intent: str = Form(...),
+    file_path: Optional[str] = Form(None),
+    cibil_score: Optional[int] = Form(None),
+    monthly_income: Optional[float] = Form(None),
+    existing_emi: Optional[float] = Form(None),
+    tenure_months: Optional[int] = Form(None, gt=0, le=600),
+    horizon_years: Optional[int] = Form(None, gt=0, le=30),
+    goal_amount: Optional[float] = Form(None, ge=0),
+    user_id: Optional[str] = Form(None),
+    window: Optional[str] = Form(None),
+    start_date: Optional[str] = Form(None),
+    end_date: Optional[str] = Form(None),
+    debug: Optional[str] = Header(None, alias="X-Spendly-Debug"),
+) -> StreamingResponse:
+    """Server-sent events: ``started`` at once, ``data`` (agent numbers),
+    then summary ``token`` events, ``narrative`` and a final ``done`` with
+    the full turn."""
+
+    metadata = _chat_metadata(
+        cibil_score=cibil_score,
+        monthly_income=monthly_income,
+        existing_emi=existing_emi,
+        tenure_months=tenure_months,
+        horizon_years=horizon_years,
+        goal_amount=goal_amount,
+        user_id=user_id,
+        window=window,
+        start_date=start_date,
+        end_date=end_date,
+    )
+
+    async def events():
+        turn = stream_turn(
+            session_id, intent, message, file_path, metadata, debug=_debug(debug)
+        )
+        async for event, payload in turn:
+            body = json.dumps(payload, ensure_ascii=False)
+            yield f"event: {event}\ndata: {body}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _debug(header: Optional[str]) -> bool:
+    """``X-Spendly-Debug: 1`` adds a per-stage ``timings`` breakdown."""
+
+    return (header or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _chat_metadata(**fields: Any) -> dict:
+    metadata = {k: v for k, v in fields.items() if v is not None}
+    try:
+        # Reject bad windows up front rather than mid-turn (or mid-stream)
+        resolve_window(metadata, date.today())
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return metadata
+
+
 if __name__ == "__main__":
     import uvicorn
 
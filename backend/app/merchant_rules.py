@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import csv
+import hashlib
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.config import settings
+
+
+# Joins descriptions when a whole column is scanned in one pass; it is not
+# alphanumeric, so it also acts as a word boundary between rows.
+_ROW_SEPARATOR = "\n"
+
+
+class MerchantRules:
+    """Keyword -> category rules compiled into one Aho-Corasick automaton.
+
+    Matching walks each description once, so the cost per row is
+    O(len(description) + matches) no matter how many rules are loaded.
+    Keywords only match on word boundaries. When several keywords match,
+    the highest priority wins, then the longest keyword, then the earliest.
+    """
+
+    def __init__(
+        self, rules: Iterable[Tuple[str, str, int]], version: str = ""
+    ) -> None:
+        self.version = version
+        self._keywords: List[str] = []
+        self._categories: List[str] = []
+        self._priorities: List[int] = []
+        # Node 0 is the root; each node has goto edges, a fail link and the
+        # rule ids ending there (including those reachable via fail links).
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+
+        seen: Dict[str, int] = {}
+        for keyword, category, priority in rules:
+            keyword = " ".join(keyword.lower().split())
+            if not keyword:
+                continue
+            if keyword in seen:
+                # Later duplicates override earlier ones, e.g. local overrides
+                rid = seen[keyword]
+                self._categories[rid] = category
+                self._priorities[rid] = priority
+                continue
+            rid = seen[keyword] = len(self._keywords)
+            self._keywords.append(keyword)
+            self._categories.append(category)
+            self._priorities.append(priority)
+            self._insert(keyword, rid)
+        self._link()
+
+    def __len__(self) -> int:
+        return len(self._keywords)
+
+    def _insert(self, keyword: str, rid: int) -> None:
+        node = 0
+        for ch in keyword:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = nxt
+        self._out[node] = self._out[node] + (rid,)
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+                queue.append(child)
+
+    def _scan(self, text: str) -> Iterable[Tuple[int, int]]:
+        """Yield (end_index, rule_id) for every word-bounded keyword hit."""
+
+        goto, fail, out, keywords = self._goto, self._fail, self._out, self._keywords
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if not out[node]:
+                continue
+            after_ok = i + 1 == len(text) or not text[i + 1].isalnum()
+            if not after_ok:
+                continue
+            for rid in out[node]:
+                start = i + 1 - len(keywords[rid])
+                if start == 0 or not text[start - 1].isalnum():
+                    yield i, rid
+
+    def _better(self, rid: int, best: Optional[int]) -> bool:
+        if best is None:
+            return True
+        return (self._priorities[rid], len(self._keywords[rid])) > (
+            self._priorities[best],
+            len(self._keywords[best]),
+        )
+
+    def match(self, desc: str) -> Optional[str]:
+        """Return the category of the best matching rule, or None."""
+
+        best: Optional[int] = None
+        for _, rid in self._scan(" ".join(desc.lower().split())):
+            if self._better(rid, best):
+                best = rid
+        return None if best is None else self._categories[best]
+
+    def match_many(self, descs: Sequence[str]) -> List[Optional[str]]:
+        """Categorize a column of descriptions with a single automaton pass."""
+
+        unique: Dict[str, int] = {}
+        for desc in descs:
+            unique.setdefault(" ".join(desc.lower().split()), len(unique))
+        texts = list(unique)
+
+        # Offsets of each row inside the joined text, for mapping hits back
+        ends: List[int] = []
+        pos = 0
+        for text in texts:
+            pos += len(text)
+            ends.append(pos)
+            pos += len(_ROW_SEPARATOR)
+
+        best: List[Optional[int]] = [None] * len(texts)
+        row = 0
+        for end, rid in self._scan(_ROW_SEPARATOR.join(texts)):
+            while end >= ends[row]:
+                row += 1
+            if self._better(rid, best[row]):
+                best[row] = rid
+
+        categories = [None if b is None else self._categories[b] for b in best]
+        return [
+            categories[unique[" ".join(desc.lower().split())]] for desc in descs
+        ]
+
+
+def load_rules(path: str) -> MerchantRules:
+    """Load ``keyword,category,priority`` rows from a CSV rules file."""
+
+    with open(path, "rb") as f:
+        raw = f.read()
+    version = hashlib.sha1(raw).hexdigest()[:12]
+
+    rows: List[Tuple[str, str, int]] = []
+    reader = csv.DictReader(raw.decode("utf-8").splitlines())
+    for row in reader:
+        keyword = (row.get("keyword") or "").strip()
+        category = (row.get("category") or "").strip()
+        if not keyword or keyword.startswith("#") or not category:
+            continue
+        try:
+            priority = int(row.get("priority") or 0)
+        except ValueError:
+            priority = 0
+        rows.append((keyword, category, priority))
+    return MerchantRules(rows, version=version)
+
+
+_rules: Optional[MerchantRules] = None
+_rules_lock = threading.Lock()
+
+
+def get_rules() -> MerchantRules:
+    """Return the process-wide rule engine, compiling it on first use."""
+
+    global _rules
+    if _rules is None:
+        with _rules_lock:
+            if _rules is None:
+                _rules = load_rules(settings.merchant_rules_path)
+    return _rules
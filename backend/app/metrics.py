@@ -0,0 +1,337 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    get_args,
+)
+
+from app.models import IntentType
+from app.prompts import estimate_tokens
+
+
+# Seconds; spans in-memory agent math up to slow multi-batch LLM work
+LATENCY_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_labels(self.labels, key)} {_number(value)}"
+            for key, value in items
+        ]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> (per-bucket counts, +Inf count, sum)
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(
+                (key, (list(s[0]), s[1], s[2])) for key, s in self._series.items()
+            )
+        lines = []
+        for key, (counts, total, value_sum) in items:
+            for bound, count in zip(self.buckets, counts):
+                le = _labels(self.labels, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {count}")
+            le = _labels(self.labels, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {total}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {value_sum!r}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {total}")
+        return lines
+
+
+class Registry:
+    """Metrics rendered in the Prometheus text exposition format."""
+
+    def __init__(self) -> None:
+        self._metrics: List[Any] = []
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self, name: str, help: str, labels: Tuple[str, ...] = ()
+    ) -> Histogram:
+        metric = Histogram(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "spendly_stage_seconds", "Time spent per pipeline stage.", ("stage", "intent")
+)
+TURNS = registry.counter(
+    "spendly_turns_total", "Chat turns handled.", ("intent", "status")
+)
+ERRORS = registry.counter(
+    "spendly_errors_total",
+    "Exceptions raised out of a stage.",
+    ("stage", "intent", "error"),
+)
+LLM_CALLS = registry.counter(
+    "spendly_llm_calls_total",
+    "LLM requests by the stage that made them (outcome: ok, error, cached).",
+    ("stage", "intent", "outcome"),
+)
+LLM_SECONDS = registry.histogram(
+    "spendly_llm_seconds", "LLM request latency.", ("stage", "intent")
+)
+LLM_CHARS = registry.counter(
+    "spendly_llm_chars_total",
+    "Characters sent to and received from the LLM.",
+    ("stage", "intent", "direction"),
+)
+LLM_TOKENS = registry.counter(
+    "spendly_llm_tokens_total",
+    "Estimated tokens sent to and received from the LLM.",
+    ("stage", "intent", "direction"),
+)
+TAX_ANSWERS = registry.counter(
+    "spendly_tax_answers_total",
+    "Tax question answers by extraction path (method: rules, llm).",
+    ("method",),
+)
+CACHE_REQUESTS = registry.counter(
+    "spendly_cache_requests_total",
+    "Cache lookups (cache: llm, category, parsed, payslip).",
+    ("cache", "result"),
+)
+SUMMARY_OVER_BUDGET = registry.counter(
+    "spendly_summary_over_budget_total",
+    "Summary prompts still over their token budget after every shrink step.",
+    ("intent",),
+)
+
+
+_intent: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "metrics_intent", default="none"
+)
+_stage: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "metrics_stage", default="none"
+)
+# Per-turn (stage, seconds) log for the debug breakdown; shared by reference
+# with worker threads and tasks spawned during the turn
+_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = (
+    contextvars.ContextVar("metrics_timings", default=None)
+)
+
+
+# Label values for ``intent``: the known intents, "none" and "other", so a
+# client sending arbitrary intents cannot grow the series without bound
+_INTENTS = frozenset(get_args(IntentType))
+
+
+def _intent_label(intent: Optional[str]) -> str:
+    if not intent:
+        return "none"
+    return intent if intent in _INTENTS else "other"
+
+
+@contextmanager
+def turn(intent: str) -> Iterator[List[Tuple[str, float]]]:
+    """Label everything recorded inside with ``intent`` (see
+    ``_intent_label``) and collect the turn's stage timings into the yielded
+    list."""
+
+    timings: List[Tuple[str, float]] = []
+    intent = _intent_label(intent)
+    intent_token = _intent.set(intent)
+    timings_token = _timings.set(timings)
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield timings
+    except (asyncio.CancelledError, GeneratorExit):
+        # Client went away (e.g. a closed event stream)
+        status = "cancelled"
+        raise
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        observe("turn", time.perf_counter() - start)
+        TURNS.inc(intent=intent, status=status)
+        try:
+            _timings.reset(timings_token)
+            _intent.reset(intent_token)
+        except ValueError:
+            # A streamed turn closed from another context; nothing to restore
+            pass
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block as pipeline stage ``name``; exceptions are counted."""
+
+    token = _stage.set(name)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as exc:
+        ERRORS.inc(stage=name, intent=_intent.get(), error=type(exc).__name__)
+        raise
+    finally:
+        _stage.reset(token)
+        observe(name, time.perf_counter() - start)
+
+
+def observe(name: str, seconds: float) -> None:
+    """Record ``seconds`` spent in stage ``name`` (for spans that cannot be
+    wrapped in ``stage``)."""
+
+    STAGE_SECONDS.observe(seconds, stage=name, intent=_intent.get())
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """Decorator form of ``stage`` for plain functions."""
+
+    def decorate(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with stage(name):
+                return fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+def record_llm(
+    prompt: str,
+    response: str,
+    seconds: float,
+    error: Optional[BaseException] = None,
+) -> None:
+    labels = {"stage": _stage.get(), "intent": _intent.get()}
+    LLM_CALLS.inc(outcome="error" if error is not None else "ok", **labels)
+    LLM_SECONDS.observe(seconds, **labels)
+    LLM_CHARS.inc(len(prompt), direction="prompt", **labels)
+    LLM_TOKENS.inc(estimate_tokens(prompt), direction="prompt", **labels)
+    if response:
+        LLM_CHARS.inc(len(response), direction="response", **labels)
+        LLM_TOKENS.inc(estimate_tokens(response), direction="response", **labels)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append(("llm", seconds))
+
+
+def record_llm_cached() -> None:
+    LLM_CALLS.inc(stage=_stage.get(), intent=_intent.get(), outcome="cached")
+
+
+def record_cache(cache: str, hit: bool, count: int = 1) -> None:
+    if count:
+        CACHE_REQUESTS.inc(count, cache=cache, result="hit" if hit else "miss")
+
+
+def record_summary_over_budget(intent: Optional[str]) -> None:
+    SUMMARY_OVER_BUDGET.inc(intent=_intent_label(intent))
+
+
+def breakdown(timings: List[Tuple[str, float]]) -> Dict[str, Dict[str, Any]]:
+    """``{stage: {"ms": total, "count": n}}`` in first-seen order. Stages
+    nest (``llm`` inside ``narrative`` inside ``turn``), so they overlap."""
+
+    out: Dict[str, Dict[str, Any]] = {}
+    for name, seconds in list(timings):
+        entry = out.setdefault(name, {"ms": 0.0, "count": 0})
+        entry["ms"] += seconds * 1000
+        entry["count"] += 1
+    for entry in out.values():
+        entry["ms"] = round(entry["ms"], 3)
+    return out
+
+
+def render() -> str:
+    return registry.render()
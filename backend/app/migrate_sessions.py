@@ -0,0 +1,42 @@
+"""Import JSON session files into the SQLite session store.
+
+    python -m app.migrate_sessions [--sessions-dir DIR] [--db PATH]
+
+Safe to re-run: each imported session replaces its previous copy.
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+
+from app.config import settings
+from app.session_store import SqliteSessionStore
+
+
+def migrate(sessions_dir: str, db_path: str) -> int:
+    store = SqliteSessionStore(db_path)
+    count = 0
+    for path in sorted(glob.glob(os.path.join(sessions_dir, "*.json"))):
+        session_id = os.path.splitext(os.path.basename(path))[0]
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        store.save(session_id, data)
+        count += 1
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions-dir", default=settings.sessions_dir)
+    parser.add_argument("--db", default=settings.session_db_path)
+    args = parser.parse_args()
+
+    count = migrate(args.sessions_dir, args.db)
+    print(f"Imported {count} session(s) into {args.db}")
+
+
+if __name__ == "__main__":
+    main()
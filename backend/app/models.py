@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from typing import Any, Dict, List, Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 IntentType = Literal["spending_plan", "tax_saver", "investment", "loan"]
@@ -18,7 +18,15 @@ class ChatRequest(BaseModel):
     message: str
     intent: Optional[IntentType] = None
     cibil_score: Optional[int] = None
+    tenure_months: Optional[int] = Field(None, gt=0, le=600)
+    horizon_years: Optional[int] = Field(None, gt=0, le=30)
+    goal_amount: Optional[float] = Field(None, ge=0)
     file_path: Optional[str] = None
+    # History owner (defaults to the session) and optional date window
+    user_id: Optional[str] = None
+    window: Optional[str] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
     metadata: Dict[str, Any] = {}
 
 
@@ -43,3 +51,20 @@ class ParsedDocument(BaseModel):
     payslip_info: Dict[str, Any] = {}
 
 
+class TaxAnswer(BaseModel):
+    """Tax-relevant details from the user's answers to the tax questions.
+    ``None`` means not mentioned; amounts are rupees, monthly for rent and
+    EMIs, yearly for the premium and loan interest."""
+
+    pays_rent: Optional[bool] = None
+    rent_amount: Optional[float] = None
+    rent_city: Optional[str] = None
+    has_health_insurance: Optional[bool] = None
+    health_premium: Optional[float] = None
+    has_home_loan: Optional[bool] = None
+    has_education_loan: Optional[bool] = None
+    home_loan_emi: Optional[float] = None
+    home_loan_interest_year: Optional[float] = None
+    education_loan_emi: Optional[float] = None
+    education_loan_interest_year: Optional[float] = None
+    loan_amount: Optional[float] = None
@@ -1,18 +1,41 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+import asyncio
+import time
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional, Tuple
 
-from app.agents.document_parser import parse_bank_csv
-from app.agents.investment_agent import build_investment_plan
-from app.agents.loan_agent import loan_eligibility
-from app.agents.spending_agent import build_spending_plan
+from app import metrics
+from app.agents.investment_agent import (
+    DEFAULT_HORIZON_YEARS,
+    investment_facts,
+    investment_prompt,
+)
+from app.agents.loan_agent import DEFAULT_TENURE_MONTHS, loan_facts, loan_prompt
+from app.agents.spending_agent import spending_facts, spending_prompt
 from app.agents.tax_agent import (
-    compute_tax_plan,
     get_next_question,
-    record_tax_answer,
+    record_tax_answer_async,
+    tax_facts,
+    tax_prompt,
+)
+from app.config import settings
+from app.history import add_statement, load_history, resolve_window, window_view
+from app.llm_client import call_llm_async, call_llm_stream_async
+from app.jobs import PAYSLIP, STATEMENT, ingest
+from app.parse_cache import (
+    get_parsed_payslips,
+    load_bank_document,
+    payslip_cache_key,
 )
-from app.llm_client import call_llm
-from app.session_store import load_session, save_session
+from app.payslips import summarize_payslips
+from app.prompts import build_summary_prompt, estimate_tokens, summary_budget
+from app.session_store import append_turn, load_session, session_turn
+
+
+# Messages returned to the client per turn; the two newest are this turn's
+RECENT_MESSAGES = 8
+# Intents that take income from an uploaded payslip PDF
+PAYSLIP_INTENTS = ("tax_saver", "loan")
 
 
 def run_turn(
@@ -21,23 +44,173 @@ def run_turn(
     message: str,
     file_path: Optional[str],
     metadata: Dict[str, Any],
+    debug: bool = False,
 ) -> Dict[str, Any]:
     """Single conversational turn orchestration."""
 
-    session = load_session(session_id)
+    return asyncio.run(
+        run_turn_async(session_id, intent, message, file_path, metadata, debug)
+    )
+
+
+async def run_turn_async(
+    session_id: str,
+    intent: str,
+    message: str,
+    file_path: Optional[str],
+    metadata: Dict[str, Any],
+    debug: bool = False,
+) -> Dict[str, Any]:
+    """``run_turn`` for the event loop: LLM calls are awaited and blocking
+    file work (session I/O, statement parsing) runs in worker threads.
+
+    With ``debug`` the response carries a per-stage ``timings`` breakdown.
+    """
+
+    with metrics.turn(intent) as timings:
+        async with session_turn(session_id):
+            session, result, narrative = await _prepare_turn(
+                session_id, intent, message, file_path, metadata
+            )
+            summary, orchestration = await _generate_replies(
+                intent, message, result, narrative
+            )
+            response = await _finish_turn(
+                session_id, session, result, summary, orchestration
+            )
+        if debug:
+            response["timings"] = metrics.breakdown(timings)
+        return response
+
+
+async def stream_turn(
+    session_id: str,
+    intent: str,
+    message: str,
+    file_path: Optional[str],
+    metadata: Dict[str, Any],
+    debug: bool = False,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """Run a turn as a sequence of ``(event, payload)`` pairs.
+
+    ``started`` is sent before any waiting (the session lock, an ingestion
+    job still parsing the upload, the LLM reading a tax answer). ``data``
+    carries the deterministic agent numbers as soon as they are computed,
+    ``token`` events stream the summary (written from those numbers) while
+    the agent narrative is generated concurrently, then ``narrative`` and
+    finally ``done`` with the same payload as ``run_turn``. The session is
+    saved just before ``done``.
+    """
+
+    with metrics.turn(intent) as timings:
+        yield "started", {"session_id": session_id, "intent": intent}
+        async with session_turn(session_id):
+            async for event, payload in _stream_turn(
+                session_id, intent, message, file_path, metadata
+            ):
+                if event == "done" and debug:
+                    payload["timings"] = metrics.breakdown(timings)
+                yield event, payload
+
+
+async def _stream_turn(
+    session_id: str,
+    intent: str,
+    message: str,
+    file_path: Optional[str],
+    metadata: Dict[str, Any],
+) -> AsyncIterator[Tuple[str, Any]]:
+    start = time.perf_counter()
+    session, result, narrative = await _prepare_turn(
+        session_id, intent, message, file_path, metadata
+    )
+    yield "data", dict(result)
+
+    narrative_task = None
+    if narrative is not None:
+        narrative_task = asyncio.create_task(
+            _timed("narrative", call_llm_async(narrative[1]))
+        )
+
+    try:
+        summary_start = time.perf_counter()
+        parts = []
+        with metrics.stage("summary"):
+            request = summary_prompt(message, result, intent)
+            async for text in call_llm_stream_async(request):
+                parts.append(text)
+                yield "token", text
+        summary = "".join(parts).strip()
+        summary_s = time.perf_counter() - summary_start
+
+        narrative_s = 0.0
+        if narrative_task is not None:
+            key = narrative[0]
+            result[key], narrative_s = await narrative_task
+            yield "narrative", {"key": key, "text": result[key]}
+    finally:
+        if narrative_task is not None and not narrative_task.done():
+            narrative_task.cancel()
+
+    wall_s = time.perf_counter() - start
+    orchestration = {
+        "mode": "stream",
+        "narrative_s": round(narrative_s, 3),
+        "summary_s": round(summary_s, 3),
+        "wall_s": round(wall_s, 3),
+        "saved_s": round(max(0.0, narrative_s + summary_s - wall_s), 3),
+        "summary_prompt_tokens": estimate_tokens(request),
+    }
+    yield "done", await _finish_turn(
+        session_id, session, result, summary, orchestration
+    )
+
+
+async def _prepare_turn(
+    session_id: str,
+    intent: str,
+    message: str,
+    file_path: Optional[str],
+    metadata: Dict[str, Any],
+) -> Tuple[Dict[str, Any], Dict[str, Any], Optional[Tuple[str, str]]]:
+    """Load the session, record the user message and run the deterministic
+    part of the intent. Returns (session, result, pending narrative)."""
+
+    # Only the tail that is echoed back is loaded; new messages are appended
+    session = await asyncio.to_thread(
+        load_session, session_id, RECENT_MESSAGES - 2
+    )
     state = session.get("state", {})
     messages = session.get("messages", [])
 
     messages.append({"role": "user", "content": message})
 
     result: Dict[str, Any] = {}
+    # Agent narrative still to be generated: (result key, prompt)
+    narrative: Optional[Tuple[str, str]] = None
+
+    user_id = str(metadata.get("user_id") or session_id)
+
+    # Uploads are ingested in the background from /upload; a turn waits on
+    # that job (or starts one) instead of parsing inline
+    if file_path and intent in PAYSLIP_INTENTS and is_payslip(file_path):
+        with metrics.stage("ingest"):
+            await ingest(file_path, PAYSLIP)
+            await asyncio.to_thread(_add_payslip, state, file_path)
 
     if intent == "spending_plan":
         if file_path:
-            parsed = parse_bank_csv(file_path)
-            state["parsed_bank"] = parsed
-        parsed = state.get("parsed_bank") or {}
-        result = build_spending_plan(parsed)
+            with metrics.stage("ingest"):
+                ref = await ingest(file_path, STATEMENT)
+                state["bank_doc"] = ref
+                state.pop("parsed_bank", None)
+                await asyncio.to_thread(_add_to_history, user_id, ref)
+        parsed = await _statement_view(state, user_id, metadata)
+        result = spending_facts(parsed)
+        if "window" in parsed:
+            result["window"] = parsed["window"]
+            result["month_over_month"] = parsed["month_over_month"]
+        narrative = ("narrative", spending_prompt(result))
 
     elif intent == "tax_saver":
         # Assume income from previous parsed doc or fallback
@@ -47,7 +220,7 @@ def run_turn(
 
         # If there is an outstanding question, record the latest answer
         if state.get("awaiting_tax_answer"):
-            record_tax_answer(state, message)
+            await record_tax_answer_async(state, message)
             state["awaiting_tax_answer"] = False
 
         q = get_next_question(state)
@@ -55,11 +228,20 @@ def run_turn(
             state["awaiting_tax_answer"] = True
             result = {"follow_up_question": q}
         else:
-            result = compute_tax_plan(state, float(annual_income))
+            result = tax_facts(state, float(annual_income))
+            narrative = ("recommendation", tax_prompt(state, result))
 
     elif intent == "investment":
-        parsed = state.get("parsed_bank") or {}
-        result = build_investment_plan(parsed)
+        parsed = await _statement_view(state, user_id, metadata)
+        horizon_years = int(metadata.get("horizon_years") or DEFAULT_HORIZON_YEARS)
+        goal_amount = metadata.get("goal_amount")
+        # The projection is numpy work (a cold simulation takes ~0.1-0.5 s)
+        result = await asyncio.to_thread(
+            investment_facts, parsed, horizon_years, goal_amount
+        )
+        if "window" in parsed:
+            result["window"] = parsed["window"]
+        narrative = ("narrative", investment_prompt(result))
 
     elif intent == "loan":
         monthly_income = float(
@@ -67,39 +249,180 @@ def run_turn(
         )
         existing_emi = float(metadata.get("existing_emi") or 0.0)
         cibil_score = int(metadata.get("cibil_score") or 0)
-        result = loan_eligibility(monthly_income, existing_emi, cibil_score)
+        tenure_months = int(metadata.get("tenure_months") or DEFAULT_TENURE_MONTHS)
+        result = loan_facts(monthly_income, existing_emi, cibil_score, tenure_months)
+        narrative = ("narrative", loan_prompt(result))
 
-    summary_prompt = f"""
-You are Spendly, a clear and concise personal finance assistant.
+    session["messages"] = messages
+    session["state"] = state
+    return session, result, narrative
 
-CONTEXT
-- Latest user message: {message}
-- Agent result JSON (may contain numbers and flags): {result}
 
-TASK
-- Summarise the key insights for the user in a way that feels like a WhatsApp chat reply.
+def is_payslip(path: str) -> bool:
+    return path.lower().endswith(".pdf")
 
-OUTPUT FORMAT (PLAIN TEXT, NO MARKDOWN)
-- First line: 1 short sentence summarising the situation in plain language.
-- Then 3–6 bullets starting with "- " that:
-  - highlight the 2–3 most important numbers or flags,
-  - suggest next actions the user can take this month,
-  - avoid jargon.
-- Keep each bullet to max 2 short sentences.
-- Do NOT use **bold**, headings, tables, or markdown.
-"""
-    summary = call_llm(summary_prompt)
 
-    messages.append({"role": "assistant", "content": summary})
+def _add_payslip(state: Dict[str, Any], path: str) -> None:
+    """Add a payslip PDF's slips to the session (one per pay period, so a
+    year can be uploaded slip by slip) and refresh the income figures the
+    tax and loan agents read."""
 
-    session["messages"] = messages
-    session["state"] = state
-    save_session(session_id, session)
+    parsed = get_parsed_payslips([path])[0]
+    doc_id = payslip_cache_key(path)
+    slips = state.setdefault("payslips", {})
+    for i, slip in enumerate(parsed["slips"]):
+        slips[slip.get("period") or f"{doc_id}:{i}"] = slip
+    summary = summarize_payslips(list(slips.values()))
+    if summary:
+        state["payslip"] = summary
+        state["annual_income"] = summary["annual_income"]
+        state["monthly_income"] = summary["monthly_income"]
+
+
+def _add_to_history(user_id: str, ref: Dict[str, Any]) -> None:
+    # A parse with categorization failures is redone on the next upload;
+    # only the complete one joins the history
+    if ref.get("uncategorized") or ref["doc_id"] in load_history(user_id).documents:
+        return
+    parsed = load_bank_document(ref)
+    add_statement(user_id, ref["doc_id"], parsed.get("transactions", []))
+
+
+def _history_window(
+    state: Dict[str, Any], user_id: str, metadata: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    if not any(metadata.get(k) for k in ("window", "start_date", "end_date")):
+        return None
+    ref = state.get("bank_doc")
+    if ref:
+        # Statements uploaded before histories existed join on first use
+        _add_to_history(user_id, ref)
+    history = load_history(user_id)
+    if not history.documents:
+        return None
+    window = resolve_window(metadata, history.last_date)
+    if window is None:
+        return None
+    return window_view(history, *window)
+
+
+async def _statement_view(
+    state: Dict[str, Any], user_id: str, metadata: Dict[str, Any]
+) -> Dict[str, Any]:
+    """What the spending and investment agents analyse: the user's history
+    over the requested date window, else the latest statement."""
+
+    with metrics.stage("history"):
+        view = await asyncio.to_thread(_history_window, state, user_id, metadata)
+    if view is not None:
+        return view
+    return await _bank_document(state)
+
+
+async def _bank_document(state: Dict[str, Any]) -> Dict[str, Any]:
+    """The session's parsed statement for the agents.
+
+    Current references carry the statement's aggregates, which is all the
+    agents read; older ones are resolved through the artifact store.
+    """
+
+    ref = state.get("bank_doc")
+    if ref and "aggregates" in ref:
+        return ref
+    if ref:
+        return await asyncio.to_thread(load_bank_document, ref)
+    # Sessions saved before statements were stored by reference
+    return state.get("parsed_bank") or {}
+
+
+async def _finish_turn(
+    session_id: str,
+    session: Dict[str, Any],
+    result: Dict[str, Any],
+    summary: str,
+    orchestration: Dict[str, Any],
+) -> Dict[str, Any]:
+    messages = session["messages"]
+    messages.append({"role": "assistant", "content": summary})
+    await asyncio.to_thread(
+        append_turn, session_id, messages[-2:], session["state"]
+    )
 
     return {
-        "messages": messages[-8:],
+        "messages": messages[-RECENT_MESSAGES:],
         "summary": summary,
         "data": result,
+        "orchestration": orchestration,
     }
 
 
+def _parallel_intents() -> set:
+    return {i.strip() for i in settings.parallel_summary_intents.split(",")}
+
+
+async def _timed(stage: str, call: Awaitable[str]) -> Tuple[str, float]:
+    start = time.perf_counter()
+    with metrics.stage(stage):
+        text = await call
+    return text, time.perf_counter() - start
+
+
+async def _generate_replies(
+    intent: str,
+    message: str,
+    result: Dict[str, Any],
+    narrative: Optional[Tuple[str, str]],
+) -> Tuple[str, Dict[str, Any]]:
+    """Generate the agent narrative (stored into ``result``) and the summary.
+
+    In ``parallel`` mode the summary is written from the deterministic
+    numbers and flags alone, concurrently with the narrative, so the turn
+    costs about one LLM round trip. In ``sequential`` mode the summary also
+    sees the narrative. Returns the summary and a latency report.
+    """
+
+    start = time.perf_counter()
+    parallel = narrative is not None and intent in _parallel_intents()
+
+    narrative_s = 0.0
+    if parallel:
+        key, prompt = narrative
+        request = summary_prompt(message, result, intent)
+        (result[key], narrative_s), (summary, summary_s) = await asyncio.gather(
+            _timed("narrative", call_llm_async(prompt)),
+            _timed("summary", call_llm_async(request, cache=False)),
+        )
+    else:
+        if narrative is not None:
+            key, prompt = narrative
+            result[key], narrative_s = await _timed(
+                "narrative", call_llm_async(prompt)
+            )
+        request = summary_prompt(message, result, intent)
+        summary, summary_s = await _timed(
+            "summary", call_llm_async(request, cache=False)
+        )
+
+    wall_s = time.perf_counter() - start
+    return summary, {
+        "mode": "parallel" if parallel else "sequential",
+        "narrative_s": round(narrative_s, 3),
+        "summary_s": round(summary_s, 3),
+        "wall_s": round(wall_s, 3),
+        # Time a strictly sequential narrative -> summary chain would have taken
+        "saved_s": round(max(0.0, narrative_s + summary_s - wall_s), 3),
+        "summary_prompt_tokens": estimate_tokens(request),
+    }
+
+
+def summary_prompt(
+    message: str, result: Dict[str, Any], intent: Optional[str] = None
+) -> str:
+    """``build_summary_prompt``, counting prompts it could not shrink to the
+    intent's budget (``spendly_summary_over_budget_total``)."""
+
+    prompt = build_summary_prompt(message, result, intent)
+    budget = summary_budget(intent)
+    if budget and estimate_tokens(prompt) > budget:
+        metrics.record_summary_over_budget(intent)
+    return prompt
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from app import metrics
+from app.agents.document_parser import (
+    PARSER_VERSION,
+    finish_statement,
+    parse_bank_csv,
+    read_statement,
+)
+from app.aggregates import compact_aggregates
+from app.config import settings
+from app.merchant_rules import get_rules
+from app.payslips import PAYSLIP_PARSER_VERSION, parse_payslip_pdfs
+
+
+_SHA256_NAME = re.compile(r"^[0-9a-f]{64}$")
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's content.
+
+    Uploads are already stored under their SHA-256 (see ``/upload``), so for
+    those the name is trusted instead of re-reading the file.
+    """
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    in_uploads = os.path.dirname(os.path.abspath(path)) == os.path.abspath(
+        settings.uploads_dir
+    )
+    if in_uploads and _SHA256_NAME.match(stem):
+        return stem
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(path: str) -> str:
+    """Content hash + parser version + rules version.
+
+    Bumping ``PARSER_VERSION`` or editing the merchant rules file changes the
+    key, so stale parses are simply never looked up again.
+    """
+
+    return f"{file_digest(path)}-p{PARSER_VERSION}-r{get_rules().version}"
+
+
+def _entry_path(key: str) -> str:
+    return os.path.join(settings.parsed_cache_dir, f"{key}.pkl.z")
+
+
+def load_cached(key: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_entry_path(key), "rb") as f:
+            return pickle.loads(zlib.decompress(f.read()))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, pickle.UnpicklingError, zlib.error, EOFError):
+        # Corrupt or truncated entry: treat as a miss, it will be rewritten
+        return None
+
+
+def store_cached(key: str, parsed: Dict[str, Any]) -> None:
+    os.makedirs(settings.parsed_cache_dir, exist_ok=True)
+    blob = zlib.compress(pickle.dumps(parsed, protocol=pickle.HIGHEST_PROTOCOL), 3)
+    fd, tmp_path = tempfile.mkstemp(dir=settings.parsed_cache_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, _entry_path(key))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def store_complete(key: str, parsed: Dict[str, Any]) -> None:
+    """``store_cached`` unless some transactions only fell back to "Others"
+    because categorization failed; those parses are redone next time."""
+
+    if not parsed.get("uncategorized"):
+        store_cached(key, parsed)
+
+
+def _get_or_parse(key: str, path: str) -> Dict[str, Any]:
+    parsed = load_cached(key)
+    metrics.record_cache("parsed", parsed is not None)
+    if parsed is None:
+        with metrics.stage("parse"):
+            parsed = parse_bank_csv(path)
+        store_complete(key, parsed)
+    return parsed
+
+
+def get_parsed_bank(path: str) -> Dict[str, Any]:
+    """``parse_bank_csv`` with a persistent cache keyed by file content."""
+
+    return _get_or_parse(cache_key(path), path)
+
+
+def bank_document_ref(path: str) -> Dict[str, Any]:
+    """Parse (or reuse) a statement and return a small reference to it.
+
+    Sessions keep this instead of the transactions: the cache entry id, the
+    source path (to re-parse if the entry is gone), headline numbers and the
+    compact aggregates the agents work from.
+    """
+
+    key = cache_key(path)
+    return document_ref(key, path, _get_or_parse(key, path))
+
+
+def document_ref(key: str, path: str, parsed: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "doc_id": key,
+        "path": path,
+        "income": parsed["income"],
+        "emergencyFund": parsed["emergencyFund"],
+        "transaction_count": len(parsed["transactions"]),
+        "uncategorized": parsed.get("uncategorized", 0),
+        "aggregates": compact_aggregates(parsed["aggregates"]),
+    }
+
+
+def read_and_spill(key: str, path: str) -> Tuple[str, List[Tuple[str, float]]]:
+    """First half of an ingestion job (see ``app.jobs``): read the statement
+    and spill its frames to a file in the parse cache directory. Runs in an
+    ingestion worker process, so only the spill path and the descriptions
+    that need the LLM travel back, never the frames."""
+
+    frames, unknown = read_statement(path)
+    os.makedirs(settings.parsed_cache_dir, exist_ok=True)
+    fd, spill = tempfile.mkstemp(
+        dir=settings.parsed_cache_dir, prefix=f"{key}-", suffix=".frames"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(frames, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except BaseException:
+        os.remove(spill)
+        raise
+    return spill, unknown
+
+
+def finish_and_store(
+    key: str,
+    path: str,
+    spill: str,
+    categories: Dict[str, str],
+) -> Dict[str, Any]:
+    """Second half of an ingestion job: load the frames ``read_and_spill``
+    left in ``spill`` (and remove it), build the parsed statement, cache it
+    under ``key`` (if complete) and return its reference. Also runs in a
+    worker, so only the small reference travels back."""
+
+    with open(spill, "rb") as f:
+        frames: List[pd.DataFrame] = pickle.load(f)
+    os.remove(spill)
+    parsed = finish_statement(frames, categories)
+    store_complete(key, parsed)
+    return document_ref(key, path, parsed)
+
+
+def load_bank_document(ref: Dict[str, Any]) -> Dict[str, Any]:
+    """Load the parsed statement behind a ``bank_document_ref``."""
+
+    parsed = load_cached(ref["doc_id"])
+    if parsed is None:
+        # Entry evicted or parser/rules changed since: rebuild from source
+        path = ref.get("path")
+        if not path or not os.path.exists(path):
+            return {}
+        parsed = get_parsed_bank(path)
+    return parsed
+
+
+def payslip_cache_key(path: str) -> str:
+    return f"{file_digest(path)}-s{PAYSLIP_PARSER_VERSION}"
+
+
+def get_parsed_payslips(paths: List[str]) -> List[Dict[str, Any]]:
+    """``parse_payslip_pdfs`` with the same content-keyed cache; the PDFs
+    not cached yet are parsed together in one pool batch."""
+
+    keys = [payslip_cache_key(path) for path in paths]
+    parsed: List[Optional[Dict[str, Any]]] = [load_cached(key) for key in keys]
+    missing = [i for i, entry in enumerate(parsed) if entry is None]
+    metrics.record_cache("payslip", True, len(paths) - len(missing))
+    metrics.record_cache("payslip", False, len(missing))
+    if missing:
+        with metrics.stage("parse_payslip"):
+            fresh = parse_payslip_pdfs([paths[i] for i in missing])
+        for i, entry in zip(missing, fresh):
+            store_cached(keys[i], entry)
+            parsed[i] = entry
+    return parsed  # type: ignore[return-value]
@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+
+# Bump whenever the extracted payslip fields change; it is part of the
+# parsed-payslip cache key (see app.parse_cache).
+PAYSLIP_PARSER_VERSION = "3"
+
+# Field -> label spellings. At a given position the first field listed wins.
+PAYSLIP_LABELS: Dict[str, str] = {
+    "gross": r"gross\s+(?:earnings|salary|pay)|total\s+earnings",
+    "net": r"net\s+(?:pay|salary)(?:able)?|take\s*home(?:\s+pay)?",
+    "basic": r"basic(?:\s+(?:salary|pay))?",
+    "hra": r"h\.?\s?r\.?\s?a\b\.?|house\s+rent\s+allowance",
+    "pf": r"(?:e\.?)?p\.?f\b\.?|provident\s+fund",
+    "tds": r"tds|tax\s+deducted(?:\s+at\s+source)?|income\s+tax",
+}
+AMOUNT_FIELDS = tuple(PAYSLIP_LABELS)
+_ALL_FIELDS = len(AMOUNT_FIELDS) + 1  # amounts + period
+
+_MONTHS = (
+    "jan", "feb", "mar", "apr", "may", "jun",
+    "jul", "aug", "sep", "oct", "nov", "dec",
+)
+_MONTH_NAME = (
+    r"jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?"
+    r"|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?"
+)
+# Words that introduce an identifier ("PF No. 1234567", "UAN 1000..."), not
+# an amount
+_ID_WORD = r"nos?|num(?:ber)?|a/?c|acc(?:oun)?t|uan|id|code|ref"
+
+
+def _period_pattern(month: str, year: str) -> str:
+    """A month name and year, optionally after "for the month of"."""
+
+    return (
+        r"(?:\s+for)?(?:\s+the\s+month)?(?:\s+of)?[\s:\-]{0,5}"
+        rf"(?P<{month}>{_MONTH_NAME})[\s\-,'/]{{0,3}}(?P<{year}>(?:19|20)?\d{{2}})\b"
+    )
+
+
+# One pass over a page finds every field: a label, then on the same line its
+# amount. Between them only a short note ("(u/s 192)"), the pay period
+# ("for the month of April 2024"), up to two qualifier words that are neither
+# month names nor identifier words ("Contribution", but not "No."), a
+# separator and a currency sign may appear, so a year, a date or an account
+# number is never read as the amount. The other alternative is the pay
+# period on its own ("Payslip for the month of April 2024").
+_PAYSLIP_PATTERN = re.compile(
+    # The lookahead lets the scan skip positions no label can start at
+    r"\b(?=[bghinpemst])(?:"
+    + "|".join(f"(?P<{field}>{label})" for field, label in PAYSLIP_LABELS.items())
+    + r")(?:[ \t]*\([^)\n]{0,20}\))?"
+    + f"(?:{_period_pattern('label_month', 'label_year')})?"
+    + rf"(?:[ \t]+(?!(?:{_MONTH_NAME}|{_ID_WORD})\b)[a-z]{{2,}}\.?){{0,2}}"
+    r"[ \t]*[:\-\u2013=|]?[ \t]*(?:(?:rs|inr)\.?|\u20b9)?[ \t]*"
+    r"(?P<amount>\d[\d,]*(?:\.\d{1,2})?)"
+    r"|\b(?:pay\s*(?:slip|period)|salary\s+slip|month)"
+    + _period_pattern("month", "year"),
+    re.IGNORECASE,
+)
+
+
+def _period(month: str, year: str) -> str:
+    number = int(year)
+    number += 2000 if number < 100 else 0
+    return f"{number:04d}-{_MONTHS.index(month[:3].lower()) + 1:02d}"
+
+
+def extract_fields(text: str) -> Dict[str, Any]:
+    """Payslip amounts (first occurrence of each field) and the pay period
+    (``YYYY-MM``) found in ``text``, in a single regex pass."""
+
+    fields: Dict[str, Any] = {}
+    for match in _PAYSLIP_PATTERN.finditer(text):
+        if len(fields) == _ALL_FIELDS:
+            # Everything found; the rest is leave tables, YTD columns, ...
+            break
+        if match.group("month"):
+            fields.setdefault(
+                "period", _period(match.group("month"), match.group("year"))
+            )
+            continue
+        if match.group("label_month"):
+            fields.setdefault(
+                "period",
+                _period(match.group("label_month"), match.group("label_year")),
+            )
+        field = next(f for f in AMOUNT_FIELDS if match.group(f) is not None)
+        if field not in fields:
+            fields[field] = float(match.group("amount").replace(",", ""))
+    return fields
+
+
+def slip_income(slip: Dict[str, Any]) -> float:
+    """Monthly gross pay: the stated gross, else basic + HRA."""
+
+    if slip.get("gross"):
+        return float(slip["gross"])
+    return float(slip.get("basic", 0.0)) + float(slip.get("hra", 0.0))
+
+
+def _open(path: str) -> Any:
+    # Imported here so the app starts without PyPDF2 until a PDF arrives
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(path)
+    if reader.is_encrypted and not reader.decrypt(""):
+        raise ValueError(f"Payslip PDF is password protected: {path}")
+    return reader
+
+
+def _extract(
+    pages: Any, start: int = 0, stop: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    stop = len(pages) if stop is None else stop
+    return [extract_fields(pages[i].extract_text() or "") for i in range(start, stop)]
+
+
+def extract_pages(
+    path: str, start: int = 0, stop: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """``extract_fields`` for pages ``start:stop`` of a PDF. Runs in the pool
+    workers, so only the small per-page dicts travel back, not the text."""
+
+    return _extract(_open(path).pages, start, stop)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Spawned, not forked: the server process runs threads
+                _pool = ProcessPoolExecutor(
+                    max_workers=settings.payslip_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+def read_payslip_pdfs(paths: List[str]) -> List[List[Dict[str, Any]]]:
+    """Per-page fields for each PDF in ``paths``.
+
+    Text extraction is pure Python and CPU bound, so it runs in a process
+    pool: one task per file, or, when there are fewer files than workers
+    (e.g. a year of slips exported as one PDF), tasks of
+    ``settings.payslip_pages_per_task`` pages. A batch that fits in one
+    task is read inline to skip the pool round trip.
+    """
+
+    workers = settings.payslip_workers
+    if workers <= 1:
+        return [extract_pages(path) for path in paths]
+
+    tasks: List[Tuple[int, str, int, Optional[int]]] = []
+    if len(paths) >= workers:
+        tasks = [(index, path, 0, None) for index, path in enumerate(paths)]
+    else:
+        step = max(1, settings.payslip_pages_per_task)
+        readers = [_open(path) for path in paths]
+        if sum(len(reader.pages) for reader in readers) <= step:
+            return [_extract(reader.pages) for reader in readers]
+        for index, (path, reader) in enumerate(zip(paths, readers)):
+            pages = len(reader.pages)
+            tasks.extend(
+                (index, path, start, min(start + step, pages))
+                for start in range(0, pages, step)
+            )
+
+    pool = _get_pool()
+    futures = [
+        (index, pool.submit(extract_pages, path, start, stop))
+        for index, path, start, stop in tasks
+    ]
+    pages_by_file: List[List[Dict[str, Any]]] = [[] for _ in paths]
+    # Tasks were queued in page order, so extending in order keeps it
+    for index, future in futures:
+        pages_by_file[index].extend(future.result())
+    return pages_by_file
+
+
+def group_slips(pages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merge consecutive pages into payslips. A page starts a new slip when
+    its pay period differs from the current one or it repeats an amount the
+    current slip already has (a year of slips exported as one PDF)."""
+
+    slips: List[Dict[str, Any]] = []
+    current: Dict[str, Any] = {}
+    for page in pages:
+        if not page:
+            continue
+        period = page.get("period")
+        new_period = period and current.get("period") not in (None, period)
+        repeats = any(f in current for f in AMOUNT_FIELDS if f in page)
+        if current and (new_period or repeats):
+            slips.append(current)
+            current = {}
+        for key, value in page.items():
+            current.setdefault(key, value)
+    if current:
+        slips.append(current)
+    return slips
+
+
+def parse_payslip_pdfs(paths: List[str]) -> List[Dict[str, Any]]:
+    """``{"slips": [...]}`` for each PDF, each slip holding the amounts
+    found (``gross``, ``net``, ``basic``, ``hra``, ``pf``, ``tds``), its
+    ``period`` when printed and the derived monthly ``income``."""
+
+    parsed = []
+    for pages in read_payslip_pdfs(paths):
+        slips = group_slips(pages)
+        for slip in slips:
+            slip["income"] = slip_income(slip)
+        parsed.append({"slips": slips})
+    return parsed
+
+
+def _annual(values: List[float]) -> float:
+    """A year from monthly values: the sum of the latest 12 months when a
+    full year is present, else the monthly average times 12."""
+
+    if not values:
+        return 0.0
+    if len(values) >= 12:
+        return float(sum(values[-12:]))
+    return float(sum(values) / len(values) * 12)
+
+
+def summarize_payslips(slips: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Income, salary split, PF and TDS figures for the tax and loan agents.
+
+    Slips for the same pay period count once (the later one wins); slips are
+    ordered by period, undated ones last in upload order.
+    """
+
+    by_period: Dict[str, Dict[str, Any]] = {}
+    undated: List[Dict[str, Any]] = []
+    for slip in slips:
+        if slip.get("period"):
+            by_period[slip["period"]] = slip
+        else:
+            undated.append(slip)
+    ordered = [by_period[p] for p in sorted(by_period)] + undated
+    if not ordered:
+        return {}
+
+    return {
+        "months": len(ordered),
+        "first_period": min(by_period) if by_period else None,
+        "last_period": max(by_period) if by_period else None,
+        "monthly_income": slip_income(ordered[-1]),
+        "annual_income": _annual([slip_income(s) for s in ordered]),
+        "annual_basic": _annual([float(s.get("basic", 0.0)) for s in ordered]),
+        "annual_hra": _annual([float(s.get("hra", 0.0)) for s in ordered]),
+        "annual_pf": _annual([float(s.get("pf", 0.0)) for s in ordered]),
+        "annual_tds": _annual([float(s.get("tds", 0.0)) for s in ordered]),
+    }
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import functools
+import threading
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+
+
+# Allocation buckets (the keys of the investment agent's ``allocation``) and
+# long-run assumptions per bucket: expected annual return, annual volatility
+BUCKETS = ("equity_sip", "debt_fd", "gold", "liquid")
+EXPECTED_RETURN = np.array([0.12, 0.07, 0.09, 0.055])
+VOLATILITY = np.array([0.16, 0.03, 0.14, 0.01])
+CORRELATION = np.array(
+    [
+        [1.0, 0.1, -0.1, 0.0],
+        [0.1, 1.0, 0.1, 0.3],
+        [-0.1, 0.1, 1.0, 0.0],
+        [0.0, 0.3, 0.0, 1.0],
+    ]
+)
+PERCENTILES = (10, 25, 50, 75, 90)
+MAX_HORIZON_YEARS = 30
+
+
+def _monthly_params() -> Tuple[np.ndarray, np.ndarray]:
+    """Drift and Cholesky factor of monthly log returns matching the annual
+    assumptions (lognormal, so the mean annual growth is 1 + return)."""
+
+    sigma = VOLATILITY / np.sqrt(12)
+    drift = np.log1p(EXPECTED_RETURN) / 12 - sigma**2 / 2
+    cov = CORRELATION * np.outer(sigma, sigma)
+    return drift, np.linalg.cholesky(cov)
+
+
+class _Simulation:
+    """Year-end values of a 1-rupee monthly SIP into each bucket, per path.
+
+    Portfolio outcomes are linear in the contributions, so any allocation
+    and amount is a weighted sum of these: one simulation per (path count,
+    seed) serves every request. It is extended a year at a time as longer
+    horizons are asked for; a shorter horizon is a prefix of a longer one
+    (same seed, same draws), so it is just a slice.
+    """
+
+    def __init__(self, paths: int, seed: int) -> None:
+        self.paths = paths - paths % 2
+        self.rng = np.random.default_rng(seed)
+        drift, chol = _monthly_params()
+        self.drift = drift.astype(np.float32)
+        self.chol = chol.astype(np.float32)
+        self.wealth = np.zeros((self.paths, len(BUCKETS)))
+        # (years, paths, buckets); float32 keeps 30 years of 20k paths ~10 MB
+        self.values = np.empty((0, self.paths, len(BUCKETS)), dtype=np.float32)
+        self.lock = threading.Lock()
+
+    def _year(self) -> np.ndarray:
+        half = self.paths // 2
+        draws = self.rng.standard_normal((12, half, len(BUCKETS)), dtype=np.float32)
+        shocks = draws @ self.chol.T
+        # Antithetic pairs (each draw and its negation): half the draws, and
+        # tighter percentile bands for the same path count
+        growth = np.empty((12, self.paths, len(BUCKETS)), dtype=np.float32)
+        np.exp(self.drift + shocks, out=growth[:, :half])
+        np.exp(self.drift - shocks, out=growth[:, half:])
+        for month in range(12):
+            # Contribution at the start of the month, grown through it
+            self.wealth += 1.0
+            self.wealth *= growth[month]
+        return self.wealth.astype(np.float32)
+
+    def values_for(self, years: int) -> np.ndarray:
+        with self.lock:
+            if len(self.values) < years:
+                more = [self._year() for _ in range(years - len(self.values))]
+                self.values = np.concatenate([self.values, np.stack(more)])
+                self.values.flags.writeable = False
+            return self.values[:years]
+
+
+_simulations: Dict[Tuple[int, int], _Simulation] = {}
+_simulations_lock = threading.Lock()
+
+
+def unit_paths(years: int, paths: int, seed: int) -> np.ndarray:
+    """Shape ``(years, paths, len(BUCKETS))``: per path, the value at each
+    year end of a 1-rupee monthly SIP into each bucket."""
+
+    with _simulations_lock:
+        simulation = _simulations.get((paths, seed))
+        if simulation is None:
+            simulation = _simulations[(paths, seed)] = _Simulation(paths, seed)
+    return simulation.values_for(years)
+
+
+@functools.lru_cache(maxsize=256)
+def _unit_projection(
+    shares: Tuple[float, ...], years: int, paths: int, seed: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Percentile bands per year and the sorted final values of a 1-rupee
+    monthly SIP split by ``shares``."""
+
+    portfolio = unit_paths(years, paths, seed) @ np.asarray(shares, dtype=np.float32)
+    bands = np.percentile(portfolio, PERCENTILES, axis=1)  # (percentiles, years)
+    final = np.sort(portfolio[-1])
+    final.flags.writeable = False
+    return bands, final
+
+
+def _shares(allocation: Dict[str, float]) -> Tuple[Tuple[float, ...], float]:
+    amounts = np.array([max(0.0, float(allocation.get(b, 0.0))) for b in BUCKETS])
+    total = float(amounts.sum())
+    if total <= 0:
+        return (), 0.0
+    # Rounded so near-identical splits share a cache entry
+    return tuple(np.round(amounts / total, 3).tolist()), total
+
+
+def probability_at_least(final: np.ndarray, scale: float, goal: float) -> float:
+    """Share of paths whose final value (per rupee of SIP, ``final``,
+    sorted) times ``scale`` reaches ``goal``."""
+
+    below = np.searchsorted(final, goal / scale, side="left")
+    return round(float(1.0 - below / len(final)), 4)
+
+
+def project_sip(
+    allocation: Dict[str, float],
+    years: int = 10,
+    goals: Sequence[float] = (),
+    paths: Optional[int] = None,
+    seed: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Monte Carlo projection of a monthly SIP split as ``allocation``
+    (rupees per ``BUCKETS`` key) over ``years``.
+
+    Returns the amount invested and the percentile bands of portfolio value
+    at each year end, and the probability of ending at or above each goal
+    (always including the amount invested, i.e. not losing money). Runs are
+    seeded, so the same inputs always give the same answer.
+    """
+
+    years = int(min(max(years, 1), MAX_HORIZON_YEARS))
+    paths = paths or settings.projection_paths
+    seed = settings.projection_seed if seed is None else seed
+    shares, monthly = _shares(allocation)
+    if not shares:
+        return {}
+
+    bands, final = _unit_projection(shares, years, paths, seed)
+    invested = monthly * 12 * years
+    targets = [invested] + [float(g) for g in goals if g and g > 0]
+    return {
+        "monthly_sip": round(monthly, 2),
+        "years": years,
+        "paths": len(final),
+        "invested": round(invested, 2),
+        "bands": {
+            f"p{p}": np.round(bands[i] * monthly).tolist()
+            for i, p in enumerate(PERCENTILES)
+        },
+        "final": {
+            f"p{p}": round(float(bands[i][-1] * monthly))
+            for i, p in enumerate(PERCENTILES)
+        },
+        "goals": [
+            {
+                "amount": round(goal),
+                "probability": probability_at_least(final, monthly, goal),
+            }
+            for goal in targets
+        ],
+        "assumptions": {
+            b: {"return": float(r), "volatility": float(v)}
+            for b, r, v in zip(BUCKETS, EXPECTED_RETURN, VOLATILITY)
+        },
+    }
@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+
+# Fields of each agent result the summary is written from, most important
+# first (fields at the end are the first dropped to meet the budget)
+SUMMARY_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "spending_plan": (
+        "income",
+        "total_expense",
+        "red_flags",
+        "category_percent",
+        "window",
+        "month_over_month",
+    ),
+    "investment": (
+        "income",
+        "total_expense",
+        "surplus",
+        "investible",
+        "allocation",
+        "projection",
+        "emergency_fund",
+        "min_emergency",
+        "window",
+    ),
+    "loan": (
+        "max_emi",
+        "loan_amount",
+        "monthly_income",
+        "existing_emi",
+        "interest_rate_assumed",
+        "tenure_months",
+        "cibil_score",
+        "cibil_band",
+    ),
+    "tax_saver": (
+        "follow_up_question",
+        "recommended_regime",
+        "regime_saving",
+        "old_regime_tax",
+        "new_regime_tax",
+        "annual_income",
+        "balance_due",
+        "headroom",
+        "tds_deducted",
+        "deductions_claimed",
+    ),
+}
+NARRATIVE_KEYS = ("narrative", "recommendation")
+
+SUMMARY_TEMPLATE = """
+You are Spendly, a clear and concise personal finance assistant.
+
+CONTEXT
+- Latest user message: {message}
+- Agent result JSON (may contain numbers and flags): {result}
+
+TASK
+- Summarise the key insights for the user in a way that feels like a WhatsApp chat reply.
+
+OUTPUT FORMAT (PLAIN TEXT, NO MARKDOWN)
+- First line: 1 short sentence summarising the situation in plain language.
+- Then 3–6 bullets starting with "- " that:
+  - highlight the 2–3 most important numbers or flags,
+  - suggest next actions the user can take this month,
+  - avoid jargon.
+- Keep each bullet to max 2 short sentences.
+- Do NOT use **bold**, headings, tables, or markdown.
+"""
+
+# User messages longer than this are cut when the prompt is over budget
+_MESSAGE_CHARS = 280
+# Size of list-like fields once the prompt is over budget
+_SHORT_LIST = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English prose)."""
+
+    return (len(text) + 3) // 4
+
+
+def compact_number(value: float) -> float:
+    """Round for a prompt: whole rupees from 100 up, one decimal below
+    that (percentages), three for small fractions such as rates."""
+
+    if abs(value) >= 100:
+        return float(round(value))
+    if abs(value) >= 1:
+        return round(value, 1)
+    return round(value, 3)
+
+
+def compact(value: Any) -> Any:
+    """``value`` with floats rounded and empty entries dropped."""
+
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, float):
+        number = compact_number(value)
+        return int(number) if number.is_integer() else number
+    if isinstance(value, dict):
+        return {
+            k: compact(v) for k, v in value.items() if v is not None and v != {}
+        }
+    if isinstance(value, (list, tuple)):
+        return [compact(v) for v in value]
+    return value
+
+
+def _top_shares(shares: Dict[str, float], n: Optional[int]) -> Dict[str, float]:
+    ranked = sorted(shares.items(), key=lambda kv: -kv[1])
+    return dict(ranked[:n] if n else ranked)
+
+
+def _months(rows: List[Dict[str, Any]], n: Optional[int]) -> List[Dict[str, Any]]:
+    rows = rows[-n:] if n else rows
+    return [
+        {
+            "month": r["month"],
+            "income": r["income"],
+            "expense": r["expense"],
+            "expense_change_pct": r.get("expense_change_pct"),
+        }
+        for r in rows
+    ]
+
+
+def _projection(projection: Dict[str, Any], n: Optional[int]) -> Dict[str, Any]:
+    # The per-year bands are for charts; the summary needs the end state
+    if not projection:
+        return {}
+    final = projection["final"]
+    return {
+        "years": projection["years"],
+        "invested": projection["invested"],
+        "final": {p: final[p] for p in ("p10", "p50", "p90")},
+        "goals": projection["goals"],
+    }
+
+
+def _headroom(headroom: Dict[str, Any], n: Optional[int]) -> Dict[str, Any]:
+    # Per deduction: room left and what filling it saves in the old regime
+    ranked = sorted(
+        (
+            (name, room)
+            for name, room in headroom.items()
+            if "room" in room and room["room"] > 0
+        ),
+        key=lambda kv: -kv[1]["old_regime_saving_at_cap"],
+    )
+    return {
+        name: {
+            "room": room["room"],
+            "old_regime_saving": room["old_regime_saving_at_cap"],
+        }
+        for name, room in (ranked[:n] if n else ranked)
+    }
+
+
+# Field -> projection(value, limit); ``limit`` is None until over budget
+_PROJECTIONS: Dict[str, Callable[[Any, Optional[int]], Any]] = {
+    "category_percent": _top_shares,
+    "month_over_month": _months,
+    "red_flags": lambda flags, n: list(flags[:n] if n else flags),
+    "projection": _projection,
+    "headroom": _headroom,
+}
+
+
+def summary_budget(intent: Optional[str]) -> int:
+    """Token budget for ``intent``'s summary prompt: the entry in
+    ``settings.summary_token_budgets`` (``intent=tokens,...``), else
+    ``settings.summary_token_budget``. 0 means unlimited."""
+
+    for part in settings.summary_token_budgets.split(","):
+        name, _, tokens = part.partition("=")
+        if name.strip() == intent and tokens.strip():
+            return int(tokens)
+    return settings.summary_token_budget
+
+
+def summary_payload(
+    intent: Optional[str],
+    result: Dict[str, Any],
+    narrative_chars: int,
+    limit: Optional[int] = None,
+    drop: int = 0,
+) -> Dict[str, Any]:
+    """The subset of ``result`` shown to the summary call."""
+
+    fields = SUMMARY_FIELDS.get(intent or "")
+    if fields is None:
+        fields = tuple(k for k in result if k not in NARRATIVE_KEYS)
+    if drop:
+        fields = fields[: max(1, len(fields) - drop)]
+
+    payload: Dict[str, Any] = {}
+    for field in fields:
+        if field not in result:
+            continue
+        value = result[field]
+        projection = _PROJECTIONS.get(field)
+        payload[field] = projection(value, limit) if projection else value
+
+    if narrative_chars > 0:
+        for key in NARRATIVE_KEYS:
+            text = str(result.get(key) or "").strip()
+            if text:
+                cut = text[:narrative_chars]
+                payload[f"{key}_excerpt"] = cut + ("…" if len(text) > len(cut) else "")
+    return compact(payload)
+
+
+def build_summary_prompt(
+    message: str, result: Dict[str, Any], intent: Optional[str] = None
+) -> str:
+    """Summary prompt from a compact JSON view of ``result``.
+
+    Only the fields in ``SUMMARY_FIELDS[intent]`` are sent, numbers are
+    rounded and the agent narrative is reduced to a short excerpt
+    (``settings.summary_narrative_chars``, 0 to omit). If the prompt still
+    exceeds the intent's token budget it is shrunk step by step: no
+    excerpt, shorter lists, a truncated user message, then trailing fields
+    dropped. The budget is a target, not a cap: the first field is always
+    kept, so a prompt can still overrun it rather than be cut mid-JSON;
+    ``app.orchestrator.summary_prompt`` counts those overruns.
+    """
+
+    budget = summary_budget(intent)
+    fields = SUMMARY_FIELDS.get(intent or "", ())
+    steps = [
+        {"narrative_chars": settings.summary_narrative_chars},
+        {"narrative_chars": 0},
+        {"narrative_chars": 0, "limit": _SHORT_LIST},
+        {"narrative_chars": 0, "limit": _SHORT_LIST, "message_chars": _MESSAGE_CHARS},
+    ] + [
+        {
+            "narrative_chars": 0,
+            "limit": _SHORT_LIST,
+            "message_chars": _MESSAGE_CHARS,
+            "drop": n,
+        }
+        for n in range(1, len(fields))
+    ]
+
+    prompt = ""
+    for step in steps:
+        text = message
+        cap = step.get("message_chars")
+        if cap and len(text) > cap:
+            text = text[:cap] + "…"
+        payload = summary_payload(
+            intent,
+            result,
+            step["narrative_chars"],
+            step.get("limit"),
+            step.get("drop", 0),
+        )
+        prompt = SUMMARY_TEMPLATE.format(
+            message=text,
+            result=json.dumps(payload, ensure_ascii=False, separators=(",", ":")),
+        )
+        if not budget or estimate_tokens(prompt) <= budget:
+            break
+    return prompt
@@ -1,30 +1,314 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import os
-from typing import Any, Dict
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
 
+from app import metrics
 from app.config import settings
 
 
 os.makedirs(settings.sessions_dir, exist_ok=True)
 
 
-def _path(session_id: str) -> str:
-    return os.path.join(settings.sessions_dir, f"{session_id}.json")
+class SessionStore(ABC):
+    """Storage backend for chat sessions (``{"messages": [...], "state": {}}``).
 
+    ``append_turn`` is the hot path: it records one turn's new messages and
+    the updated state. ``try_lock``/``unlock`` let backends that are shared
+    between processes serialize turns on the same session.
+    """
 
-def load_session(session_id: str) -> Dict[str, Any]:
-    path = _path(session_id)
-    if not os.path.exists(path):
-        return {"messages": [], "state": {}}
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    @abstractmethod
+    def load(
+        self, session_id: str, last_messages: Optional[int] = None
+    ) -> Dict[str, Any]: ...
 
+    @abstractmethod
+    def save(self, session_id: str, data: Dict[str, Any]) -> None:
+        """Replace the whole session."""
 
+    @abstractmethod
+    def append_turn(
+        self,
+        session_id: str,
+        new_messages: List[Dict[str, Any]],
+        state: Dict[str, Any],
+    ) -> None: ...
+
+    def try_lock(self, session_id: str, owner: str, ttl_s: float) -> bool:
+        return True
+
+    def unlock(self, session_id: str, owner: str) -> None:
+        return None
+
+
+class JsonSessionStore(SessionStore):
+    """One JSON file per session; every write rewrites the file.
+
+    Still the default backend, so ``append_turn`` here costs what a turn
+    always did: the whole history is read and rewritten, O(history) per
+    turn. ``SqliteSessionStore`` appends only the new messages.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def load(
+        self, session_id: str, last_messages: Optional[int] = None
+    ) -> Dict[str, Any]:
+        path = self._path(session_id)
+        if not os.path.exists(path):
+            return {"messages": [], "state": {}}
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if last_messages is not None:
+            data["messages"] = data.get("messages", [])[-last_messages:]
+        return data
+
+    def save(self, session_id: str, data: Dict[str, Any]) -> None:
+        path = self._path(session_id)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def append_turn(
+        self,
+        session_id: str,
+        new_messages: List[Dict[str, Any]],
+        state: Dict[str, Any],
+    ) -> None:
+        data = self.load(session_id)
+        data.setdefault("messages", []).extend(new_messages)
+        data["state"] = state
+        self.save(session_id, data)
+
+
+class SqliteSessionStore(SessionStore):
+    """Sessions in one SQLite database in WAL mode.
+
+    Messages are rows keyed by (session_id, seq), so a turn inserts only its
+    new messages and updates the state row in place; readers never block the
+    writer. A lease row per session serializes turns across processes.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as db:
+            db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    message_count INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS messages (
+                    session_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    PRIMARY KEY (session_id, seq)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS session_locks (
+                    session_id TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(
+        self, session_id: str, last_messages: Optional[int] = None
+    ) -> Dict[str, Any]:
+        db = self._connect()
+        row = db.execute(
+            "SELECT state, message_count FROM sessions WHERE session_id = ?",
+            (session_id,),
+        ).fetchone()
+        if row is None:
+            return {"messages": [], "state": {}}
+        state, count = row
+        first = 0 if last_messages is None else max(0, count - last_messages)
+        rows = db.execute(
+            "SELECT role, content FROM messages"
+            " WHERE session_id = ? AND seq >= ? ORDER BY seq",
+            (session_id, first),
+        ).fetchall()
+        return {
+            "messages": [{"role": r, "content": c} for r, c in rows],
+            "state": json.loads(state),
+        }
+
+    def save(self, session_id: str, data: Dict[str, Any]) -> None:
+        messages = data.get("messages", [])
+        with self._connect() as db:
+            db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._write(db, session_id, 0, messages, data.get("state", {}))
+
+    def append_turn(
+        self,
+        session_id: str,
+        new_messages: List[Dict[str, Any]],
+        state: Dict[str, Any],
+    ) -> None:
+        db = self._connect()
+        with db:
+            # BEGIN IMMEDIATE takes the write lock before reading the count,
+            # so concurrent writers get consecutive sequence numbers.
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT message_count FROM sessions WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+            self._write(db, session_id, row[0] if row else 0, new_messages, state)
+
+    def _write(
+        self,
+        db: sqlite3.Connection,
+        session_id: str,
+        start: int,
+        messages: List[Dict[str, Any]],
+        state: Dict[str, Any],
+    ) -> None:
+        db.executemany(
+            "INSERT INTO messages (session_id, seq, role, content)"
+            " VALUES (?, ?, ?, ?)",
+            [
+                (session_id, start + i, m.get("role", ""), m.get("content", ""))
+                for i, m in enumerate(messages)
+            ],
+        )
+        db.execute(
+            "INSERT INTO sessions (session_id, state, message_count, updated_at)"
+            " VALUES (?, ?, ?, ?)"
+            " ON CONFLICT(session_id) DO UPDATE SET state = excluded.state,"
+            " message_count = excluded.message_count,"
+            " updated_at = excluded.updated_at",
+            (
+                session_id,
+                json.dumps(state, ensure_ascii=False, separators=(",", ":")),
+                start + len(messages),
+                time.time(),
+            ),
+        )
+
+    def try_lock(self, session_id: str, owner: str, ttl_s: float) -> bool:
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO session_locks (session_id, owner, expires_at)"
+                " VALUES (?, ?, ?)"
+                " ON CONFLICT(session_id) DO UPDATE SET owner = excluded.owner,"
+                " expires_at = excluded.expires_at"
+                " WHERE session_locks.expires_at < ?",
+                (session_id, owner, now + ttl_s, now),
+            )
+            row = db.execute(
+                "SELECT owner FROM session_locks WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+        return row is not None and row[0] == owner
+
+    def unlock(self, session_id: str, owner: str) -> None:
+        with self._connect() as db:
+            db.execute(
+                "DELETE FROM session_locks WHERE session_id = ? AND owner = ?",
+                (session_id, owner),
+            )
+
+
+def _make_store() -> SessionStore:
+    if settings.session_backend == "sqlite":
+        return SqliteSessionStore(settings.session_db_path)
+    return JsonSessionStore(settings.sessions_dir)
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> SessionStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _make_store()
+    return _store
+
+
+@metrics.timed("session_load")
+def load_session(
+    session_id: str, last_messages: Optional[int] = None
+) -> Dict[str, Any]:
+    return get_store().load(session_id, last_messages)
+
+
+@metrics.timed("session_save")
 def save_session(session_id: str, data: Dict[str, Any]) -> None:
-    path = _path(session_id)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    get_store().save(session_id, data)
+
+
+@metrics.timed("session_save")
+def append_turn(
+    session_id: str,
+    new_messages: List[Dict[str, Any]],
+    state: Dict[str, Any],
+) -> None:
+    get_store().append_turn(session_id, new_messages, state)
+
+
+_turn_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+@asynccontextmanager
+async def session_turn(session_id: str) -> AsyncIterator[None]:
+    """Serialize turns on one session: in-process via an asyncio lock, and
+    across workers via the store's lease (a no-op for the JSON store)."""
 
+    lock = _turn_locks.get(session_id)
+    if lock is None:
+        lock = _turn_locks[session_id] = asyncio.Lock()
 
+    wait_start = time.perf_counter()
+    async with lock:
+        store = get_store()
+        owner = uuid.uuid4().hex
+        ttl_s = settings.session_lock_ttl_s
+        deadline = time.monotonic() + ttl_s
+        while not await asyncio.to_thread(store.try_lock, session_id, owner, ttl_s):
+            if time.monotonic() > deadline:
+                # Holder is gone or stuck; its lease has expired by now
+                break
+            await asyncio.sleep(0.05)
+        metrics.observe("session_lock", time.perf_counter() - wait_start)
+        try:
+            yield
+        finally:
+            await asyncio.to_thread(store.unlock, session_id, owner)
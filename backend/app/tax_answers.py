@@ -0,0 +1,367 @@
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.models import TaxAnswer
+
+
+# Tax question key -> the TaxAnswer fields that answer it
+TOPIC_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "rent": ("pays_rent", "rent_amount", "rent_city"),
+    "health_insurance": ("has_health_insurance", "health_premium"),
+    "loans": (
+        "has_home_loan",
+        "has_education_loan",
+        "home_loan_emi",
+        "home_loan_interest_year",
+        "education_loan_emi",
+        "education_loan_interest_year",
+        "loan_amount",
+    ),
+}
+
+_TOPIC_WORDS: Dict[str, str] = {
+    "rent": r"rent(?:ed|ing|al)?|pg|hostel|landlord",
+    "health_insurance": r"health|medical|mediclaim|insurance|premium|policy",
+    "loans": r"loans?|emis?|mortgage|interest|principal",
+}
+_TOPIC = re.compile(
+    "|".join(
+        rf"(?P<{topic}>\b(?:{words})\b)" for topic, words in _TOPIC_WORDS.items()
+    ),
+    re.IGNORECASE,
+)
+_NO = re.compile(
+    r"\b(?:no|not|nope|none|nil|never|nahi|nahin|don'?t|doesn'?t|haven'?t|n/a"
+    r"|own (?:house|home|flat)|live with (?:my )?parents)\b",
+    re.IGNORECASE,
+)
+_UNSURE = re.compile(
+    r"\b(?:not sure|unsure|don'?t know|dunno|no idea|maybe|not certain|depends)\b",
+    re.IGNORECASE,
+)
+_YES = re.compile(r"\b(?:yes|yeah|yep|haan|i do)\b", re.IGNORECASE)
+# Too ambiguous inside a sentence ("make sure", "ha ha"); a yes only alone
+_BARE_YES = re.compile(r"^\W*(?:ha|sure|ok(?:ay)?)\W*$", re.IGNORECASE)
+_EDUCATION = re.compile(r"\b(?:education|student|study|studies)\b", re.IGNORECASE)
+_OTHER_LOAN = re.compile(r"\b(?:car|personal|bike|gold|vehicle)\s+loans?\b", re.I)
+_EMI = re.compile(r"\b(?:emis?|monthly|per month|a month)\b", re.IGNORECASE)
+_PRINCIPAL = re.compile(
+    r"\b(?:amount|principal|outstanding|borrowed|loan of|sanctioned)\b", re.I
+)
+_INTEREST = re.compile(r"\binterest\b", re.IGNORECASE)
+
+# "25k", "1.5 L", "₹ 2 lakh", "Rs. 12,000", "18000/yr"; not "8.5%" or "20 years"
+_AMOUNT = re.compile(
+    r"(?:₹|\brs\.?|\binr)?\s*(?P<number>\d+(?:,\d+)*(?:\.\d+)?)\s*"
+    r"(?P<unit>k|thousand|l|lakhs?|lacs?|cr|crores?)?\b"
+    r"(?!\s*(?:%|percent|years?\b|yrs?\b))",
+    re.IGNORECASE,
+)
+_UNITS = {"k": 1e3, "thousand": 1e3, "l": 1e5, "lakh": 1e5, "lac": 1e5, "cr": 1e7}
+_YEARLY = re.compile(
+    r"^\W{0,3}(?:per (?:year|annum)|yearly|annual(?:ly)?|a year|every year"
+    r"|/\s*(?:yr|year|annum)|p\.?\s?a\b)",
+    re.IGNORECASE,
+)
+_MONTHLY = re.compile(
+    r"^\W{0,3}(?:per month|monthly|a month|every month"
+    r"|/\s*(?:m|mo|month)\b|p\.?\s?m\b)",
+    re.IGNORECASE,
+)
+# Bare numbers below this (ages, counts, tenures) are not amounts
+_MIN_AMOUNT = 100
+
+# Clause boundaries: commas that are not digit grouping, sentence ends and
+# joining words ("rent 25k in Pune and no loan")
+_CLAUSES = re.compile(
+    r"(?<!\d),|,(?!\d)|;|\n|\.(?=\s|$)|\b(?:and|but|also|plus)\b", re.IGNORECASE
+)
+
+CITIES: Dict[str, str] = {
+    "mumbai": "Mumbai",
+    "bombay": "Mumbai",
+    "navi mumbai": "Navi Mumbai",
+    "thane": "Thane",
+    "delhi": "Delhi",
+    "new delhi": "Delhi",
+    "kolkata": "Kolkata",
+    "calcutta": "Kolkata",
+    "chennai": "Chennai",
+    "madras": "Chennai",
+    "bangalore": "Bengaluru",
+    "bengaluru": "Bengaluru",
+    "hyderabad": "Hyderabad",
+    "pune": "Pune",
+    "ahmedabad": "Ahmedabad",
+    "gurgaon": "Gurugram",
+    "gurugram": "Gurugram",
+    "noida": "Noida",
+    "ghaziabad": "Ghaziabad",
+    "faridabad": "Faridabad",
+    "jaipur": "Jaipur",
+    "lucknow": "Lucknow",
+    "kochi": "Kochi",
+    "cochin": "Kochi",
+    "trivandrum": "Thiruvananthapuram",
+    "thiruvananthapuram": "Thiruvananthapuram",
+    "coimbatore": "Coimbatore",
+    "indore": "Indore",
+    "bhopal": "Bhopal",
+    "nagpur": "Nagpur",
+    "surat": "Surat",
+    "vadodara": "Vadodara",
+    "chandigarh": "Chandigarh",
+    "mohali": "Mohali",
+    "mysore": "Mysuru",
+    "mysuru": "Mysuru",
+    "visakhapatnam": "Visakhapatnam",
+    "vizag": "Visakhapatnam",
+    "bhubaneswar": "Bhubaneswar",
+    "patna": "Patna",
+    "goa": "Goa",
+    "dehradun": "Dehradun",
+}
+_CITY = re.compile(
+    r"\b(?:"
+    + "|".join(sorted(map(re.escape, CITIES), key=len, reverse=True))
+    + r")\b",
+    re.IGNORECASE,
+)
+
+
+def parse_amount(number: str, unit: Optional[str]) -> float:
+    value = float(number.replace(",", ""))
+    if unit:
+        unit = unit.lower().rstrip("s")
+        value *= _UNITS.get(unit, _UNITS.get(unit[:1], 1.0))
+    return value
+
+
+# Rates are not amounts, and "8.5% interest" does not make a nearby figure
+# the interest paid; masked out before looking for field keywords
+_RATE = re.compile(
+    r"\d+(?:\.\d+)?\s*(?:%|percent)(?:\s*(?:p\.?\s?a\b\.?|interest|rate))*"
+    r"|\binterest\s+rate\b|\brate\s+of\s+interest\b",
+    re.IGNORECASE,
+)
+# "40 lakh home loan": the figure right before the loan is its principal
+_LOAN_NOUN = re.compile(
+    r"^\s*(?:home\s+|housing\s+|education\s+|student\s+)?loans?\b", re.I
+)
+
+
+def _loan_field(
+    clause: str, value: float, span: Tuple[int, int], spans: List[Tuple[int, int]]
+) -> str:
+    """The loan field for the amount at ``span``: from the interest /
+    principal / EMI keyword nearest to it with no other amount (``spans``)
+    in between, else by size."""
+
+    prefix = "education_loan" if _EDUCATION.search(clause) else "home_loan"
+    if _LOAN_NOUN.match(clause[span[1] :]):
+        return "loan_amount"
+    text = _RATE.sub(lambda m: " " * len(m.group(0)), clause)
+    best: Optional[Tuple[int, str]] = None
+    for pattern, field in (
+        (_INTEREST, f"{prefix}_interest_year"),
+        (_PRINCIPAL, "loan_amount"),
+        (_EMI, f"{prefix}_emi"),
+    ):
+        for keyword in pattern.finditer(text):
+            if keyword.end() <= span[0]:
+                gap = (keyword.end(), span[0])
+            elif keyword.start() >= span[1]:
+                gap = (span[1], keyword.start())
+            else:
+                continue
+            if any(gap[0] <= start < gap[1] for start, _ in spans):
+                continue
+            distance = gap[1] - gap[0]
+            if best is None or distance < best[0]:
+                best = (distance, field)
+    if best is not None:
+        return best[1]
+    # A bare figure in lakhs is the loan itself rather than an instalment
+    return "loan_amount" if value >= 5_00_000 else f"{prefix}_emi"
+
+
+def _split(message: str) -> List[str]:
+    return [c.strip() for c in _CLAUSES.split(message) if c and c.strip()]
+
+
+def _set_topic(
+    values: Dict[str, Any], topic: str, clause: str, present: bool
+) -> None:
+    if topic == "rent":
+        values.setdefault("pays_rent", present)
+    elif topic == "health_insurance":
+        values.setdefault("has_health_insurance", present)
+    elif not present:
+        values.setdefault("has_home_loan", False)
+        values.setdefault("has_education_loan", False)
+    elif _EDUCATION.search(clause):
+        values.setdefault("has_education_loan", True)
+    else:
+        values.setdefault("has_home_loan", True)
+
+
+def _add_amount(
+    values: Dict[str, Any],
+    topic: str,
+    clause: str,
+    value: float,
+    span: Tuple[int, int],
+    spans: List[Tuple[int, int]],
+) -> bool:
+    """Store ``value`` (found at ``span`` in ``clause``, among the amounts at
+    ``spans``) as ``topic``'s amount, converted to the field's period.
+    False if the field already holds a different amount (the first is kept
+    and the answer should go to the LLM)."""
+
+    if topic == "rent":
+        field, yearly_field = "rent_amount", False
+    elif topic == "health_insurance":
+        field, yearly_field = "health_premium", True
+    else:
+        field = _loan_field(clause, value, span, spans)
+        yearly_field = field.endswith("_year") or field == "loan_amount"
+
+    amount = value
+    after = clause[span[1] :]
+    if field != "loan_amount":
+        if yearly_field and _MONTHLY.match(after):
+            amount = value * 12
+        elif not yearly_field and _YEARLY.match(after):
+            amount = value / 12
+    amount = round(amount, 2)
+    _set_topic(values, topic, clause, True)
+    if values.setdefault(field, amount) != amount:
+        return False
+    return True
+
+
+def extract_tax_answer(
+    message: str, question: Optional[str] = None
+) -> Tuple[TaxAnswer, bool]:
+    """Rule-based reading of a free-text answer to tax question ``question``
+    (a ``TOPIC_FIELDS`` key).
+
+    Amounts ("25k", "1.5 L", "2 lakh per year") go to the topic named
+    nearest to them in the same clause, else to ``question``; yes/no words
+    answer the topics of their clause, else ``question``; a known city is
+    the rent city. Returns the answer and whether it is confident: the asked
+    question is answered and every amount found a home (and no field got two
+    different amounts). Otherwise the LLM extractor should take a look.
+    """
+
+    values: Dict[str, Any] = {}
+    stray = 0
+    for clause in _split(message):
+        topics = [(m.start(), m.lastgroup) for m in _TOPIC.finditer(clause)]
+        if _UNSURE.search(clause) or (
+            _OTHER_LOAN.search(clause) and not _EDUCATION.search(clause)
+        ):
+            # Hedged answers, and car / personal loans (no tax benefit),
+            # are left to the LLM
+            stray += 1
+            continue
+        amounts = [
+            m
+            for m in _AMOUNT.finditer(clause)
+            if m.group("unit")
+            or float(m.group("number").replace(",", "")) >= _MIN_AMOUNT
+        ]
+        default = question if not topics else None
+        spans = [m.span() for m in amounts]
+
+        for match in amounts:
+            before = [t for pos, t in topics if pos < match.start()]
+            after_topics = [t for pos, t in topics if pos >= match.end()]
+            topic = (before[-1] if before else None) or (
+                after_topics[0] if after_topics else default
+            )
+            if topic is None:
+                stray += 1
+                continue
+            value = parse_amount(match.group("number"), match.group("unit"))
+            if not _add_amount(values, topic, clause, value, match.span(), spans):
+                stray += 1
+
+        named = {t for _, t in topics} or ({default} if default else set())
+        if _NO.search(clause):
+            for topic in named:
+                _set_topic(values, topic, clause, False)
+        elif (
+            _YES.search(clause)
+            or _BARE_YES.match(message)
+            or (topics and not amounts)
+        ):
+            for topic in named:
+                _set_topic(values, topic, clause, True)
+
+    city = _CITY.search(message)
+    # "I stay in Pune with my parents" names a city but no rented home
+    rents = values.get("pays_rent")
+    if city and rents is not False and (rents or question == "rent"):
+        values["rent_city"] = CITIES[city.group(0).lower()]
+        values.setdefault("pays_rent", True)
+
+    answer = TaxAnswer(**values)
+    confident = stray == 0 and (
+        answered(answer, question) if question else bool(values)
+    )
+    return answer, confident
+
+
+def answered(answer: TaxAnswer, question: str) -> bool:
+    return any(getattr(answer, f) is not None for f in TOPIC_FIELDS[question])
+
+
+def parse_llm_answer(raw: str) -> Optional[TaxAnswer]:
+    """Validate the LLM extractor's JSON (code fences and surrounding text
+    tolerated) into a ``TaxAnswer``; ``None`` if it is not usable."""
+
+    start, end = raw.find("{"), raw.rfind("}")
+    if start < 0 or end < start:
+        return None
+    try:
+        data = json.loads(raw[start : end + 1])
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    try:
+        answer = TaxAnswer.model_validate(
+            {k: v for k, v in data.items() if k in TaxAnswer.model_fields}
+        )
+    except ValidationError:
+        return None
+    # Amounts imply the yes the model may have left out
+    implied = {
+        "pays_rent": answer.rent_amount or answer.rent_city,
+        "has_health_insurance": answer.health_premium,
+        "has_home_loan": answer.home_loan_emi or answer.home_loan_interest_year,
+        "has_education_loan": (
+            answer.education_loan_emi or answer.education_loan_interest_year
+        ),
+    }
+    updates = {k: True for k, v in implied.items() if v and getattr(answer, k) is None}
+    return answer.model_copy(update=updates)
+
+
+def merge_answers(base: TaxAnswer, extra: Optional[TaxAnswer]) -> TaxAnswer:
+    """``base`` with its gaps filled from ``extra``."""
+
+    if extra is None:
+        return base
+    filled = {
+        k: v
+        for k, v in extra.model_dump().items()
+        if v is not None and getattr(base, k) is None
+    }
+    return base.model_copy(update=filled)
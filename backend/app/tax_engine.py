@@ -0,0 +1,341 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Mapping, Optional
+
+import numpy as np
+
+
+# Individual (under 60) salaried taxpayer, FY 2025-26 rules. Slab lower
+# bounds and the rate above each; the 87A rebate wipes out the tax up to
+# ``rebate_max`` when taxable income is at most ``rebate_limit`` (with
+# marginal relief just above the limit in the new regime); ``deductions``
+# are the ``DEDUCTION_CAPS`` the regime allows on top of the standard one.
+REGIMES: Dict[str, Dict[str, Any]] = {
+    "old": {
+        "slabs": np.array([0, 2_50_000, 5_00_000, 10_00_000], dtype=float),
+        "rates": np.array([0.0, 0.05, 0.2, 0.3]),
+        "standard_deduction": 50_000.0,
+        "rebate_limit": 5_00_000.0,
+        "rebate_max": 12_500.0,
+        "rebate_relief": False,
+        "surcharge_rates": np.array([0.0, 0.1, 0.15, 0.25, 0.37]),
+        "deductions": ("hra", "80c", "80d", "80ccd_1b", "home_loan_interest", "80e"),
+    },
+    "new": {
+        "slabs": np.arange(0, 24_00_001, 4_00_000, dtype=float),
+        "rates": np.array([0.0, 0.05, 0.1, 0.15, 0.2, 0.25, 0.3]),
+        "standard_deduction": 75_000.0,
+        "rebate_limit": 12_00_000.0,
+        "rebate_max": 60_000.0,
+        "rebate_relief": True,
+        "surcharge_rates": np.array([0.0, 0.1, 0.15, 0.25, 0.25]),
+        "deductions": (),
+    },
+}
+SURCHARGE_THRESHOLDS = np.array([0, 50_00_000, 1_00_00_000, 2_00_00_000, 5_00_00_000])
+CESS = 0.04
+
+# Yearly caps; the HRA exemption is capped by its own formula and 80E
+# (education loan interest) has no cap
+DEDUCTION_CAPS: Dict[str, float] = {
+    "hra": np.inf,
+    "80c": 1_50_000.0,
+    "80d": 25_000.0,
+    "80ccd_1b": 50_000.0,
+    "home_loan_interest": 2_00_000.0,
+    "80e": np.inf,
+}
+DEDUCTION_LABELS: Dict[str, str] = {
+    "hra": "HRA exemption",
+    "80c": "80C (PF, ELSS, PPF, home loan principal)",
+    "80d": "80D (health insurance)",
+    "80ccd_1b": "80CCD(1B) (additional NPS)",
+    "home_loan_interest": "24(b) home loan interest",
+    "80e": "80E (education loan interest)",
+}
+# Deductions the user can still top up this year, and the what-if step
+TOP_UPS = ("80c", "80d", "80ccd_1b")
+TOP_UP_STEP = 5_000.0
+
+# Cities where HRA is exempt up to 50% of basic (40% elsewhere)
+METRO_CITIES = ("Mumbai", "Delhi", "Kolkata", "Chennai")
+# Used only when payslips do not give the salary split or loan interest
+ASSUMED_BASIC_SHARE = 0.4
+ASSUMED_HRA_SHARE = 0.4
+HOME_LOAN_RATE = 0.085
+EARLY_INTEREST_SHARE = 0.75
+
+
+def _slab_bases(regime: Dict[str, Any]) -> np.ndarray:
+    """Tax due at the start of each slab."""
+
+    widths = np.diff(regime["slabs"]) * regime["rates"][:-1]
+    return np.concatenate([[0.0], np.cumsum(widths)])
+
+
+for _regime in REGIMES.values():
+    _regime["bases"] = _slab_bases(_regime)
+
+
+def slab_tax(regime: str, taxable: Any) -> np.ndarray:
+    """Tax on ``taxable`` income (array) from the slabs alone."""
+
+    table = REGIMES[regime]
+    taxable = np.maximum(np.asarray(taxable, dtype=float), 0.0)
+    slab = np.searchsorted(table["slabs"], taxable, side="right") - 1
+    above = taxable - table["slabs"][slab]
+    return table["bases"][slab] + above * table["rates"][slab]
+
+
+def _surcharge(regime: str, taxable: np.ndarray, tax: np.ndarray) -> np.ndarray:
+    """Surcharge on ``tax``, with marginal relief: crossing a threshold
+    never costs more than the income above it."""
+
+    rates = REGIMES[regime]["surcharge_rates"]
+    band = np.searchsorted(SURCHARGE_THRESHOLDS, taxable, side="right") - 1
+    surcharge = tax * rates[band]
+    threshold = SURCHARGE_THRESHOLDS[band]
+    at_threshold = slab_tax(regime, threshold) * (1 + rates[np.maximum(band - 1, 0)])
+    relief_cap = np.where(band > 0, at_threshold + (taxable - threshold) - tax, np.inf)
+    return np.minimum(surcharge, np.maximum(relief_cap, 0.0))
+
+
+def regime_tax(
+    regime: str, gross: Any, deductions: Optional[Mapping[str, Any]] = None
+) -> Dict[str, np.ndarray]:
+    """Tax under ``regime`` for every scenario at once.
+
+    ``gross`` (annual salary) and each ``deductions`` value (``DEDUCTION_CAPS``
+    keys, claimed amounts) may be scalars or broadcastable arrays. Claims
+    are clipped to their caps; those the regime does not allow are ignored.
+    """
+
+    table = REGIMES[regime]
+    gross = np.asarray(gross, dtype=float)
+    allowed = np.zeros_like(gross)
+    for name, claimed in (deductions or {}).items():
+        if name in table["deductions"]:
+            allowed = allowed + np.clip(claimed, 0.0, DEDUCTION_CAPS[name])
+    taxable = np.maximum(gross - table["standard_deduction"] - allowed, 0.0)
+
+    tax = slab_tax(regime, taxable)
+    eligible = taxable <= table["rebate_limit"]
+    rebate = np.where(eligible, np.minimum(tax, table["rebate_max"]), 0.0)
+    if table["rebate_relief"]:
+        # Just above the limit the tax is at most the income above it
+        rebate = np.where(
+            eligible,
+            rebate,
+            np.maximum(tax - (taxable - table["rebate_limit"]), 0.0),
+        )
+    tax = tax - rebate
+    surcharge = _surcharge(regime, taxable, tax)
+    cess = (tax + surcharge) * CESS
+    return {
+        "deductions": table["standard_deduction"] + allowed,
+        "taxable_income": taxable,
+        "rebate": rebate,
+        "surcharge": surcharge,
+        "cess": cess,
+        "total": np.round(tax + surcharge + cess),
+    }
+
+
+def compare_regimes(
+    gross: Any, deductions: Optional[Mapping[str, Any]] = None
+) -> Dict[str, np.ndarray]:
+    """Old and new regime totals for every scenario, the cheaper regime
+    (ties go to the new one, the default) and the saving from choosing it."""
+
+    old = regime_tax("old", gross, deductions)["total"]
+    new = regime_tax("new", gross, deductions)["total"]
+    return {
+        "old": old,
+        "new": new,
+        "best": np.where(old < new, "old", "new"),
+        "saving": np.abs(old - new),
+    }
+
+
+def hra_exemption(basic: Any, hra_received: Any, rent_paid: Any, metro: Any) -> Any:
+    """Section 10(13A): the least of the HRA received, rent paid above 10% of
+    basic, and 50% (metro) or 40% of basic. All amounts yearly."""
+
+    basic = np.asarray(basic, dtype=float)
+    share = np.where(metro, 0.5, 0.4)
+    exempt = np.minimum(
+        np.minimum(hra_received, np.maximum(rent_paid - 0.1 * basic, 0.0)),
+        share * basic,
+    )
+    return float(exempt) if np.ndim(exempt) == 0 else exempt
+
+
+def tax_profile(
+    annual_income: float,
+    answers: Optional[Mapping[str, Any]] = None,
+    payslip: Optional[Mapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Yearly deduction claims from the tax answers (``TaxAnswer`` fields)
+    and the payslip summary, plus the assumptions made for anything they
+    do not say."""
+
+    answers = answers or {}
+    payslip = payslip or {}
+    assumptions: List[str] = []
+    claims: Dict[str, float] = {name: 0.0 for name in DEDUCTION_CAPS}
+
+    if answers.get("pays_rent") and answers.get("rent_amount"):
+        city = answers.get("rent_city")
+        metro = city in METRO_CITIES
+        basic = payslip.get("annual_basic") or 0.0
+        hra_received = payslip.get("annual_hra") or 0.0
+        if not basic:
+            basic = annual_income * ASSUMED_BASIC_SHARE
+            assumptions.append(
+                f"basic pay taken as {ASSUMED_BASIC_SHARE:.0%} of gross salary"
+            )
+        if not hra_received:
+            hra_received = basic * ASSUMED_HRA_SHARE
+            assumptions.append(f"HRA taken as {ASSUMED_HRA_SHARE:.0%} of basic pay")
+        rent = float(answers["rent_amount"]) * 12
+        claims["hra"] = hra_exemption(basic, hra_received, rent, metro)
+
+    principal_paid = 0.0
+    loans = (
+        ("home_loan", "home_loan_interest", HOME_LOAN_RATE),
+        ("education_loan", "80e", None),
+    )
+    loan_amount = answers.get("loan_amount")
+    for prefix, claim, rate in loans:
+        if not answers.get(f"has_{prefix}"):
+            continue
+        emi_year = float(answers.get(f"{prefix}_emi") or 0.0) * 12
+        interest = answers.get(f"{prefix}_interest_year")
+        if interest is None and emi_year:
+            if rate and loan_amount:
+                interest = min(emi_year, float(loan_amount) * rate)
+                assumptions.append(
+                    f"{prefix.replace('_', ' ')} interest taken as "
+                    f"{rate:.1%} of the loan amount"
+                )
+            else:
+                interest = emi_year * EARLY_INTEREST_SHARE
+                assumptions.append(
+                    f"{prefix.replace('_', ' ')} interest taken as "
+                    f"{EARLY_INTEREST_SHARE:.0%} of EMIs (early years of the loan)"
+                )
+        interest = float(interest or 0.0)
+        claims[claim] = interest
+        if prefix == "home_loan" and emi_year:
+            principal_paid = max(emi_year - interest, 0.0)
+
+    pf = float(payslip.get("annual_pf") or 0.0)
+    claims["80c"] = pf + principal_paid
+    if answers.get("has_health_insurance"):
+        claims["80d"] = float(answers.get("health_premium") or 0.0)
+    return {"gross": float(annual_income), "claims": claims, "assumptions": assumptions}
+
+
+def _regime_breakdown(regime: str, gross: float, claims: Dict[str, float]) -> Dict:
+    detail = regime_tax(regime, gross, claims)
+    return {k: round(float(v)) for k, v in detail.items()}
+
+
+def deduction_headroom(
+    gross: float, claims: Mapping[str, float], step: float = TOP_UP_STEP
+) -> Dict[str, Dict[str, Any]]:
+    """What topping up each of ``TOP_UPS`` is worth, from one batch call.
+
+    Every top-up from the current claim to the cap, in ``step`` increments,
+    for each deduction (others held at their claims) plus all of them at
+    their caps, is evaluated in a single ``compare_regimes`` over the
+    stacked scenarios.
+    """
+
+    claims = {k: float(v) for k, v in claims.items()}
+    names: List[str] = []
+    ladders: List[np.ndarray] = []
+    for name in TOP_UPS:
+        current = min(claims.get(name, 0.0), DEDUCTION_CAPS[name])
+        cap = DEDUCTION_CAPS[name]
+        ladder = np.append(np.arange(current, cap, step), cap)
+        names.append(name)
+        ladders.append(ladder)
+
+    # Column per deduction: each block varies its own deduction only; the
+    # last row has every top-up at its cap
+    sizes = [len(ladder) for ladder in ladders]
+    total = sum(sizes) + 1
+    columns = {
+        name: np.full(total, claims.get(name, 0.0)) for name in DEDUCTION_CAPS
+    }
+    start = 0
+    for name, ladder in zip(names, ladders):
+        columns[name][start : start + len(ladder)] = ladder
+        columns[name][-1] = DEDUCTION_CAPS[name]
+        start += len(ladder)
+    batch = compare_regimes(np.full(total, gross), columns)
+    best = np.minimum(batch["old"], batch["new"])
+
+    baseline = float(best[0])
+    headroom: Dict[str, Dict[str, Any]] = {}
+    start = 0
+    for name, ladder in zip(names, ladders):
+        block = slice(start, start + len(ladder))
+        old, best_block = batch["old"][block], best[block]
+        start += len(ladder)
+        beats_new = np.nonzero(batch["best"][block] == "old")[0]
+        headroom[name] = {
+            "claimed": round(float(ladder[0])),
+            "cap": DEDUCTION_CAPS[name],
+            "room": round(float(ladder[-1] - ladder[0])),
+            # Old-regime tax saved per rupee of the next top-up step
+            "marginal_saving_rate": (
+                round(float((old[0] - old[1]) / (ladder[1] - ladder[0])), 3)
+                if len(ladder) > 1
+                else 0.0
+            ),
+            "old_regime_saving_at_cap": round(float(old[0] - old[-1])),
+            "tax_at_cap": round(float(best_block[-1])),
+            "saving_at_cap": round(baseline - float(best_block[-1])),
+            "regime_at_cap": str(batch["best"][block][-1]),
+            # Smallest top-up from which the old regime wins, if any
+            "old_regime_wins_from": (
+                round(float(ladder[beats_new[0]] - ladder[0]))
+                if len(beats_new)
+                else None
+            ),
+        }
+    headroom["all_top_ups"] = {
+        "tax_at_cap": round(float(best[-1])),
+        "saving_at_cap": round(baseline - float(best[-1])),
+        "regime_at_cap": str(batch["best"][-1]),
+    }
+    return headroom
+
+
+def plan_taxes(
+    annual_income: float,
+    answers: Optional[Mapping[str, Any]] = None,
+    payslip: Optional[Mapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Both regimes for the user's own claims, the cheaper one, and what
+    each deduction top-up would save."""
+
+    profile = tax_profile(annual_income, answers, payslip)
+    gross, claims = profile["gross"], profile["claims"]
+    regimes = {r: _regime_breakdown(r, gross, claims) for r in REGIMES}
+    old, new = regimes["old"]["total"], regimes["new"]["total"]
+    return {
+        "old_regime_tax": old,
+        "new_regime_tax": new,
+        "recommended_regime": "old" if old < new else "new",
+        "regime_saving": abs(old - new),
+        "regimes": regimes,
+        # As allowed (capped), which is what the old regime deducts
+        "deductions_claimed": {
+            k: round(min(v, DEDUCTION_CAPS[k])) for k, v in claims.items() if v
+        },
+        "headroom": deduction_headroom(gross, claims),
+        "assumptions": profile["assumptions"],
+    }
@@ -0,0 +1,406 @@
+"""End-to-end benchmark of the chat pipeline against a fake LLM.
+
+Runs entirely offline: Gemini is replaced by ``benchmarks.fake_llm`` (or, with
+``--cassette``, by the replay backend serving recorded answers) and all
+sessions, caches and uploads live in a throwaway directory. Sections:
+
+- ``parse``: ``parse_bank_csv`` throughput on synthetic statements, plus
+  cold vs cached ``get_parsed_bank``
+- ``payslips``: a year of payslip PDFs per employee, extracted with the old
+  per-field regexes over the joined text vs the single-pass extractor,
+  inline and in the process pool
+- ``turns``: ``run_turn`` latency per intent
+- ``sessions``: session load / append time vs history length, per backend
+- ``http``: ``/chat`` throughput under concurrent load through the FastAPI
+  app (in-process, via httpx's ASGI transport)
+
+Results are printed (and optionally written) as JSON.
+
+    python -m benchmarks.bench_pipeline --sizes 100,10000,100000,1000000
+    python -m benchmarks.bench_pipeline --only turns,http --llm-latency 0.2
+    python -m benchmarks.bench_pipeline --only turns,http --cassette data/llm_cassette.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+from app.config import settings
+
+
+SECTIONS = ("parse", "payslips", "turns", "sessions", "http")
+INTENTS = ("spending_plan", "investment", "loan", "tax_saver")
+
+
+def _isolate(workdir: str, llm_cache: bool) -> None:
+    """Point every on-disk store at ``workdir``. Must run before the app
+    modules that build singletons from ``settings`` are imported."""
+
+    settings.uploads_dir = os.path.join(workdir, "uploads")
+    settings.sessions_dir = os.path.join(workdir, "sessions")
+    settings.session_db_path = os.path.join(workdir, "sessions.sqlite3")
+    settings.parsed_cache_dir = os.path.join(workdir, "parsed")
+    settings.history_dir = os.path.join(workdir, "history")
+    settings.category_cache_path = os.path.join(workdir, "category_cache.sqlite3")
+    if not llm_cache:
+        settings.llm_cache_size = 0
+
+
+def _stats(samples: List[float]) -> Dict[str, Any]:
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(pct(0.50) * 1000, 3),
+        "p95_ms": round(pct(0.95) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def _timed(fn: Callable[[], Any]) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def _statement(workdir: str, rows: int) -> str:
+    from benchmarks.synthetic import write_statement
+
+    path = os.path.join(workdir, f"statement_{rows}.csv")
+    if not os.path.exists(path):
+        write_statement(path, rows)
+    return path
+
+
+def bench_parse(workdir: str, sizes: List[int]) -> List[Dict[str, Any]]:
+    from app.agents.document_parser import parse_bank_csv
+    from app.parse_cache import get_parsed_bank
+
+    results = []
+    for rows in sizes:
+        path = _statement(workdir, rows)
+        parse_s = _timed(lambda: parse_bank_csv(path))
+        cold_s = _timed(lambda: get_parsed_bank(path))
+        cached_s = _timed(lambda: get_parsed_bank(path))
+        results.append(
+            {
+                "rows": rows,
+                "file_mb": round(os.path.getsize(path) / 2**20, 3),
+                "parse_s": round(parse_s, 4),
+                "rows_per_s": round(rows / parse_s),
+                "cold_cache_s": round(cold_s, 4),
+                "cached_s": round(cached_s, 4),
+            }
+        )
+    return results
+
+
+def _legacy_payslip(text: str) -> Dict[str, float]:
+    """The extraction ``parse_payslip_text`` used to do: one DOTALL search
+    over the whole text per field."""
+
+    import re
+
+    def find_number(label_pattern: str) -> float:
+        match = re.search(
+            label_pattern + r".*?(\d[\d,]*)", text, re.IGNORECASE | re.DOTALL
+        )
+        return float(match.group(1).replace(",", "")) if match else 0.0
+
+    return {
+        "basic": find_number("Basic"),
+        "hra": find_number("HRA"),
+        "pf": find_number("PF"),
+        "tds": find_number("TDS|Tax Deducted|Income Tax"),
+    }
+
+
+def bench_payslips(workdir: str, employees: int) -> Dict[str, Any]:
+    from datetime import date
+
+    from PyPDF2 import PdfReader
+
+    from app import payslips
+    from benchmarks.synthetic import write_payslip_pdf
+
+    months = [date(2024, m, 1) for m in range(4, 13)]
+    months += [date(2025, m, 1) for m in range(1, 4)]
+    paths = []
+    for e in range(employees):
+        for i, month in enumerate(months):
+            path = os.path.join(workdir, f"payslip_{e}_{i}.pdf")
+            if not os.path.exists(path):
+                write_payslip_pdf(path, [month], basic=40000.0 + 500 * e)
+            paths.append(path)
+
+    def legacy() -> None:
+        for path in paths:
+            reader = PdfReader(path)
+            _legacy_payslip("\n".join(p.extract_text() or "" for p in reader.pages))
+
+    workers = settings.payslip_workers
+
+    def inline() -> None:
+        settings.payslip_workers = 1
+        try:
+            payslips.parse_payslip_pdfs(paths)
+        finally:
+            settings.payslip_workers = workers
+
+    # First pool batch pays for spawning the workers; reported separately
+    pool_start_s = _timed(lambda: payslips.parse_payslip_pdfs(paths[:2]))
+    return {
+        "files": len(paths),
+        "workers": workers,
+        "cpus": os.cpu_count(),
+        "legacy_s": round(_timed(legacy), 4),
+        "inline_s": round(_timed(inline), 4),
+        "pool_s": round(_timed(lambda: payslips.parse_payslip_pdfs(paths)), 4),
+        "pool_start_s": round(pool_start_s, 4),
+    }
+
+
+def _turn_args(intent: str, statement: str, turn: int) -> Dict[str, Any]:
+    metadata: Dict[str, Any] = {}
+    file_path = None
+    if intent == "spending_plan":
+        file_path = statement
+    elif intent == "loan":
+        metadata = {"monthly_income": 90000, "existing_emi": 12000, "cibil_score": 760}
+    return {
+        "session_id": f"bench-{intent}-{turn}",
+        "intent": intent,
+        "message": "How am I doing this month?",
+        "file_path": file_path,
+        "metadata": metadata,
+    }
+
+
+def bench_turns(workdir: str, turns: int, statement_rows: int) -> Dict[str, Any]:
+    from app.orchestrator import run_turn_async
+
+    statement = _statement(workdir, statement_rows)
+
+    async def run() -> Dict[str, Any]:
+        # Warm the parse cache so spending_plan measures a returning upload
+        await run_turn_async(**_turn_args("spending_plan", statement, -1))
+        results = {}
+        for intent in INTENTS:
+            samples = []
+            llm_calls = 0
+            summary_tokens = 0
+            for turn in range(turns):
+                t0 = time.perf_counter()
+                response = await run_turn_async(
+                    **_turn_args(intent, statement, turn), debug=True
+                )
+                samples.append(time.perf_counter() - t0)
+                llm_calls += response["timings"].get("llm", {}).get("count", 0)
+                summary_tokens += response["orchestration"]["summary_prompt_tokens"]
+            results[intent] = {
+                **_stats(samples),
+                "llm_calls_per_turn": round(llm_calls / turns, 2),
+                "summary_prompt_tokens": round(summary_tokens / turns),
+            }
+        return results
+
+    return asyncio.run(run())
+
+
+def bench_sessions(
+    workdir: str, lengths: List[int], repeats: int
+) -> List[Dict[str, Any]]:
+    from app.session_store import JsonSessionStore, SqliteSessionStore
+
+    stores = {
+        "json": JsonSessionStore(settings.sessions_dir),
+        "sqlite": SqliteSessionStore(settings.session_db_path),
+    }
+    state = {"bank_doc": {"doc_id": "x" * 64, "income": 85000.0}}
+    turn = [
+        {"role": "user", "content": "How am I doing?"},
+        {"role": "assistant", "content": "x" * 600},
+    ]
+    results = []
+    for backend, store in stores.items():
+        for length in lengths:
+            session_id = f"bench-{backend}-{length}"
+            store.save(session_id, {"messages": turn * (length // 2), "state": state})
+            load_s = [
+                _timed(lambda: store.load(session_id, 6)) for _ in range(repeats)
+            ]
+            full_s = [_timed(lambda: store.load(session_id)) for _ in range(repeats)]
+            append_s = [
+                _timed(lambda: store.append_turn(session_id, turn, state))
+                for _ in range(repeats)
+            ]
+            results.append(
+                {
+                    "backend": backend,
+                    "messages": length,
+                    "load_recent": _stats(load_s),
+                    "load_full": _stats(full_s),
+                    "append_turn": _stats(append_s),
+                }
+            )
+    return results
+
+
+def bench_http(
+    workdir: str, requests: int, concurrency: int, statement_rows: int
+) -> Dict[str, Any]:
+    import httpx
+
+    from app.main import app
+
+    statement = _statement(workdir, statement_rows)
+
+    async def run() -> Dict[str, Any]:
+        transport = httpx.ASGITransport(app=app)
+        semaphore = asyncio.Semaphore(concurrency)
+        samples: List[float] = []
+        errors = 0
+
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=None
+        ) as client:
+
+            async def one(i: int) -> None:
+                nonlocal errors
+                args = _turn_args(INTENTS[i % 3], statement, i)
+                form = {
+                    "session_id": args["session_id"] + "-http",
+                    "intent": args["intent"],
+                    "message": args["message"],
+                    **{k: str(v) for k, v in args["metadata"].items()},
+                }
+                if args["file_path"]:
+                    form["file_path"] = args["file_path"]
+                async with semaphore:
+                    t0 = time.perf_counter()
+                    response = await client.post("/chat", data=form)
+                    samples.append(time.perf_counter() - t0)
+                if response.status_code != 200:
+                    errors += 1
+
+            t0 = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(requests)))
+            wall_s = time.perf_counter() - t0
+
+        return {
+            "requests": requests,
+            "concurrency": concurrency,
+            "errors": errors,
+            "wall_s": round(wall_s, 4),
+            "requests_per_s": round(requests / wall_s, 2),
+            "latency": _stats(samples),
+        }
+
+    return asyncio.run(run())
+
+
+def _ints(text: str) -> List[int]:
+    return [int(part) for part in text.split(",") if part.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--only", default=",".join(SECTIONS))
+    parser.add_argument("--sizes", default="100,10000,100000,1000000")
+    parser.add_argument(
+        "--employees", type=int, default=20, help="payslip years to ingest"
+    )
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--llm-jitter", type=float, default=0.2)
+    parser.add_argument("--response-chars", type=int, default=600)
+    parser.add_argument(
+        "--prompt-cost",
+        type=float,
+        default=0.0,
+        help="extra fake LLM seconds per 1k prompt tokens",
+    )
+    parser.add_argument("--llm-cache", action="store_true", help="keep the prompt cache on")
+    parser.add_argument(
+        "--cassette", help="replay this LLM_BACKEND=record cassette instead of the fake"
+    )
+    parser.add_argument("--turns", type=int, default=10, help="run_turn calls per intent")
+    parser.add_argument("--turn-rows", type=int, default=1000)
+    parser.add_argument("--history", default="10,100,1000,10000")
+    parser.add_argument("--session-repeats", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workdir", help="keep generated files here")
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    sections = [s.strip() for s in args.only.split(",") if s.strip()]
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"unknown sections: {', '.join(sorted(unknown))}")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="spendly-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    _isolate(workdir, args.llm_cache)
+
+    from app.llm_backends import Cassette, ReplayBackend
+    from benchmarks.fake_llm import FakeLLM, install
+
+    if args.cassette:
+        llm = install(ReplayBackend(Cassette(args.cassette), args.llm_latency))
+    else:
+        llm = install(
+            FakeLLM(
+                latency_s=args.llm_latency,
+                response_chars=args.response_chars,
+                jitter=args.llm_jitter,
+                s_per_1k_prompt_tokens=args.prompt_cost,
+            )
+        )
+
+    results: Dict[str, Any] = {}
+    if "parse" in sections:
+        results["parse"] = bench_parse(workdir, _ints(args.sizes))
+    if "payslips" in sections:
+        results["payslips"] = bench_payslips(workdir, args.employees)
+    if "turns" in sections:
+        results["turns"] = bench_turns(workdir, args.turns, args.turn_rows)
+    if "sessions" in sections:
+        results["sessions"] = bench_sessions(
+            workdir, _ints(args.history), args.session_repeats
+        )
+    if "http" in sections:
+        results["http"] = bench_http(
+            workdir, args.requests, args.concurrency, args.turn_rows
+        )
+
+    report = {
+        "benchmark": "pipeline",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "llm": llm.stats(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Microbenchmark for the Monte Carlo SIP projection engine.
+
+For each path count, projects a fixed allocation over each horizon three
+ways: cold (fresh simulation), warm (simulation cached, new allocation
+split) and cached (same inputs again), printing latencies as JSON.
+
+    python -m benchmarks.bench_projection --paths 1000 5000 20000 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Any, Callable, Dict, List
+
+from app import projections
+from app.projections import project_sip
+
+
+def _ms(fn: Callable[[], Any]) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return round((time.perf_counter() - t0) * 1000, 2)
+
+
+def _reset() -> None:
+    projections._simulations.clear()
+    projections._unit_projection.cache_clear()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--paths", type=int, nargs="+", default=[1_000, 5_000, 20_000, 100_000]
+    )
+    parser.add_argument("--years", type=int, nargs="+", default=[5, 10, 20, 30])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--sip", type=float, default=25_000.0)
+    args = parser.parse_args()
+
+    base = {"equity_sip": 0.6, "debt_fd": 0.2, "gold": 0.1, "liquid": 0.1}
+    allocation = {k: v * args.sip for k, v in base.items()}
+    # Same buckets, different split: reuses the simulation, not the bands
+    other = {k: v * 1.5 if k == "equity_sip" else v for k, v in allocation.items()}
+
+    # First-call numpy setup is not part of any measurement
+    project_sip(allocation, 1, paths=100, seed=args.seed)
+
+    rows: List[Dict[str, Any]] = []
+    for paths in args.paths:
+        for years in args.years:
+            _reset()
+            run = lambda a: project_sip(  # noqa: E731
+                a, years, goals=[args.sip * 12 * years * 2], paths=paths, seed=args.seed
+            )
+            row: Dict[str, Any] = {"paths": paths, "years": years}
+            row["cold_ms"] = _ms(lambda: run(allocation))
+            row["warm_ms"] = _ms(lambda: run(other))
+            row["cached_ms"] = _ms(lambda: run(allocation))
+            result = run(allocation)
+            row["p50"] = result["final"]["p50"]
+            row["p_double"] = result["goals"][1]["probability"]
+            rows.append(row)
+    print(json.dumps({"sip": args.sip, "seed": args.seed, "runs": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Microbenchmark for the slab tax engine.
+
+Evaluates batches of random what-if scenarios (salary and every deduction
+varied) with ``compare_regimes`` in one vectorized call, checks a sample
+against a plain per-scenario Python implementation of the same rules, and
+times a full per-user ``plan_taxes`` (both regimes plus the top-up
+ladders), printing JSON.
+
+    python -m benchmarks.bench_tax_engine --scenarios 1000 100000 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.tax_engine import (
+    CESS,
+    DEDUCTION_CAPS,
+    REGIMES,
+    SURCHARGE_THRESHOLDS,
+    compare_regimes,
+    plan_taxes,
+)
+
+
+def _scalar_slab(regime: str, taxable: float) -> float:
+    table = REGIMES[regime]
+    slabs, rates = list(table["slabs"]), list(table["rates"])
+    tax = 0.0
+    for i, lower in enumerate(slabs):
+        upper = slabs[i + 1] if i + 1 < len(slabs) else float("inf")
+        if taxable > lower:
+            tax += (min(taxable, upper) - lower) * rates[i]
+    return tax
+
+
+def _scalar_tax(regime: str, gross: float, claims: Dict[str, float]) -> float:
+    """The same rules one scenario at a time, written the obvious way."""
+
+    table = REGIMES[regime]
+    allowed = sum(
+        min(max(claims[name], 0.0), DEDUCTION_CAPS[name])
+        for name in table["deductions"]
+    )
+    taxable = max(gross - table["standard_deduction"] - allowed, 0.0)
+    tax = _scalar_slab(regime, taxable)
+    if taxable <= table["rebate_limit"]:
+        tax -= min(tax, table["rebate_max"])
+    elif table["rebate_relief"]:
+        tax = min(tax, taxable - table["rebate_limit"])
+    band = 0
+    for i, threshold in enumerate(SURCHARGE_THRESHOLDS):
+        if taxable > threshold:
+            band = i
+    rate = table["surcharge_rates"][band]
+    surcharge = tax * rate
+    if band:
+        threshold = SURCHARGE_THRESHOLDS[band]
+        previous = table["surcharge_rates"][band - 1]
+        at_threshold = _scalar_slab(regime, threshold) * (1 + previous)
+        surcharge = min(surcharge, max(at_threshold + taxable - threshold - tax, 0.0))
+    return round((tax + surcharge) * (1 + CESS))
+
+
+def _scenarios(n: int, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+    columns = {
+        name: rng.uniform(0, cap if np.isfinite(cap) else 3_00_000, n)
+        for name, cap in DEDUCTION_CAPS.items()
+    }
+    columns["gross"] = np.exp(rng.uniform(np.log(3e5), np.log(3e7), n))
+    return columns
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--scenarios", type=int, nargs="+", default=[1_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--check", type=int, default=5_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    runs: List[Dict[str, float]] = []
+    for n in args.scenarios:
+        columns = _scenarios(n, rng)
+        gross = columns.pop("gross")
+        t0 = time.perf_counter()
+        result = compare_regimes(gross, columns)
+        batch_s = time.perf_counter() - t0
+        runs.append(
+            {
+                "scenarios": n,
+                "batch_s": round(batch_s, 4),
+                "scenarios_per_s": round(n / batch_s),
+                "old_regime_share": round(float(np.mean(result["best"] == "old")), 3),
+            }
+        )
+
+    columns = _scenarios(args.check, rng)
+    gross = columns.pop("gross")
+    vectorized = compare_regimes(gross, columns)
+    t0 = time.perf_counter()
+    mismatches = 0
+    for i in range(args.check):
+        claims = {name: float(values[i]) for name, values in columns.items()}
+        for regime in REGIMES:
+            expected = _scalar_tax(regime, float(gross[i]), claims)
+            mismatches += expected != vectorized[regime][i]
+    scalar_s = time.perf_counter() - t0
+    scalar_rate = args.check / scalar_s
+
+    answers = {
+        "pays_rent": True,
+        "rent_amount": 30_000,
+        "rent_city": "Mumbai",
+        "has_health_insurance": True,
+        "health_premium": 12_000,
+    }
+    plan_taxes(18_00_000, answers)
+    t0 = time.perf_counter()
+    for _ in range(100):
+        plan_taxes(18_00_000, answers, {"annual_pf": 86_400})
+    plan_ms = (time.perf_counter() - t0) * 10
+
+    report = {
+        "runs": runs,
+        "scalar_scenarios_per_s": round(scalar_rate),
+        "speedup_at_largest": round(runs[-1]["scenarios_per_s"] / scalar_rate, 1),
+        "checked": args.check,
+        "mismatches": int(mismatches),
+        "plan_taxes_ms": round(plan_ms, 3),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
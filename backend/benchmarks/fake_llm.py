@@ -0,0 +1,78 @@
+"""Local stand-in for Gemini used by the benchmarks.
+
+``install`` makes it the ``app.llm_client`` backend: it sleeps for a
+configurable latency and returns ``app.llm_backends.stub_response`` text of a
+configurable size. To replay recorded traffic instead, see ``--cassette`` in
+``benchmarks.bench_pipeline``.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from typing import Any, Dict, Iterator
+
+from app.llm_backends import LLMBackend, stub_response
+from app.prompts import estimate_tokens
+
+
+class FakeLLM(LLMBackend):
+    name = "fake"
+
+    def __init__(
+        self,
+        latency_s: float = 0.05,
+        response_chars: int = 600,
+        jitter: float = 0.0,
+        stream_chunks: int = 8,
+        seed: int = 0,
+        s_per_1k_prompt_tokens: float = 0.0,
+    ) -> None:
+        self.latency_s = latency_s
+        # Prompt processing cost, so smaller prompts show up as faster calls
+        self.s_per_1k_prompt_tokens = s_per_1k_prompt_tokens
+        self.response_chars = response_chars
+        self.jitter = jitter
+        self.stream_chunks = max(1, stream_chunks)
+        self.calls = 0
+        self.prompt_chars = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay(self, prompt: str) -> float:
+        with self._lock:
+            self.calls += 1
+            self.prompt_chars += len(prompt)
+            spread = self._rng.uniform(-self.jitter, self.jitter)
+        prefill = estimate_tokens(prompt) / 1000 * self.s_per_1k_prompt_tokens
+        return max(0.0, self.latency_s * (1 + spread)) + prefill
+
+    def respond(self, prompt: str) -> str:
+        return stub_response(prompt, self.response_chars)
+
+    def generate(self, prompt: str) -> str:
+        time.sleep(self._delay(prompt))
+        return self.respond(prompt)
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        delay = self._delay(prompt) / self.stream_chunks
+        text = self.respond(prompt)
+        size = len(text) // self.stream_chunks + 1
+        for i in range(0, len(text), size):
+            time.sleep(delay)
+            yield text[i : i + size]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "calls": self.calls,
+            "prompt_chars": self.prompt_chars,
+        }
+
+
+def install(backend: LLMBackend) -> LLMBackend:
+    from app.llm_client import set_backend
+
+    set_backend(backend)
+    return backend
@@ -0,0 +1,152 @@
+"""Synthetic bank statements and payslips for benchmarks.
+
+Statement rows mix merchants known to the rule engine with unknown ones
+(which go to LLM categorization), carry UPI/POS reference noise like real
+narrations and span a year of dates, with a salary credit each month.
+Payslips are minimal text PDFs, one page per month.
+"""
+
+from __future__ import annotations
+
+import csv
+import random
+import string
+from datetime import date, timedelta
+from typing import List, Sequence
+
+
+_PREFIXES = ("UPI/{ref}/{name}/Payment", "POS {ref} {name}", "{name} ORDER {ref}")
+
+
+def _unknown_merchants(rng: random.Random, count: int) -> List[str]:
+    return [
+        "".join(rng.choice(string.ascii_uppercase) for _ in range(rng.randint(5, 9)))
+        + " TRADERS"
+        for _ in range(count)
+    ]
+
+
+def _known_merchants() -> List[str]:
+    from app.config import settings
+
+    with open(settings.merchant_rules_path, newline="", encoding="utf-8") as f:
+        return [
+            row["keyword"].upper()
+            for row in csv.DictReader(f)
+            if row.get("category") and not row["keyword"].startswith("#")
+        ]
+
+
+def write_statement(
+    path: str,
+    rows: int,
+    seed: int = 7,
+    known_share: float = 0.8,
+    unknown_merchants: int = 200,
+) -> str:
+    """Write a ``Date,Narration,Amount`` CSV with ``rows`` transactions."""
+
+    rng = random.Random(seed)
+    known = _known_merchants()
+    unknown = _unknown_merchants(rng, unknown_merchants)
+    start = date(2024, 1, 1)
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Date", "Narration", "Amount"])
+        month = None
+        for i in range(rows):
+            day = start + timedelta(days=i * 365 // max(rows, 1))
+            if day.month != month:
+                month = day.month
+                writer.writerow([day.strftime("%d/%m/%Y"), "SALARY CREDIT", 85000])
+                continue
+            name = rng.choice(known if rng.random() < known_share else unknown)
+            ref = rng.randint(10**9, 10**10)
+            desc = rng.choice(_PREFIXES).format(ref=ref, name=name)
+            amount = -round(rng.lognormvariate(6.5, 1.0), 2)
+            writer.writerow([day.strftime("%d/%m/%Y"), desc, amount])
+    return path
+
+
+def _payslip_lines(month: date, basic: float, filler: int) -> List[str]:
+    hra = basic * 0.4
+    special = basic * 0.35
+    gross = basic + hra + special
+    pf = round(basic * 0.12)
+    tds = round(gross * 0.08)
+    lines = [
+        "ACME TECHNOLOGIES PVT LTD",
+        f"Payslip for the month of {month.strftime('%B %Y')}",
+        "Employee: A. Kumar    Employee ID: E1042    PAN: ABCDE1234F",
+        "Earnings            Amount       YTD",
+        f"Basic Salary        {basic:,.2f}    {basic * month.month:,.2f}",
+        f"House Rent Allowance {hra:,.2f}",
+        f"Special Allowance   {special:,.2f}",
+        f"Gross Earnings      {gross:,.2f}",
+        "Deductions",
+        f"Provident Fund      {pf:,.2f}",
+        "Professional Tax    200.00",
+        f"Income Tax (u/s 192) {tds:,.2f}",
+        f"Net Pay             {gross - pf - tds - 200:,.2f}",
+    ]
+    # Leave and attendance tables and the like that the extractor must skip
+    lines += [
+        f"Note {i}: leave balance 12 days, attendance 22 of 22" for i in range(filler)
+    ]
+    return lines
+
+
+def _pdf_text(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_payslip_pdf(
+    path: str,
+    months: Sequence[date],
+    basic: float = 60000.0,
+    filler: int = 20,
+) -> str:
+    """Write a PDF with one text payslip page per entry of ``months``."""
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # page tree, filled in once the pages are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for month in months:
+        ops = ["BT", "/F1 9 Tf", "12 TL", "40 800 Td"]
+        ops += [
+            f"({_pdf_text(line)}) Tj T*"
+            for line in _payslip_lines(month, basic, filler)
+        ]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(
+            b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        )
+        content = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content
+        )
+        kids.append(len(objects))
+    refs = " ".join(f"{k} 0 R" for k in kids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (refs, len(kids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    with open(path, "wb") as f:
+        f.write(out)
+    return path
@@ -0,0 +1,130 @@
+from datetime import date
+
+import pytest
+
+from app import history
+from app.config import settings
+from app.history import TransactionHistory, resolve_window
+
+
+def _window(window, anchor):
+    return resolve_window({"window": window}, anchor)
+
+
+@pytest.mark.parametrize(
+    "window,anchor,expected",
+    [
+        ("this_month", date(2024, 3, 31), (date(2024, 3, 1), date(2024, 3, 31))),
+        ("this_month", date(2024, 3, 1), (date(2024, 3, 1), date(2024, 3, 1))),
+        # Across the year boundary, and into a leap February
+        ("last_month", date(2024, 1, 15), (date(2023, 12, 1), date(2023, 12, 31))),
+        ("last_month", date(2024, 3, 31), (date(2024, 2, 1), date(2024, 2, 29))),
+        ("last_3_months", date(2024, 2, 10), (date(2023, 12, 1), date(2024, 2, 10))),
+        ("last_12_months", date(2024, 12, 5), (date(2024, 1, 1), date(2024, 12, 5))),
+        ("last_1_month", date(2024, 5, 20), (date(2024, 5, 1), date(2024, 5, 20))),
+        ("last_0_months", date(2024, 5, 20), (date(2024, 5, 1), date(2024, 5, 20))),
+        # The financial year runs April to March
+        ("this_fy", date(2024, 3, 31), (date(2023, 4, 1), date(2024, 3, 31))),
+        ("this_fy", date(2024, 4, 1), (date(2024, 4, 1), date(2025, 3, 31))),
+        ("last_fy", date(2024, 3, 31), (date(2022, 4, 1), date(2023, 3, 31))),
+        ("last_fy", date(2024, 4, 1), (date(2023, 4, 1), date(2024, 3, 31))),
+        ("all", date(2024, 4, 1), (None, None)),
+        ("Last 3 Months", date(2024, 2, 10), (date(2023, 12, 1), date(2024, 2, 10))),
+    ],
+)
+def test_window_kinds(window, anchor, expected):
+    assert _window(window, anchor) == expected
+
+
+def test_no_window_means_latest_statement():
+    assert resolve_window({}, date(2024, 4, 1)) is None
+    assert _window("", date(2024, 4, 1)) is None
+
+
+def test_window_without_history_is_everything():
+    assert _window("last_month", None) == (None, None)
+
+
+def test_explicit_dates_override_the_window():
+    metadata = {"window": "last_fy", "start_date": "01/04/2024"}
+
+    assert resolve_window(metadata, date(2024, 6, 1)) == (date(2024, 4, 1), None)
+    assert resolve_window({"end_date": "2024-06-30"}, None) == (
+        None,
+        date(2024, 6, 30),
+    )
+
+
+def test_unknown_window():
+    with pytest.raises(ValueError):
+        _window("next_week", date(2024, 4, 1))
+
+
+def _tx(day, desc, amount):
+    return {"date": day, "desc": desc, "amount": amount, "category": "Food"}
+
+
+def test_overlapping_statement_adds_only_new_rows():
+    ledger = TransactionHistory("u")
+    january = [
+        _tx("05/01/2024", "Salary", 50_000.0),
+        _tx("10/01/2024", "Tea stall", -20.0),
+        _tx("10/01/2024", "Tea stall", -20.0),
+    ]
+    assert ledger.add_statement("jan", january) == 3
+
+    # A "last 60 days" export repeating January in another date format, with
+    # a third tea that day
+    overlap = [
+        _tx("2024-01-05", "SALARY ", 50_000.0),
+        _tx("2024-01-10", "Tea stall", -20.0),
+        _tx("2024-01-10", "Tea stall", -20.0),
+        _tx("2024-01-10", "Tea stall", -20.0),
+        _tx("2024-02-05", "Salary", 50_000.0),
+    ]
+    assert ledger.add_statement("jan-feb", overlap) == 2
+    assert ledger.add_statement("jan-feb", overlap) == 0
+
+    assert len(ledger.transactions) == 5
+    jan = ledger.aggregates(date(2024, 1, 1), date(2024, 1, 31))
+    assert jan["income"] == 50_000.0
+    assert jan["total_expense"] == 60.0
+    assert ledger.aggregates()["transaction_count"] == 5
+
+
+def test_older_statement_is_merged_in_date_order():
+    ledger = TransactionHistory("u")
+    ledger.add_statement("feb", [_tx("2024-02-05", "Rent", -15_000.0)])
+    ledger.add_statement("jan", [_tx("2024-01-05", "Rent", -15_000.0)])
+
+    assert [tx["date"] for tx in ledger.transactions] == ["2024-01-05", "2024-02-05"]
+    assert ledger.first_date == date(2024, 1, 5)
+    assert [row["month"] for row in ledger.month_over_month()] == [
+        "2024-01",
+        "2024-02",
+    ]
+
+
+def test_reuploaded_statement_is_stored_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "history_dir", str(tmp_path))
+    rows = [_tx("2024-01-05", "Rent", -15_000.0)]
+
+    assert history.add_statement("t-history", "doc", rows) == 1
+    assert history.add_statement("t-history", "doc", rows) == 0
+    assert history.add_statement("t-history", "doc-copy", rows) == 0
+    assert len(history.load_history("t-history").transactions) == 1
+
+
+def test_loaded_histories_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "history_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "history_cache_users", 1)
+    monkeypatch.setattr(history, "_loaded", type(history._loaded)())
+    rows = [_tx("2024-01-05", "Rent", -15_000.0)]
+
+    history.add_statement("t-first", "doc", rows)
+    history.add_statement("t-second", "doc", rows)
+
+    assert list(history._loaded) == ["t-second"]
+    # Evicted histories are read back from disk
+    assert history.load_history("t-first").documents == ["doc"]
+    assert list(history._loaded) == ["t-first"]
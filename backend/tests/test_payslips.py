@@ -0,0 +1,53 @@
+from app.agents.document_parser import parse_payslip_text
+from app.payslips import extract_fields
+
+
+def test_period_between_label_and_amount_is_not_the_amount():
+    parsed = parse_payslip_text(
+        "Gross salary for the month of April 2024: 80,000\nNet pay: 70,000"
+    )
+
+    assert parsed["income"] == 80_000.0
+    assert parsed["payslip_info"]["gross"] == 80_000.0
+    assert parsed["payslip_info"]["net"] == 70_000.0
+    assert parsed["payslip_info"]["period"] == "2024-04"
+
+
+def test_year_is_never_read_as_an_amount():
+    fields = extract_fields("Gross salary of April 2024\nPaid on 05/05/2024")
+
+    assert "gross" not in fields
+
+
+def test_component_lines():
+    fields = extract_fields(
+        "Basic Salary 40,000\nProvident Fund 4,800\nHouse Rent Allowance 16,000"
+    )
+
+    assert fields == {"basic": 40_000.0, "pf": 4_800.0, "hra": 16_000.0}
+    assert parse_payslip_text("Basic Salary 40,000\nHRA 16,000")["income"] == 56_000
+
+
+def test_notes_qualifiers_and_currency():
+    fields = extract_fields(
+        "Payslip for the month of March 2024\n"
+        "Gross Earnings Rs. 1,00,000/-\n"
+        "Take Home Pay - INR 72,500.50\n"
+        "TDS (u/s 192) 5,000\n"
+        "EPF Contribution: 3,600"
+    )
+
+    assert fields == {
+        "period": "2024-03",
+        "gross": 100_000.0,
+        "net": 72_500.5,
+        "tds": 5_000.0,
+        "pf": 3_600.0,
+    }
+
+
+def test_identifier_numbers_are_not_amounts():
+    fields = extract_fields("Employee PF No. 1234567 Basic 40000")
+
+    assert fields == {"basic": 40_000.0}
+    assert "pf" not in extract_fields("PF A/c Number 1234567\nUAN 100200300400")
@@ -0,0 +1,142 @@
+import pytest
+
+from app.tax_answers import extract_tax_answer, parse_llm_answer
+
+
+def fields(message, question):
+    answer, confident = extract_tax_answer(message, question)
+    return answer.model_dump(exclude_none=True), confident
+
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        ("25k", 25_000.0),
+        ("Rs. 18,000", 18_000.0),
+        ("around 1.2 L a year", 10_000.0),
+        ("2 lakh per annum", 16_666.67),
+    ],
+)
+def test_rent_amounts_and_periods(message, expected):
+    values, confident = fields(message, "rent")
+
+    assert confident
+    assert values["pays_rent"] is True
+    assert values["rent_amount"] == expected
+
+
+def test_monthly_premium_is_made_yearly():
+    values, confident = fields("yes, 1500 per month", "health_insurance")
+
+    assert confident
+    assert values == {"has_health_insurance": True, "health_premium": 18_000.0}
+
+
+def test_loan_amounts_by_wording():
+    values, _ = fields("home loan of 45 lakh, emi 38k", "loans")
+
+    assert values["has_home_loan"] is True
+    assert values["loan_amount"] == 45_00_000.0
+    assert values["home_loan_emi"] == 38_000.0
+
+    values, _ = fields("education loan interest 60k per year", "loans")
+    assert values["has_education_loan"] is True
+    assert values["education_loan_interest_year"] == 60_000.0
+
+
+def test_crore_and_percentages_and_years():
+    values, _ = fields("1.2 cr loan at 8.5% for 20 years", "loans")
+
+    assert values["loan_amount"] == 1_20_00_000.0
+    assert "home_loan_emi" not in values
+
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        (
+            "rent is 30k and I have a 40 lakh home loan with 35k EMI",
+            {"loan_amount": 40_00_000.0, "home_loan_emi": 35_000.0},
+        ),
+        (
+            "1.5 lakh home loan, emi 30k",
+            {"loan_amount": 1_50_000.0, "home_loan_emi": 30_000.0},
+        ),
+        ("8.5% interest on 40L loan", {"loan_amount": 40_00_000.0}),
+    ],
+)
+def test_loan_fields_follow_the_nearest_keyword(message, expected):
+    values, confident = fields(message, "loans")
+
+    assert confident
+    assert {k: values.get(k) for k in expected} == expected
+    assert "home_loan_interest_year" not in values
+
+
+def test_two_amounts_for_one_field_are_not_confident():
+    values, confident = fields("emi 30k and 25k", "loans")
+
+    assert not confident
+    assert values["home_loan_emi"] == 30_000.0
+
+
+def test_amounts_go_to_the_nearest_topic():
+    values, confident = fields(
+        "rent is 30k in Bangalore and health insurance premium 12k", "rent"
+    )
+
+    assert confident
+    assert values["rent_amount"] == 30_000.0
+    assert values["rent_city"] == "Bengaluru"
+    assert values["health_premium"] == 12_000.0
+
+
+def test_city_with_rent():
+    values, confident = fields("I pay 22000 in Bombay", "rent")
+
+    assert confident
+    assert values == {"pays_rent": True, "rent_amount": 22_000.0, "rent_city": "Mumbai"}
+
+
+def test_no_rent_city_when_not_renting():
+    values, confident = fields("I dont pay rent, I stay in Pune with parents", "rent")
+
+    assert confident
+    assert values == {"pays_rent": False}
+
+
+@pytest.mark.parametrize(
+    "message, question, expected",
+    [
+        ("no", "loans", {"has_home_loan": False, "has_education_loan": False}),
+        ("nope, none", "health_insurance", {"has_health_insurance": False}),
+        ("yes", "health_insurance", {"has_health_insurance": True}),
+        ("sure", "rent", {"pays_rent": True}),
+    ],
+)
+def test_yes_and_no(message, question, expected):
+    assert fields(message, question) == (expected, True)
+
+
+@pytest.mark.parametrize(
+    "message, question",
+    [
+        ("not sure, maybe", "rent"),
+        ("hmm", "rent"),
+        ("ha ha", "rent"),
+        ("I make sure to pay on time", "health_insurance"),
+        ("I have a car loan of 5 lakh", "loans"),
+        ("40k", None),
+    ],
+)
+def test_unconfident_replies_go_to_the_llm(message, question):
+    assert fields(message, question)[1] is False
+
+
+def test_llm_answer_validation():
+    answer = parse_llm_answer('```json\n{"rent_amount": 20000, "junk": 1}\n```')
+
+    assert answer.pays_rent is True
+    assert answer.rent_amount == 20_000.0
+    assert parse_llm_answer("no json here") is None
+    assert parse_llm_answer('{"rent_amount": "lots"}') is None
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from app.tax_engine import compare_regimes, hra_exemption, regime_tax
+
+
+@pytest.mark.parametrize(
+    "regime,gross,total",
+    [
+        ("old", 15_00_000, 2_57_400),
+        ("new", 15_00_000, 97_500),
+        # Taxable 12L: the 87A rebate wipes out the tax
+        ("new", 12_75_000, 0),
+        # Taxable 12.05L: marginal relief caps the tax at the 5,000 above 12L
+        ("new", 12_80_000, 5_200),
+        ("old", 5_50_000, 0),
+    ],
+)
+def test_slabs_rebate_and_cess(regime, gross, total):
+    assert float(regime_tax(regime, gross)["total"]) == total
+
+
+def test_deductions_only_count_in_the_old_regime():
+    claims = {"80c": 2_00_000, "80d": 25_000}
+
+    old = regime_tax("old", 15_00_000, claims)
+    new = regime_tax("new", 15_00_000, claims)
+
+    # 80C is capped at 1.5L
+    assert float(old["deductions"]) == 50_000 + 1_50_000 + 25_000
+    assert float(new["deductions"]) == 75_000
+    assert float(new["total"]) == 97_500
+
+
+def test_compare_regimes_vectorised():
+    result = compare_regimes(np.array([12_75_000, 15_00_000]))
+
+    assert result["best"].tolist() == ["new", "new"]
+    assert result["saving"].tolist() == [
+        float(regime_tax("old", 12_75_000)["total"]),
+        2_57_400 - 97_500,
+    ]
+
+
+@pytest.mark.parametrize(
+    "metro,exempt",
+    [
+        # Least of HRA 2.4L, rent above 10% of basic 2L, 50% of basic 2L
+        (True, 2_00_000),
+        # 40% of basic outside the metros
+        (False, 1_60_000),
+    ],
+)
+def test_hra_exemption(metro, exempt):
+    assert hra_exemption(4_00_000, 2_40_000, 2_40_000, metro) == exempt
+
+
+def test_hra_exemption_without_rent_above_ten_percent_of_basic():
+    assert hra_exemption(6_00_000, 2_40_000, 50_000, True) == 0
+
+
+def test_surcharge_marginal_relief():
+    # Taxable 50.1L: 10% surcharge on 10.83L would be 1,08,300, but crossing
+    # 50L may not cost more than the 10,000 above it
+    just_above = regime_tax("new", 50_85_000)
+
+    assert float(just_above["taxable_income"]) == 50_10_000
+    assert float(just_above["surcharge"]) == 7_000
+    assert float(just_above["total"]) == 11_33_600
+
+
+def test_surcharge_without_relief_well_above_the_threshold():
+    result = regime_tax("new", 60_75_000)
+
+    # Taxable 60L: 10.8L + 3L at 30% = 13.8L, surcharge 10% in full
+    assert float(result["surcharge"]) == 1_38_000